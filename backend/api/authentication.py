@@ -0,0 +1,97 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import salted_hmac
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import CustomUser
+
+# поля пользователя, которые кладутся в токен доступа: их хватает для
+# проверок прав и представления текущего пользователя
+USER_CLAIMS = (
+    "email",
+    "username",
+    "first_name",
+    "last_name",
+    "is_staff",
+    "is_superuser",
+)
+
+
+# отпечаток пароля в токене обновления
+PASSWORD_CLAIM = "pwd"
+
+
+def user_claims(user):
+    """Данные пользователя для подписанного токена."""
+    return {claim: getattr(user, claim) for claim in USER_CLAIMS}
+
+
+def password_fingerprint(user):
+    """
+    Короткий HMAC хэша пароля пользователя. Меняется при смене и сбросе
+    пароля, а сам хэш по нему не восстановить.
+    """
+    return salted_hmac(
+        "api.authentication.password_fingerprint", user.password
+    ).hexdigest()[:16]
+
+
+class SignedRefreshToken(RefreshToken):
+    """
+    Токен обновления с отпечатком пароля: после смены пароля выданные
+    раньше токены обновления перестают действовать. В токен доступа
+    отпечаток не копируется.
+    """
+
+    no_copy_claims = RefreshToken.no_copy_claims + (PASSWORD_CLAIM,)
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[PASSWORD_CLAIM] = password_fingerprint(user)
+        return token
+
+
+class SignedTokenAuthentication(JWTAuthentication):
+    """
+    Аутентификация по подписанному токену доступа (JWT) без запроса к
+    базе данных.
+
+    Пользователь собирается из полей токена как загруженный из базы
+    объект модели, остальные поля отложены. Токены выдаются только
+    активным пользователям и живут недолго, поэтому данные токена
+    считаются актуальными. Изменяющим запросам нужен точный объект:
+    save() записывает поля пользователя целиком, и для них пользователь
+    читается из базы.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None or request.method in SAFE_METHODS:
+            return result
+        _, token = result
+        return super().get_user(token), token
+
+    def get_user(self, validated_token):
+        try:
+            values = {
+                CustomUser._meta.pk.attname: validated_token[
+                    api_settings.USER_ID_CLAIM
+                ],
+                "is_active": True,
+            }
+            for claim in USER_CLAIMS:
+                values[claim] = validated_token[claim]
+        except KeyError:
+            raise InvalidToken("Токен не содержит данных пользователя")
+        fields = [
+            field.attname
+            for field in CustomUser._meta.concrete_fields
+            if field.attname in values
+        ]
+        return CustomUser.from_db(
+            DEFAULT_DB_ALIAS, fields, [values[name] for name in fields]
+        )
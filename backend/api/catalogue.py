@@ -0,0 +1,135 @@
+import gzip
+import hashlib
+from threading import Lock
+
+import brotli
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from api.serializers import IngredientSerializer, TagSerializer
+from core.cache import bump_version, get_version
+from core.routers import use_primary
+from recipes.models import Ingredient, Tag
+
+# варианты сжатия в порядке предпочтения сервера
+ENCODINGS = ("br", "gzip")
+
+
+def accepted_encodings(header):
+    """Возвращает кодировки из Accept-Encoding, кроме запрещенных q=0."""
+    accepted = set()
+    for value in header.split(","):
+        encoding, _, params = value.partition(";")
+        quality = params.strip().lower()
+        if quality.startswith("q=") and quality[2:].strip("0.") == "":
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class RenderedCatalogue:
+    """Ответ каталога, отрендеренный в байты во всех вариантах сжатия."""
+
+    def __init__(self, content):
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.bodies = {
+            None: content,
+            "gzip": gzip.compress(content, compresslevel=9, mtime=0),
+            "br": brotli.compress(content, quality=11),
+        }
+        self.etags = {
+            encoding: self.etag
+            if encoding is None
+            else f'"{digest}-{encoding}"'
+            for encoding in self.bodies
+        }
+
+
+class Catalogue:
+    """
+    Заранее подготовленный ответ со статическим каталогом (теги,
+    ингредиенты).
+
+    Список рендерится в JSON один раз, сжимается gzip и brotli и
+    отдается готовыми байтами со строгим ETag; на If-None-Match с тем же
+    ETag отвечает 304. Версия каталога хранится в базе данных, поэтому
+    ее смена видна всем воркерам, а перечитывается не чаще раза в
+    DATA_VERSION_TTL секунд: обычно ответ отдается без обращения к базе.
+    Готовые варианты хранятся в памяти
+    процесса и в кэше по ключу версии: при общем для процессов бэкенде
+    кэша каталог рендерит один воркер, остальные забирают результат.
+    """
+
+    def __init__(self, key, queryset, serializer_class):
+        self.key = key
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self._lock = Lock()
+        self._version = None
+        self._rendered = None
+
+    @property
+    def version_key(self):
+        return f"{self.key}-version"
+
+    def render(self):
+        with use_primary():
+            serializer = self.serializer_class(self.queryset.all(), many=True)
+            return RenderedCatalogue(JSONRenderer().render(serializer.data))
+
+    def get(self):
+        version = get_version(self.version_key)
+        if self._version == version:
+            return self._rendered
+        with self._lock:
+            if self._version != version:
+                cache_key = f"{self.key}:{version}"
+                rendered = cache.get(cache_key)
+                if rendered is None:
+                    rendered = self.render()
+                    cache.set(cache_key, rendered, timeout=None)
+                self._rendered, self._version = rendered, version
+        return self._rendered
+
+    def invalidate(self):
+        bump_version(self.version_key)
+
+    def response(self, request):
+        """
+        Возвращает готовый ответ с подходящим запросу вариантом сжатия
+        или 304, если у клиента актуальная копия.
+        """
+        rendered = self.get()
+        accepted = accepted_encodings(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        encoding = next(
+            (encoding for encoding in ENCODINGS if encoding in accepted), None
+        )
+        etag = rendered.etags[encoding]
+
+        if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+        if "*" in if_none_match or set(if_none_match) & set(
+            rendered.etags.values()
+        ):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                rendered.bodies[encoding], content_type="application/json"
+            )
+            response["Content-Length"] = len(rendered.bodies[encoding])
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+tag_catalogue = Catalogue("tag-catalogue", Tag.objects.all(), TagSerializer)
+ingredient_catalogue = Catalogue(
+    "ingredient-catalogue", Ingredient.objects.all(), IngredientSerializer
+)
@@ -1,6 +1,16 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Ingredient, Recipe, Tag
+
+# значение параметра ordering -> сортировка рецептов
+ORDERING = {
+    "popular": ("-favorites_count", "name", "id"),
+}
+ORDERING_CHOICES = (("popular", "По популярности"),)
 
 
 class IngredientFilter(FilterSet):
@@ -21,15 +31,25 @@ class RecipeFilter(FilterSet):
     - тег
     - автор
     - в избранном
-    - в корзине.
+    - в корзине
+    - полнотекстовый поиск по названию и описанию
+    и сортировать по популярности (ordering=popular).
     """
 
     author = filters.NumberFilter(field_name="author__id")
-    tags = filters.AllValuesMultipleFilter(field_name="tags__slug")
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name="tags__slug",
+        to_field_name="slug",
+        queryset=Tag.objects.all(),
+    )
     is_favorited = filters.BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_is_in_shopping_cart"
     )
+    search = filters.CharFilter(method="filter_search")
+    ordering = filters.ChoiceFilter(
+        choices=ORDERING_CHOICES, method="filter_ordering"
+    )
 
     class Meta:
         model = Recipe
@@ -46,3 +66,44 @@ class RecipeFilter(FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shoppingcart__user=self.request.user)
         return queryset.none()
+
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию рецепта с сортировкой
+        по релевантности. В PostgreSQL использует индексированный вектор
+        search_vector, в остальных базах - поиск подстроки, при котором
+        совпадения в названии идут первыми.
+        """
+        if connections[queryset.db].vendor == "postgresql":
+            query = SearchQuery(
+                value, config="russian", search_type="websearch"
+            )
+            return (
+                queryset.filter(search_vector=query)
+                .annotate(
+                    rank=Cast(
+                        SearchRank(F("search_vector"), query), FloatField()
+                    )
+                )
+                .order_by("-rank", "name", "id")
+            )
+        return (
+            queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            )
+            .annotate(
+                rank=Case(
+                    When(name__icontains=value, then=Value(1)),
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by("-rank", "name", "id")
+        )
+
+    def filter_ordering(self, queryset, name, value):
+        """
+        Сортировка рецептов. Популярность - денормализованный счетчик
+        добавлений в избранное, сортировка идет по индексу.
+        """
+        return queryset.order_by(*ORDERING[value])
@@ -0,0 +1,103 @@
+from django.core.cache import caches
+from django.db.models import Prefetch, prefetch_related_objects
+
+from api.catalogue import ingredient_catalogue, tag_catalogue
+from api.serializers import RecipeReadSerializer
+from core.cache import get_versions
+from recipes.models import IngredientRecipe
+
+RECIPE_CACHE = "recipes"
+
+# связанные объекты, нужные для сериализации рецептов без кэша
+RECIPE_PREFETCH = (
+    "tags",
+    Prefetch(
+        "ingredientes",
+        queryset=IngredientRecipe.objects.select_related("ingredient"),
+    ),
+)
+
+
+class RecipeFragmentCache:
+    """
+    Кэш представлений рецептов, не зависящих от пользователя.
+
+    Рецепт сериализуется один раз на версию: ключ содержит версию рецепта
+    и версии каталогов тегов и ингредиентов, поэтому изменение рецепта,
+    его автора, тега или ингредиента делает старые записи недостижимыми.
+    Флаги is_favorited, is_in_shopping_cart и is_subscribed автора
+    берутся из аннотаций RecipeQuerySet.with_user_flags и подставляются
+    поверх закэшированного представления.
+    """
+
+    @property
+    def cache(self):
+        return caches[RECIPE_CACHE]
+
+    def get_prefix(self, request):
+        # ссылки на картинки абсолютные и зависят от адреса сайта
+        return "recipe:{}:{}:{}".format(
+            request.build_absolute_uri("/"),
+            *get_versions(
+                tag_catalogue.version_key, ingredient_catalogue.version_key
+            ),
+        )
+
+    def render(self, recipes, request):
+        prefetch_related_objects(recipes, *RECIPE_PREFETCH)
+        for recipe in recipes:
+            recipe.author.is_subscribed = False
+        serializer = RecipeReadSerializer(
+            recipes, many=True, context={"request": request}
+        )
+        return [
+            dict(
+                fragment,
+                is_favorited=False,
+                is_in_shopping_cart=False,
+            )
+            for fragment in serializer.data
+        ]
+
+    def represent(self, recipes, request):
+        """
+        Возвращает представления рецептов recipes, полученных через
+        RecipeQuerySet.with_user_flags, для пользователя запроса.
+        """
+        prefix = self.get_prefix(request)
+        keys = {
+            recipe.pk: f"{prefix}:{recipe.pk}:{recipe.version}"
+            for recipe in recipes
+        }
+        fragments = self.cache.get_many(keys.values())
+
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in fragments
+        ]
+        if missing:
+            rendered = dict(
+                zip(
+                    (keys[recipe.pk] for recipe in missing),
+                    self.render(missing, request),
+                )
+            )
+            self.cache.set_many(rendered)
+            fragments.update(rendered)
+
+        return [
+            self.overlay(fragments[keys[recipe.pk]], recipe)
+            for recipe in recipes
+        ]
+
+    def overlay(self, fragment, recipe):
+        return dict(
+            fragment,
+            author=dict(
+                fragment["author"], is_subscribed=recipe.author_is_subscribed
+            ),
+            is_favorited=recipe.is_favorited,
+            is_in_shopping_cart=recipe.is_in_shopping_cart,
+        )
+
+
+recipe_fragments = RecipeFragmentCache()
@@ -0,0 +1,126 @@
+import logging
+import threading
+from functools import partial
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import F
+
+from core.images import IMAGE_FORMATS, IMAGE_VARIANTS, render_variants
+from core.pool import ProcessPool
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "recipes/images/variants"
+
+
+def variant_name(source, variant, extension):
+    return f"{VARIANTS_DIR}/{PurePosixPath(source).stem}-{variant}.{extension}"
+
+
+def read_image(source):
+    with default_storage.open(source) as file:
+        return file.read()
+
+
+def store_variants(source, variants):
+    """
+    Сохраняет варианты картинки source в хранилище и записывает их имена
+    всем рецептам с этой картинкой. Возвращает число обновленных рецептов.
+    """
+    names = {"source": source}
+    for (variant, extension), content in variants.items():
+        name = variant_name(source, variant, extension)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        names.setdefault(variant, {})[extension] = default_storage.save(
+            name, ContentFile(content)
+        )
+    # версия меняется, чтобы кэш представлений рецептов получил ссылки
+    return Recipe.objects.filter(image=source).update(
+        image_variants=names, version=F("version") + 1
+    )
+
+
+def variant_urls(recipe, request=None):
+    """
+    Возвращает ссылки на готовые варианты картинки рецепта в формате
+    {вариант: {расширение: ссылка}} или пустой словарь, если варианты
+    еще не построены.
+    """
+    variants = recipe.image_variants
+    if not recipe.image or variants.get("source") != recipe.image.name:
+        return {}
+    urls = {}
+    for variant in IMAGE_VARIANTS:
+        for extension in IMAGE_FORMATS:
+            url = default_storage.url(variants[variant][extension])
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls.setdefault(variant, {})[extension] = url
+    return urls
+
+
+class ImagePipeline:
+    """
+    Построение вариантов картинок рецептов вне цикла запроса.
+
+    Картинки декодируются, уменьшаются и кодируются в пуле процессов
+    размером settings.IMAGE_WORKERS, результат сохраняется в хранилище
+    потоком пула в основном процессе. При IMAGE_WORKERS = 0 варианты
+    строятся сразу в вызывающем потоке.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.pool = ProcessPool("IMAGE_WORKERS")
+
+    def process(self, source):
+        """Строит и сохраняет варианты картинки source синхронно."""
+        return store_variants(source, render_variants(read_image(source)))
+
+    def schedule(self, source):
+        """
+        Ставит построение вариантов картинки source в очередь пула.
+        Ошибки записываются в лог и не прерывают запрос.
+        """
+        with self._lock:
+            if source in self._pending:
+                return
+            self._pending.add(source)
+        try:
+            if not self.pool.workers:
+                self.process(source)
+                self._pending.discard(source)
+                return
+            future = self.pool.submit(render_variants, read_image(source))
+        except OSError as error:
+            self._pending.discard(source)
+            logger.warning("Не удалось прочитать %s: %s", source, error)
+            return
+        except Exception:
+            self._pending.discard(source)
+            logger.exception("Не удалось построить варианты %s", source)
+            return
+        future.add_done_callback(
+            partial(self.finish, source, threading.get_ident())
+        )
+
+    def finish(self, source, caller, future):
+        try:
+            store_variants(source, future.result())
+        except Exception:
+            logger.exception("Не удалось построить варианты %s", source)
+        finally:
+            self._pending.discard(source)
+            # соединения потока пула не должны оставаться открытыми,
+            # а соединения вызывающего потока закрывать нельзя
+            if threading.get_ident() != caller:
+                connections.close_all()
+
+
+image_pipeline = ImagePipeline()
@@ -1,8 +1,215 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 from core.constraints import PAGE_SIZE
 
 
+class KeysetPagination(BasePagination):
+    """
+    Постраничная навигация по ключу (keyset): следующая страница ищется
+    условием по полям сортировки последнего объекта, без COUNT(*) и
+    OFFSET, поэтому время ответа не растет с номером страницы.
+
+    Сортировка берется из запроса или Meta.ordering модели и дополняется
+    первичным ключом, чтобы позиция была однозначной.
+    """
+
+    page_size = PAGE_SIZE
+    page_size_query_param = "limit"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Неверный курсор"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor["reverse"])
+        if cursor:
+            queryset = self.seek(queryset, cursor["position"], reverse)
+        ordering = (
+            [self.invert(field) for field in self.ordering]
+            if reverse
+            else self.ordering
+        )
+
+        page = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[: self.page_size]
+        if reverse:
+            page.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = [
+            field
+            for field in (
+                queryset.query.order_by or queryset.model._meta.ordering
+            )
+            if isinstance(field, str)
+        ]
+        if not ordering or ordering[-1].lstrip("-") not in ("pk", "id"):
+            ordering.append("pk")
+        return ordering
+
+    def invert(self, field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def seek(self, queryset, position, reverse):
+        """
+        Оставляет объекты, идущие после позиции position в порядке
+        сортировки (или перед ней, если reverse). Условие на первое поле
+        без учета остальных позволяет базе начать просмотр индекса сразу
+        с позиции курсора.
+        """
+        position = self.parse_position(queryset.model, position)
+        condition, equal = Q(), Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") != reverse else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        first = self.ordering[0]
+        lookup = "lte" if first.startswith("-") != reverse else "gte"
+        try:
+            return queryset.filter(
+                Q(**{f"{first.lstrip('-')}__{lookup}": position[0]}),
+                condition,
+            )
+        except (ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def parse_position(self, model, position):
+        """
+        Приводит значения позиции из курсора к типам полей сортировки.
+        Курсор приходит от клиента, поэтому позиция другой длины, пустые
+        и составные значения считаются неверным курсором.
+        """
+        if not isinstance(position, list) or len(position) != len(
+            self.ordering
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        values = []
+        for field, value in zip(self.ordering, position):
+            if value is None or isinstance(value, (list, dict)):
+                raise NotFound(self.invalid_cursor_message)
+            name = field.lstrip("-")
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                model_field = model._meta.pk if name == "pk" else None
+            if model_field is None:
+                # аннотация или поле связанной модели: тип проверит filter
+                values.append(value)
+                continue
+            try:
+                values.append(model_field.to_python(value))
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_position(self, instance):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            try:
+                attname = instance._meta.get_field(name).attname
+            except FieldDoesNotExist:
+                attname = "pk" if name == "pk" else name
+            position.append(getattr(instance, attname))
+        return position
+
+    def encode_cursor(self, position, reverse=False):
+        payload = json.dumps({"position": position, "reverse": reverse})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return {
+                "position": cursor["position"],
+                "reverse": bool(cursor["reverse"]),
+            }
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_link(self, instance, reverse):
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(self.get_position(instance), reverse),
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(self.page[0], reverse=True)
+
+
 class LimitPageNumberPagination(PageNumberPagination):
+    """
+    Постраничная навигация по номеру страницы с параметром limit.
+    Параметр pagination=cursor или наличие cursor в запросе переключают
+    ответ на навигацию по ключу без подсчета общего количества; готовые
+    последовательности (не QuerySet) всегда делятся по номеру страницы.
+    """
+
     page_size = PAGE_SIZE
     page_size_query_param = "limit"
+    mode_query_param = "pagination"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if isinstance(queryset, QuerySet) and (
+            KeysetPagination.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == "cursor"
+        ):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
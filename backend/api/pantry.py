@@ -0,0 +1,182 @@
+import fcntl
+import mmap
+import os
+import shutil
+from contextlib import contextmanager
+from threading import Lock
+
+from django.conf import settings
+
+from core.pantry import (PantryIndex, format_change, parse_changes,
+                         read_generation, write_index)
+from core.routers import use_primary
+from recipes.models import IngredientRecipe
+
+# количество строк, получаемых из базы данных за раз при построении
+CHUNK_SIZE = 50_000
+
+
+@contextmanager
+def locked(path, blocking=True):
+    """
+    Межпроцессная блокировка на файле path. Возвращает, получена ли
+    она: без blocking занятая блокировка не ожидается.
+    """
+    with open(path, "a") as file:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(file, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class PantryStore:
+    """
+    Индекс "что приготовить из имеющихся ингредиентов", общий для
+    процессов через файлы в PANTRY_INDEX_DIR.
+
+    Снимок индекса строится по IngredientRecipe и отображается в память
+    каждого процесса. Изменения рецептов после построения дописываются
+    в журнал поколения снимка целиком (все ингредиенты рецепта), и
+    процессы перед поиском дочитывают журнал с места, где остановились.
+    Перестроение снимка переносит в журнал нового поколения строки,
+    дописанные за время построения, и заменяет файл атомарно. Журнал
+    длиннее PANTRY_LOG_MAX_BYTES перестраивается записавшим его
+    процессом: иначе каждый поиск разбирал бы все изменения поверх
+    снимка.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._index = None
+        self._inode = None
+        self._log_offset = 0
+
+    @property
+    def directory(self):
+        return settings.PANTRY_INDEX_DIR
+
+    @property
+    def path(self):
+        return self.directory / "pantry.idx"
+
+    def log_path(self, generation):
+        return self.directory / f"pantry.{generation}.log"
+
+    def locked(self, name="pantry.lock", blocking=True):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return locked(self.directory / name, blocking)
+
+    def current_generation(self):
+        try:
+            with open(self.path, "rb") as file:
+                return read_generation(file) or 0
+        except FileNotFoundError:
+            return 0
+
+    def record(self, recipe_id, deleted=False):
+        """
+        Дописывает в журнал текущие ингредиенты рецепта. Чтение из базы
+        и запись идут под блокировкой, поэтому последняя строка рецепта
+        в журнале отражает его последнее состояние. Переполненный журнал
+        сворачивается в новый снимок.
+        """
+        with self.locked():
+            ingredients = (
+                ()
+                if deleted
+                else IngredientRecipe.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list("ingredient_id", flat=True)
+            )
+            line = format_change(recipe_id, ingredients)
+            with open(self.log_path(self.current_generation()), "a") as log:
+                log.write(line)
+                size = log.tell()
+        if size >= settings.PANTRY_LOG_MAX_BYTES:
+            # журнал уже сворачивает другой процесс
+            self.rebuild(blocking=False)
+
+    def rebuild(self, missing_only=False, blocking=True):
+        """
+        Строит снимок заново по базе данных. Одновременно строит только
+        один процесс; с missing_only снимок строится, только если его еще
+        нет, - остальные процессы дожидаются чужого построения. Без
+        blocking построение пропускается, если его уже ведет другой
+        процесс.
+        """
+        with self.locked("pantry.build.lock", blocking) as acquired:
+            if acquired and not (missing_only and self.path.exists()):
+                self.build()
+
+    def build(self):
+        with self.locked():
+            generation = self.current_generation()
+            log_path = self.log_path(generation)
+            offset = log_path.stat().st_size if log_path.exists() else 0
+
+        pairs = IngredientRecipe.objects.values_list(
+            "recipe_id", "ingredient_id"
+        ).iterator(chunk_size=CHUNK_SIZE)
+        temporary = self.directory / f"pantry.idx.{os.getpid()}"
+        # журнал до offset уже должен входить в прочитанное
+        with use_primary(), open(temporary, "wb") as file:
+            write_index(file, pairs, generation + 1)
+
+        with self.locked():
+            # строки, дописанные во время построения, могут быть новее
+            # прочитанного из базы и переносятся в новый журнал
+            with open(self.log_path(generation + 1), "wb") as new_log:
+                if log_path.exists():
+                    with open(log_path, "rb") as old_log:
+                        old_log.seek(offset)
+                        shutil.copyfileobj(old_log, new_log)
+            os.replace(temporary, self.path)
+        if log_path.exists():
+            log_path.unlink()
+
+    def load(self):
+        with open(self.path, "rb") as file:
+            inode = os.fstat(file.fileno()).st_ino
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = PantryIndex(buffer)
+        self._inode = inode
+        self._log_offset = 0
+
+    def read_log(self):
+        """Учитывает строки журнала, дописанные после прошлого чтения."""
+        try:
+            with open(self.log_path(self._index.generation), "rb") as log:
+                log.seek(self._log_offset)
+                data = log.read()
+        except FileNotFoundError:
+            return
+        # строка, которую еще дописывают, дочитывается в следующий раз
+        data = data[: data.rfind(b"\n") + 1]
+        self._log_offset += len(data)
+        self._index.apply(parse_changes(data.decode()))
+
+    def ensure_fresh(self):
+        with self._lock:
+            if not self.path.exists():
+                self.rebuild(missing_only=True)
+            inode = self.path.stat().st_ino
+            if inode != self._inode:
+                self.load()
+            self.read_log()
+            return self._index
+
+    def search(self, ingredients):
+        """
+        Рецепты, в которых есть хотя бы один из ingredients, в порядке
+        убывания доли имеющихся ингредиентов (см. PantryMatches).
+        """
+        return self.ensure_fresh().search(ingredients)
+
+
+pantry_index = PantryStore()
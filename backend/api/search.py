@@ -0,0 +1,81 @@
+from bisect import bisect_left
+from threading import Lock
+
+from core.cache import bump_version, get_version
+from core.routers import use_primary
+from recipes.models import Ingredient
+
+INGREDIENT_INDEX_VERSION = "ingredient-index-version"
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Хранит отсортированный массив суффиксов названий: поиск подстроки
+    сводится к бинарному поиску по суффиксам, начинающимся с запроса.
+    Индекс строится при первом обращении и перестраивается, когда версия
+    каталога в базе данных меняется; версия перечитывается не чаще раза
+    в DATA_VERSION_TTL секунд, поэтому поиск обычно не обращается к базе.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._items = []
+        self._names = []
+        self._suffixes = []
+
+    def build(self):
+        items = [
+            {"id": pk, "name": name, "measurement_unit": measurement_unit}
+            for pk, name, measurement_unit in Ingredient.objects.order_by(
+                "name", "id"
+            ).values_list("id", "name", "measurement_unit")
+        ]
+        names = [item["name"].lower() for item in items]
+        suffixes = sorted(
+            (name[offset:], position)
+            for position, name in enumerate(names)
+            for offset in range(len(name))
+        )
+        return items, names, suffixes
+
+    def ensure_fresh(self):
+        version = get_version(INGREDIENT_INDEX_VERSION)
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                with use_primary():
+                    self._items, self._names, self._suffixes = self.build()
+                self._version = version
+
+    def search(self, query):
+        """
+        Возвращает ингредиенты, в названии которых встречается query:
+        сначала совпадения по началу названия, затем остальные, внутри
+        каждой группы по алфавиту.
+        """
+        self.ensure_fresh()
+        query = query.lower()
+        suffixes = self._suffixes
+        positions = set()
+        index = bisect_left(suffixes, (query,))
+        while index < len(suffixes) and suffixes[index][0].startswith(query):
+            positions.add(suffixes[index][1])
+            index += 1
+
+        prefix, substring = [], []
+        for position in sorted(positions):
+            if self._names[position].startswith(query):
+                prefix.append(self._items[position])
+            else:
+                substring.append(self._items[position])
+        return prefix + substring
+
+    def invalidate(self):
+        bump_version(INGREDIENT_INDEX_VERSION)
+
+
+ingredient_index = IngredientIndex()
@@ -1,13 +1,36 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.relations import SlugRelatedField
 from rest_framework.validators import UniqueTogetherValidator
-
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import (TokenObtainPairSerializer,
+                                                  TokenRefreshSerializer)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from api.authentication import (PASSWORD_CLAIM, SignedRefreshToken,
+                                password_fingerprint, user_claims)
+from api.images import variant_urls
+from api.subscriptions import get_recipes_limit, load_subscription_data
+from core.constraints import MAX_BULK_RECIPES, MAX_PANTRY_INGREDIENTS
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 from users.models import CustomUser, Subscription
 
 
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные варианты картинки рецепта в WebP и JPEG."""
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return variant_urls(recipe, self.context.get("request"))
+
+
 class CustomUserSerializer(serializers.ModelSerializer):
     """Сериализатор для просмотра аккаунтов пользователя."""
 
@@ -32,20 +55,19 @@ class CustomUserSerializer(serializers.ModelSerializer):
         """
         request = self.context.get("request")
 
-        return bool(
-            request
-            and request.user.is_authenticated
-            and Subscription.objects.filter(
-                user=request.user, author=obj
-            ).exists()
-        )
+        if not (request and request.user.is_authenticated):
+            return False
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
+        return Subscription.objects.filter(
+            user=request.user, author=obj
+        ).exists()
 
 
 class SubscribeSerializer(CustomUserSerializer):
     """Сериализатор для подписки."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
@@ -55,22 +77,19 @@ class SubscribeSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, obj):
-        """Возвращает список рецептов."""
-        request = self.context["request"]
-        limit = request.GET.get("recipes_limit")
-        queryset = Recipe.objects.filter(author=obj)
-        if limit:
-            try:
-                limit = int(limit)
-            except ValueError:
-                pass
-            queryset = queryset[:limit]
+        """
+        Возвращает список рецептов. Рецепты, подгруженные заранее
+        load_subscription_data, берутся из атрибута limited_recipes.
+        """
+        if hasattr(obj, "limited_recipes"):
+            queryset = obj.limited_recipes
+        else:
+            queryset = Recipe.objects.filter(author=obj)
+            limit = get_recipes_limit(self.context["request"])
+            if limit is not None:
+                queryset = queryset[:limit]
         return AbridgedRecipeSerializer(queryset, many=True).data
 
-    def get_recipes_count(self, obj):
-        """Возвращает количество рецептов."""
-        return Recipe.objects.filter(author=obj.id).count()
-
 
 class SubscribeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания подписки."""
@@ -105,9 +124,10 @@ class SubscribeCreateSerializer(serializers.ModelSerializer):
         return value
 
     def to_representation(self, instance):
-        return SubscribeSerializer(
-            instance=instance.author, context=self.context
-        ).data
+        (author,) = load_subscription_data(
+            [instance.author], self.context["request"]
+        )
+        return SubscribeSerializer(instance=author, context=self.context).data
 
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
@@ -169,6 +189,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -181,6 +202,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         )
@@ -193,13 +215,11 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         """
         request = self.context.get("request")
 
-        return bool(
-            request
-            and request.user.is_authenticated
-            and Recipe.objects.filter(
-                favorite__user=request.user, id=obj.id
-            ).exists(),
-        )
+        if not (request and request.user.is_authenticated):
+            return False
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
+        return Favorite.objects.filter(user=request.user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         """
@@ -209,19 +229,23 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         """
         request = self.context.get("request")
 
-        return bool(
-            request
-            and request.user.is_authenticated
-            and Recipe.objects.filter(
-                shoppingcart__user=request.user, id=obj.id
-            ).exists(),
-        )
+        if not (request and request.user.is_authenticated):
+            return False
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
+        return ShoppingCart.objects.filter(
+            user=request.user, recipe=obj
+        ).exists()
 
 
 class IngredientCreateInRecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор создания ингредиентов в рецепте."""
+    """
+    Сериализатор создания ингредиентов в рецепте. Существование
+    ингредиентов проверяется одним запросом для всего рецепта в
+    RecipeCreateAndUpdateSerializer.validate_ingredients.
+    """
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = IngredientRecipe
@@ -232,6 +256,7 @@ class AbridgedRecipeSerializer(serializers.ModelSerializer):
     """Сокращенный сериализатор рецепта."""
 
     image = Base64ImageField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -239,6 +264,7 @@ class AbridgedRecipeSerializer(serializers.ModelSerializer):
             "id",
             "name",
             "image",
+            "image_variants",
             "cooking_time",
         )
         read_only_fields = (
@@ -277,15 +303,68 @@ class RecipeCreateAndUpdateSerializer(serializers.ModelSerializer):
             [
                 IngredientRecipe(
                     recipe=recipe,
-                    ingredient_id=ingredient_data.get("id"),
+                    ingredient_id=ingredient_data["id"],
                     amount=ingredient_data["amount"],
                 )
                 for ingredient_data in ingredients_data
             ]
         )
 
+    def update_ingredients(self, recipe, ingredients_data):
+        """
+        Приводит ингредиенты рецепта к ingredients_data, удаляя, изменяя и
+        добавляя только отличающиеся строки. Возвращает True, если
+        ингредиенты изменились.
+        """
+        amounts = {item["id"]: item["amount"] for item in ingredients_data}
+        current, changed, deleted = set(), [], []
+        # без сортировки модели по рецепту, которая соединяла бы таблицу
+        # рецептов; из повторов ингредиента остается первая строка
+        for item in recipe.ingredientes.order_by("pk"):
+            if item.ingredient_id not in amounts or (
+                item.ingredient_id in current
+            ):
+                deleted.append(item.pk)
+                continue
+            current.add(item.ingredient_id)
+            if item.amount != amounts[item.ingredient_id]:
+                item.amount = amounts[item.ingredient_id]
+                changed.append(item)
+        added = [
+            item for item in ingredients_data if item["id"] not in current
+        ]
+        if not (deleted or changed or added):
+            return False
+
+        ShoppingListItem.objects.remove_recipe(recipe.id)
+        if deleted:
+            IngredientRecipe.objects.filter(pk__in=deleted).delete()
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ["amount"])
+        if added:
+            self.create_ingredients(recipe, added)
+        ShoppingListItem.objects.add_recipe(recipe.id)
+        return True
+
+    def validate_ingredients(self, value):
+        """Проверяет существование всех ингредиентов одним запросом IN."""
+        ids = {item["id"] for item in value}
+        missing = ids - set(
+            Ingredient.objects.filter(pk__in=ids).values_list("pk", flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                [
+                    {"id": [f"Ингредиента с id {item['id']} не существует"]}
+                    if item["id"] in missing
+                    else {}
+                    for item in value
+                ]
+            )
+        return value
+
     def validate(self, data):
-        ingredients = self.initial_data.get("ingredients")
+        ingredients = data.get("ingredients")
         cooking_time = data.get("cooking_time")
         tags = data.get("tags")
         image = data.get("image")
@@ -313,9 +392,9 @@ class RecipeCreateAndUpdateSerializer(serializers.ModelSerializer):
         if len(tags) != len(set(tags)):
             raise serializers.ValidationError("Требуются неповторяющиеся теги")
 
-        data["ingredients"] = ingredients
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop("ingredients")
         tags_data = validated_data.pop("tags")
@@ -327,18 +406,24 @@ class RecipeCreateAndUpdateSerializer(serializers.ModelSerializer):
         recipe.tags.set(tags_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop("ingredients")
         tags_data = validated_data.pop("tags")
 
-        instance.ingredients.clear()
-
-        self.create_ingredients(instance, ingredients_data)
+        self.update_ingredients(instance, ingredients_data)
         instance.tags.set(tags_data)
 
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            Prefetch(
+                "ingredientes",
+                queryset=IngredientRecipe.objects.select_related("ingredient"),
+            ),
+        )
         return RecipeReadSerializer(instance, context=self.context).data
 
 
@@ -385,3 +470,74 @@ class FavoriteCreateSerializer(BaseUserRecipeSerializer):
                 message="Ошибка, вы уже добавили рецепт в избранное",
             ),
         ]
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для массовых операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES,
+        error_messages={
+            "max_length": f"Не больше {MAX_BULK_RECIPES} рецептов за раз."
+        },
+    )
+
+    def validate_recipes(self, value):
+        """Убирает повторы, сохраняя порядок id."""
+        return list(dict.fromkeys(value))
+
+
+class PantrySerializer(serializers.Serializer):
+    """Сериализатор списка id имеющихся у пользователя ингредиентов."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_PANTRY_INGREDIENTS,
+        error_messages={
+            "max_length": f"Не больше {MAX_PANTRY_INGREDIENTS} ингредиентов."
+        },
+    )
+
+
+class SignedTokenObtainSerializer(TokenObtainPairSerializer):
+    """
+    Вход по email и паролю с выдачей пары подписанных токенов: доступа
+    (с данными пользователя) и обновления.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = SignedRefreshToken.for_user(user)
+        for claim, value in user_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class SignedTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Выдает новый токен доступа по токену обновления. Пользователь
+    читается из базы, поэтому новый токен несет актуальные данные, а
+    удаленный или отключенный пользователь, как и токен, выданный до
+    смены пароля, токен не получит.
+    """
+
+    def validate(self, attrs):
+        refresh = SignedRefreshToken(attrs["refresh"])
+        user = CustomUser.objects.filter(
+            pk=refresh[jwt_settings.USER_ID_CLAIM], is_active=True
+        ).first()
+        if user is None:
+            raise AuthenticationFailed(
+                "Пользователь не найден или неактивен", code="user_not_found"
+            )
+        if refresh.get(PASSWORD_CLAIM) != password_fingerprint(user):
+            raise AuthenticationFailed(
+                "Пароль изменен, войдите заново", code="password_changed"
+            )
+        access = refresh.access_token
+        for claim, value in user_claims(user).items():
+            access[claim] = value
+        return {"access": str(access)}
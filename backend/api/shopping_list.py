@@ -0,0 +1,106 @@
+import csv
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from core.pdf import render_shopping_list_pdf
+from recipes.models import ShoppingListItem
+
+TITLE = "Список покупок"
+CSV_HEADER = ("Ингредиент", "Единица измерения", "Количество")
+
+# формат выгрузки -> тип содержимого
+EXPORT_FORMATS = {
+    "txt": "text/plain; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "pdf": "application/pdf",
+}
+
+# количество строк, получаемых из базы данных за раз
+CHUNK_SIZE = 500
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    Согласование для выгрузок: параметр format задает формат файла, а не
+    рендерер ответа, поэтому ошибки всегда отдаются первым рендерером.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_list(user):
+    """
+    Возвращает итератор по строкам (название, единица измерения, общее
+    количество) списка покупок пользователя. Суммы поддерживаются в
+    ShoppingListItem при изменении корзины, строки читаются частями.
+    """
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .values_list(
+            "ingredient__name",
+            "ingredient__measurement_unit",
+            "total_amount",
+        )
+        .order_by("ingredient__name", "ingredient__measurement_unit")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def text_lines(rows):
+    for number, (name, unit, amount) in enumerate(rows, start=1):
+        yield f"{number}. {name.capitalize()} ({unit}) - {amount}"
+
+
+def stream_txt(rows):
+    yield f"{TITLE}\n"
+    for line in text_lines(rows):
+        yield f"{line}\n"
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    # BOM, чтобы Excel открыл файл в UTF-8
+    yield "\ufeff" + writer.writerow(CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_pdf(rows):
+    """
+    Рендерит PDF в потоке запроса: ответ все равно ждет готовый файл, а
+    передача строк в другой процесс только добавила бы накладные расходы.
+    """
+    return render_shopping_list_pdf(
+        TITLE, list(text_lines(rows)), settings.PDF_FONT
+    )
+
+
+def shopping_list_response(user, export_format):
+    """Возвращает файл со списком покупок пользователя в формате."""
+    rows = shopping_list(user)
+    content_type = EXPORT_FORMATS[export_format]
+    if export_format == "pdf":
+        response = HttpResponse(render_pdf(rows), content_type=content_type)
+    elif export_format == "csv":
+        response = StreamingHttpResponse(
+            stream_csv(rows), content_type=content_type
+        )
+    else:
+        response = StreamingHttpResponse(
+            stream_txt(rows), content_type=content_type
+        )
+    response["Content-Disposition"] = (
+        f'attachment; filename="shopping_list.{export_format}"'
+    )
+    return response
@@ -0,0 +1,178 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from import_export.signals import post_import
+
+from api.catalogue import ingredient_catalogue, tag_catalogue
+from api.images import image_pipeline
+from api.pantry import pantry_index
+from api.search import ingredient_index
+from core.counters import change_counter
+from recipes.models import (Favorite, FeedItem, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import CustomUser, Subscription
+
+# поля автора, входящие в закэшированное представление рецепта
+AUTHOR_FIELDS = {"email", "username", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    """
+    Сбрасывает индекс и готовый каталог ингредиентов после фиксации
+    изменений.
+    """
+    transaction.on_commit(ingredient_index.invalidate)
+    transaction.on_commit(ingredient_catalogue.invalidate)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_catalogue(**kwargs):
+    """Сбрасывает готовый каталог тегов после фиксации изменений."""
+    transaction.on_commit(tag_catalogue.invalidate)
+
+
+@receiver(post_import)
+def invalidate_ingredient_index_after_import(model, **kwargs):
+    """Сбрасывает индекс и каталог ингредиентов после импорта в админке."""
+    if model is Ingredient:
+        transaction.on_commit(ingredient_index.invalidate)
+        transaction.on_commit(ingredient_catalogue.invalidate)
+
+
+@receiver(post_save, sender=CustomUser)
+def bump_author_recipes_version(instance, created, update_fields, **kwargs):
+    """
+    Увеличивает версии рецептов автора, если изменились его данные,
+    показываемые в рецептах.
+    """
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    Recipe.objects.filter(author=instance).update(version=F("version") + 1)
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_variants(instance, **kwargs):
+    """Ставит в очередь построение вариантов новой картинки рецепта."""
+    source = instance.image.name
+    if source and instance.image_variants.get("source") != source:
+        transaction.on_commit(partial(image_pipeline.schedule, source))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    """Добавляет ингредиенты рецепта в список покупок пользователя."""
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            instance.recipe_id, instance.user_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    """
+    Вычитает ингредиенты рецепта из списка покупок до удаления строки
+    корзины, в том числе при каскадном удалении рецепта.
+    """
+    ShoppingListItem.objects.remove_recipe(
+        instance.recipe_id, instance.user_id
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def count_author_recipes(instance, signal, created=False, **kwargs):
+    """Изменяет счетчик рецептов автора при создании и удалении рецепта."""
+    if signal is post_save and not created:
+        return
+    change_counter(
+        CustomUser.objects.filter(pk=instance.author_id),
+        "recipes_count",
+        1 if created else -1,
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def count_recipe_users(sender, instance, signal, created=False, **kwargs):
+    """
+    Изменяет счетчик добавлений рецепта в избранное или корзины при
+    создании и удалении строки.
+    """
+    if signal is post_save and not created:
+        return
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id),
+        sender.counter_field,
+        1 if created else -1,
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    """Раскладывает новый рецепт по лентам подписчиков автора."""
+    if created:
+        FeedItem.objects.add_recipe(instance.pk)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def follow_author(instance, signal, created=False, **kwargs):
+    """
+    Изменяет счетчик подписчиков автора и добавляет его рецепты в ленту
+    подписчика или убирает их оттуда.
+    """
+    if signal is post_save and not created:
+        return
+    change_counter(
+        CustomUser.objects.filter(pk=instance.author_id),
+        "subscribers_count",
+        1 if created else -1,
+    )
+    if created:
+        FeedItem.objects.add_subscription(
+            instance.user_id, instance.author_id
+        )
+    else:
+        FeedItem.objects.remove_subscription(
+            instance.user_id, instance.author_id
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def expire_similar_recipes(instance, **kwargs):
+    """
+    Помечает для пересчета рецепты, в списках похожих которых был
+    удаляемый рецепт: строки списков удалятся каскадом.
+    """
+    Recipe.objects.filter(neighbours__similar_id=instance.pk).update(
+        similar_version=0
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def record_recipe_ingredients(instance, signal, update_fields=None, **kwargs):
+    """
+    Передает индексу поиска по имеющимся ингредиентам новый состав
+    рецепта после фиксации изменений. Сохранения без увеличения версии
+    рецепта (служебные поля) ингредиенты не меняют.
+    """
+    if signal is post_save and not (
+        update_fields is None or "version" in update_fields
+    ):
+        return
+    transaction.on_commit(
+        partial(
+            pantry_index.record,
+            instance.pk,
+            deleted=signal is post_delete,
+        )
+    )
@@ -0,0 +1,62 @@
+from recipes.models import Recipe
+from users.models import Subscription
+
+RECIPES_LIMIT_PARAM = "recipes_limit"
+
+# поля, нужные сокращенному сериализатору рецепта
+ABRIDGED_RECIPE_FIELDS = (
+    "name",
+    "image",
+    "image_variants",
+    "cooking_time",
+)
+
+
+def get_recipes_limit(request):
+    """
+    Возвращает количество рецептов автора из параметра recipes_limit
+    или None, если параметр не задан или задан неверно.
+    """
+    try:
+        limit = int(request.query_params[RECIPES_LIMIT_PARAM])
+    except (KeyError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def load_subscription_data(authors, request):
+    """
+    Подгружает для страницы авторов все, что выводит SubscribeSerializer,
+    двумя запросами независимо от количества авторов: флаг is_subscribed
+    и первые recipes_limit рецептов каждого автора в атрибуте
+    limited_recipes. Количество рецептов хранится в самом пользователе.
+    """
+    authors = list(authors)
+    if not authors:
+        return authors
+    ids = [author.id for author in authors]
+
+    user = request.user
+    subscribed = set()
+    if user.is_authenticated:
+        subscribed = set(
+            Subscription.objects.filter(user=user, author_id__in=ids)
+            .order_by()
+            .values_list("author_id", flat=True)
+        )
+    recipes = Recipe.objects.filter(author_id__in=ids).only(
+        "author_id", *ABRIDGED_RECIPE_FIELDS
+    )
+    limit = get_recipes_limit(request)
+    if limit is None:
+        recipes = recipes.order_by("author_id", *Recipe._meta.ordering)
+    else:
+        recipes = recipes.first_per_author(ids, limit)
+    by_author = {}
+    for recipe in recipes:
+        by_author.setdefault(recipe.author_id, []).append(recipe)
+
+    for author in authors:
+        author.is_subscribed = author.id in subscribed
+        author.limited_recipes = by_author.get(author.id, [])
+    return authors
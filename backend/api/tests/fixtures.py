@@ -0,0 +1,101 @@
+from django.core.cache import caches
+
+from core.cache import forget_versions
+from recipes.models import (DataVersion, Ingredient, IngredientRecipe, Recipe,
+                            Tag)
+from users.models import CustomUser
+
+TAGS = (
+    ("Завтрак", "#E26C2D", "breakfast"),
+    ("Обед", "#49B64E", "lunch"),
+    ("Ужин", "#8775D2", "dinner"),
+)
+
+
+def create_user(number):
+    return CustomUser.objects.create_user(
+        email=f"user{number}@example.com",
+        username=f"user{number}",
+        first_name=f"Имя{number}",
+        last_name=f"Фамилия{number}",
+        password="test-password",
+    )
+
+
+def create_authors(count, start=100):
+    """Пользователи без пароля: хэширование тысяч паролей слишком долгое."""
+    CustomUser.objects.bulk_create(
+        CustomUser(
+            email=f"author{number}@example.com",
+            username=f"author{number}",
+            first_name=f"Имя{number}",
+            last_name=f"Фамилия{number}",
+            password="!",
+        )
+        for number in range(start, start + count)
+    )
+    return list(
+        CustomUser.objects.filter(username__startswith="author").order_by(
+            "id"
+        )
+    )
+
+
+def create_catalogue():
+    """Теги и ингредиенты, из которых собираются рецепты."""
+    Tag.objects.bulk_create(
+        Tag(name=name, color=color, slug=slug) for name, color, slug in TAGS
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f"ингредиент {number}", measurement_unit="г")
+        for number in range(10)
+    )
+    # SQLite не возвращает id из bulk_create
+    return list(Tag.objects.order_by("id")), list(
+        Ingredient.objects.order_by("id")
+    )
+
+
+def create_recipes(author, count, tags, ingredients):
+    """
+    Рецепты автора с двумя тегами и тремя ингредиентами каждый, как в
+    наборе данных бенчмарков: без сигналов и обработки картинок.
+    """
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f"Рецепт {author.username} {number:03}",
+            text=f"Описание рецепта {number}",
+            image="recipes/images/test.png",
+            cooking_time=10 + number,
+        )
+        for number in range(count)
+    )
+    recipes = list(Recipe.objects.filter(author=author).order_by("id"))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for number, recipe in enumerate(recipes)
+        for tag in (tags[number % len(tags)], tags[(number + 1) % len(tags)])
+    )
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(
+            recipe_id=recipe.id,
+            ingredient_id=ingredients[(number + shift) % len(ingredients)].id,
+            amount=100 + shift,
+        )
+        for number, recipe in enumerate(recipes)
+        for shift in range(3)
+    )
+    return recipes
+
+
+def clear_caches():
+    """
+    Кэши и копии данных в памяти процесса (индекс и каталоги) живут между
+    тестами, а версии данных откатываются вместе с тестовой транзакцией.
+    """
+    for alias in ("default", "recipes"):
+        caches[alias].clear()
+    forget_versions()
+    for key in DataVersion.objects.values_list("key", flat=True):
+        DataVersion.objects.bump(key)
@@ -0,0 +1,43 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import PASSWORD_CLAIM
+from api.tests.fixtures import create_user
+
+
+class SignedTokenRefreshTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(1)
+
+    def setUp(self):
+        self.client = APIClient()
+        response = self.client.post(
+            "/api/auth/jwt/create/",
+            {"email": self.user.email, "password": "test-password"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.tokens = response.data
+
+    def refresh(self):
+        return self.client.post(
+            "/api/auth/jwt/refresh/", {"refresh": self.tokens["refresh"]}
+        )
+
+    def test_refresh(self):
+        response = self.refresh()
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.data["access"])
+        self.assertEqual(access["email"], self.user.email)
+        self.assertNotIn(PASSWORD_CLAIM, access.payload)
+        self.assertNotIn(
+            PASSWORD_CLAIM, AccessToken(self.tokens["access"]).payload
+        )
+
+    def test_refresh_after_password_change(self):
+        self.user.set_password("new-password")
+        self.user.save()
+        response = self.refresh()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data["code"], "password_changed")
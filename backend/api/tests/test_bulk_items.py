@@ -0,0 +1,143 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (clear_caches, create_catalogue, create_recipes,
+                                create_user)
+from recipes.models import Favorite, Recipe, ShoppingCart, ShoppingListItem
+
+MISSING = 10_000
+
+
+class BulkItemsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.user = create_user(1)
+        cls.other = create_user(2)
+        cls.recipes = create_recipes(create_user(3), 3, tags, ingredients)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def statuses(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [
+            (item["id"], item["status"]) for item in response.data["recipes"]
+        ]
+
+    def counters(self, field):
+        return list(
+            Recipe.objects.filter(pk__in=[r.pk for r in self.recipes])
+            .order_by("pk")
+            .values_list(field, flat=True)
+        )
+
+    def test_add_reports_added_existing_and_missing(self):
+        first, second, third = self.recipes
+        Favorite.objects.create(user=self.user, recipe=third)
+        Favorite.objects.create(user=self.other, recipe=third)
+        response = self.client.post(
+            "/api/recipes/favorite/",
+            {"recipes": [third.pk, MISSING, first.pk, second.pk, first.pk]},
+            format="json",
+        )
+        self.assertEqual(
+            self.statuses(response),
+            [
+                (third.pk, "exists"),
+                (MISSING, "not_found"),
+                (first.pk, "added"),
+                (second.pk, "added"),
+            ],
+        )
+        self.assertEqual(self.counters("favorites_count"), [1, 1, 2])
+        self.assertEqual(
+            Favorite.objects.filter(user=self.user).count(), 3
+        )
+
+    def test_row_inserted_concurrently_is_not_counted_twice(self):
+        first, second, _ = self.recipes
+        # строка появилась после проверки уже добавленных: проверка ее
+        # не видит, а INSERT пропускает
+        ShoppingCart.objects.create(user=self.user, recipe=first)
+        with mock.patch.object(
+            ShoppingCart.objects,
+            "filter",
+            return_value=ShoppingCart.objects.none(),
+        ):
+            response = self.client.post(
+                "/api/recipes/shopping_cart/",
+                {"recipes": [first.pk, second.pk]},
+                format="json",
+            )
+        self.assertEqual(
+            self.statuses(response),
+            [(first.pk, "exists"), (second.pk, "added")],
+        )
+        self.assertEqual(self.counters("in_carts_count"), [1, 1, 0])
+        # у рецептов общие ингредиенты 1 и 2, первый учтен один раз
+        self.assertEqual(
+            list(
+                ShoppingListItem.objects.filter(user=self.user)
+                .order_by("ingredient_id")
+                .values_list("total_amount", flat=True)
+            ),
+            [100, 201, 203, 102],
+        )
+
+    def test_remove_reports_removed_and_absent(self):
+        first, second, third = self.recipes
+        for recipe in (first, second):
+            Favorite.objects.create(user=self.user, recipe=recipe)
+        Favorite.objects.create(user=self.other, recipe=first)
+        response = self.client.delete(
+            "/api/recipes/favorite/",
+            {"recipes": [first.pk, third.pk, MISSING]},
+            format="json",
+        )
+        self.assertEqual(
+            self.statuses(response),
+            [(first.pk, "removed"), (third.pk, "absent"), (MISSING, "absent")],
+        )
+        self.assertEqual(self.counters("favorites_count"), [1, 1, 0])
+        self.assertEqual(
+            list(
+                Favorite.objects.filter(user=self.user).values_list(
+                    "recipe_id", flat=True
+                )
+            ),
+            [second.pk],
+        )
+
+    def test_remove_from_cart_updates_shopping_list(self):
+        first, second, _ = self.recipes
+        self.client.post(
+            "/api/recipes/shopping_cart/",
+            {"recipes": [first.pk, second.pk]},
+            format="json",
+        )
+        self.client.delete(
+            "/api/recipes/shopping_cart/",
+            {"recipes": [first.pk]},
+            format="json",
+        )
+        self.assertEqual(self.counters("in_carts_count"), [0, 1, 0])
+        self.assertEqual(
+            list(
+                ShoppingListItem.objects.filter(user=self.user)
+                .order_by("ingredient_id")
+                .values_list("ingredient_id", "total_amount")
+            ),
+            [
+                (ingredient.pk, amount)
+                for ingredient, amount in zip(
+                    Recipe.objects.get(pk=second.pk)
+                    .ingredients.order_by("pk"),
+                    (100, 101, 102),
+                )
+            ],
+        )
@@ -0,0 +1,51 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import SignedTokenAuthentication, user_claims
+from api.tests.fixtures import create_catalogue, create_recipes, create_user
+from users.models import CustomUser
+
+
+class CounterFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.author = create_user(1)
+        create_recipes(cls.author, 3, tags, ingredients)
+        CustomUser.objects.recount()
+
+    def test_save_keeps_counters(self):
+        stale = CustomUser.objects.get(pk=self.author.pk)
+        CustomUser.objects.filter(pk=self.author.pk).update(recipes_count=5)
+        stale.first_name = "Новое"
+        stale.save()
+        author = CustomUser.objects.get(pk=self.author.pk)
+        self.assertEqual(author.first_name, "Новое")
+        self.assertEqual(author.recipes_count, 5)
+
+    def test_save_does_not_load_deferred_fields(self):
+        token = AccessToken.for_user(self.author)
+        token.payload.update(user_claims(self.author))
+        for name, instance in {
+            "only": CustomUser.objects.only("first_name").get(
+                pk=self.author.pk
+            ),
+            "signed token": SignedTokenAuthentication().get_user(token),
+        }.items():
+            with self.subTest(instance=name):
+                instance.first_name = f"Новое {name}"
+                with CaptureQueriesContext(connection) as queries:
+                    instance.save()
+                self.assertFalse(
+                    [
+                        query["sql"]
+                        for query in queries
+                        if query["sql"].startswith("SELECT")
+                    ]
+                )
+                author = CustomUser.objects.get(pk=self.author.pk)
+                self.assertEqual(author.first_name, f"Новое {name}")
+                self.assertEqual(author.password, self.author.password)
+                self.assertEqual(author.recipes_count, 3)
@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+from unittest import skipUnless
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.utils import InterfaceError, OperationalError
+from django.test import SimpleTestCase, TestCase
+
+from core.db import pool
+from core.db.pool import ConnectionPool, connection_stats, get_pool
+
+OPTIONS = {"MAX_SIZE": 2, "TIMEOUT": 1, "MAX_AGE": None, "CHECK_INTERVAL": 0}
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def alive(connection):
+    return True
+
+
+def broken(connection):
+    return False
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def make_pool(self, **options):
+        options = {**OPTIONS, **options}
+        alias = f"test-{self.id()}"
+        connection_stats.pop(alias, None)
+        return ConnectionPool(
+            alias,
+            max_size=options["MAX_SIZE"],
+            timeout=options["TIMEOUT"],
+            max_age=options["MAX_AGE"],
+            check_interval=options["CHECK_INTERVAL"],
+        )
+
+    def test_checkout_and_return(self):
+        connections = self.make_pool()
+        first = connections.acquire(FakeConnection, alive)
+        connections.release(first, alive)
+        self.assertEqual(connections.idle[0].connection, first)
+        self.assertIs(connections.acquire(FakeConnection, alive), first)
+        self.assertEqual(connections.stats["opened"], 1)
+        self.assertEqual(connections.stats["reused"], 1)
+        self.assertEqual(connections.stats["health_checks"], 1)
+
+    def test_max_size(self):
+        connections = self.make_pool(TIMEOUT=0.05)
+        taken = [connections.acquire(FakeConnection, alive) for _ in "ab"]
+        with self.assertRaises(OperationalError):
+            connections.acquire(FakeConnection, alive)
+        self.assertEqual(connections.size, 2)
+        self.assertEqual(connections.stats["timeouts"], 1)
+
+        connections.timeout = 1
+        timer = threading.Timer(
+            0.05, connections.release, (taken[0], alive)
+        )
+        timer.start()
+        self.assertIs(connections.acquire(FakeConnection, alive), taken[0])
+        timer.join()
+        # первое ожидание закончилось отказом
+        self.assertEqual(connections.stats["waits"], 2)
+        self.assertEqual(connections.stats["opened"], 2)
+
+    def test_broken_connection_is_discarded(self):
+        connections = self.make_pool()
+        first = connections.acquire(FakeConnection, alive)
+        connections.release(first, alive)
+        second = connections.acquire(FakeConnection, broken)
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(connections.size, 1)
+        self.assertEqual(connections.stats["failed_checks"], 1)
+        self.assertEqual(connections.stats["discarded"], 1)
+
+    def test_recently_released_connection_is_not_checked(self):
+        connections = self.make_pool(CHECK_INTERVAL=60)
+        first = connections.acquire(FakeConnection, alive)
+        connections.release(first, alive)
+        self.assertIs(connections.acquire(FakeConnection, broken), first)
+        self.assertEqual(connections.stats["health_checks"], 0)
+
+    def test_failed_reset_and_max_age_discard(self):
+        connections = self.make_pool()
+        first = connections.acquire(FakeConnection, alive)
+        connections.release(first, broken)
+        self.assertTrue(first.closed)
+        self.assertEqual((connections.size, connections.idle), (0, []))
+
+        connections.max_age = 0
+        second = connections.acquire(FakeConnection, alive)
+        connections.release(second, alive)
+        self.assertTrue(second.closed)
+        self.assertEqual(connections.stats["discarded"], 2)
+
+    def test_failed_connect_and_forget_free_the_slot(self):
+        connections = self.make_pool(MAX_SIZE=1)
+
+        def refuse():
+            raise OperationalError("connection refused")
+
+        with self.assertRaises(OperationalError):
+            connections.acquire(refuse, alive)
+        self.assertEqual(connections.size, 0)
+        first = connections.acquire(FakeConnection, alive)
+        connections.forget(first)
+        self.assertEqual(connections.size, 0)
+        self.assertEqual(connections.stats["closed"], 1)
+
+    def test_child_process_gets_own_pools(self):
+        parent = get_pool("fork-test", {"host": "db"}, OPTIONS)
+        connection = parent.acquire(FakeConnection, alive)
+        parent.release(connection, alive)
+        self.addCleanup(pool._pools.clear)
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # в дочернем процессе результат передается через pipe, а
+            # выход - без обработчиков родителя
+            child = get_pool("fork-test", {"host": "db"}, OPTIONS)
+            ok = child is not parent and not child.idle and len(parent.idle)
+            os.write(write, b"1" if ok else b"0")
+            os._exit(0)
+        os.close(write)
+        result = os.read(read, 1)
+        os.close(read)
+        os.waitpid(pid, 0)
+        self.assertEqual(result, b"1")
+        self.assertIs(get_pool("fork-test", {"host": "db"}, OPTIONS), parent)
+        self.assertFalse(connection.closed)
+
+
+@skipUnless(connection.vendor == "postgresql", "нужен PostgreSQL")
+class PostgreSQLWrapperTests(TestCase):
+    """Обертка core.db.postgresql на отдельном соединении с тестовой базой."""
+
+    def make_wrapper(self, alias, **settings):
+        connection_stats.pop(alias, None)
+        default = connections[DEFAULT_DB_ALIAS]
+        wrapper = type(default)({**default.settings_dict, **settings}, alias)
+        # atomic находит соединение по псевдониму
+        connections[alias] = wrapper
+        self.addCleanup(connections.__delitem__, alias)
+        self.addCleanup(pool.close_idle, alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def backend_pid(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            return cursor.fetchone()[0]
+
+    def end_request(self, wrapper):
+        # так Django закрывает соединения по сигналу request_finished
+        wrapper.close_if_unusable_or_obsolete()
+
+    def pooled(self):
+        return self.make_wrapper(
+            "pool-test", CONN_MAX_AGE=0, POOL={**OPTIONS, "MAX_SIZE": 1}
+        )
+
+    def test_pooled_connection_is_returned_and_reused(self):
+        wrapper = self.pooled()
+        pid = self.backend_pid(wrapper)
+        self.end_request(wrapper)
+        self.assertIsNone(wrapper.connection)
+        self.assertEqual(len(wrapper.pool.idle), 1)
+        self.assertEqual(self.backend_pid(wrapper), pid)
+        self.assertEqual(connection_stats["pool-test"]["reused"], 1)
+
+    def test_connection_closed_inside_atomic_is_not_pooled(self):
+        wrapper = self.pooled()
+        with transaction.atomic(using=wrapper.alias):
+            self.backend_pid(wrapper)
+            self.end_request(wrapper)
+            # соединение с незавершенной транзакцией закрыто, а не
+            # возвращено в пул, и до конца блока не используется
+            self.assertTrue(wrapper.closed_in_transaction)
+            self.assertEqual((wrapper.pool.size, wrapper.pool.idle), (0, []))
+            with self.assertRaises(InterfaceError):
+                self.backend_pid(wrapper)
+        self.assertEqual(connection_stats["pool-test"]["closed"], 1)
+        self.assertTrue(self.backend_pid(wrapper))
+        self.assertEqual(connection_stats["pool-test"]["opened"], 2)
+
+    def test_terminated_connection_is_replaced(self):
+        wrapper = self.make_wrapper(
+            "health-test", CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True
+        )
+        pid = self.backend_pid(wrapper)
+        self.end_request(wrapper)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+        # дождаться, пока сервер закроет соединение
+        for _ in range(50):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM pg_stat_activity WHERE pid = %s", [pid]
+                )
+                if cursor.fetchone() is None:
+                    break
+            time.sleep(0.02)
+        self.end_request(wrapper)
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
+        self.assertEqual(connection_stats["health-test"]["failed_checks"], 1)
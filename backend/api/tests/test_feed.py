@@ -0,0 +1,151 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (clear_caches, create_catalogue, create_recipes,
+                                create_user)
+from recipes.models import FeedItem, Recipe
+from users.models import Subscription
+
+FEED_URL = "/api/recipes/feed/"
+
+
+class FeedTests(TestCase):
+    """
+    Ленты подписок: рецепты раскладываются по лентам при публикации и
+    подписке, убираются при отписке и удалении рецепта и читаются
+    страницами по ключу, новые первыми.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.user = create_user(1)
+        cls.other = create_user(2)
+        cls.author = create_user(3)
+        cls.second_author = create_user(4)
+        cls.recipes = create_recipes(
+            cls.author, 5, cls.tags, cls.ingredients
+        )
+        cls.second_recipes = create_recipes(
+            cls.second_author, 4, cls.tags, cls.ingredients
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def feed_ids(self, user):
+        return list(
+            FeedItem.objects.filter(user=user)
+            .order_by("recipe_id")
+            .values_list("recipe_id", flat=True)
+        )
+
+    def publish(self, author):
+        return Recipe.objects.create(
+            author=author,
+            name=f"Новый рецепт {author.username}",
+            text="Описание",
+            image="recipes/images/test.png",
+            cooking_time=5,
+        )
+
+    def read_feed(self, limit):
+        response = self.client.get(FEED_URL, {"limit": limit})
+        pages = [response]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            pages.append(response)
+        for page in pages:
+            self.assertEqual(page.status_code, 200)
+            self.assertLessEqual(len(page.data["results"]), limit)
+        return pages
+
+    @override_settings(FEED_INITIAL_RECIPES=3)
+    def test_subscribe_backfills_recent_recipes(self):
+        response = self.client.post(f"/api/users/{self.author.pk}/subscribe/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.feed_ids(self.user), [r.pk for r in self.recipes[-3:]]
+        )
+        self.assertEqual(self.feed_ids(self.other), [])
+
+    def test_new_recipe_is_fanned_out_to_subscribers(self):
+        Subscription.objects.create(user=self.user, author=self.author)
+        Subscription.objects.create(user=self.other, author=self.author)
+        recipe = self.publish(self.author)
+        for user in (self.user, self.other):
+            with self.subTest(user=user.username):
+                self.assertIn(recipe.pk, self.feed_ids(user))
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.author, recipe=recipe).exists()
+        )
+
+    def test_unsubscribe_removes_author_recipes(self):
+        for author in (self.author, self.second_author):
+            Subscription.objects.create(user=self.user, author=author)
+        Subscription.objects.create(user=self.other, author=self.author)
+        response = self.client.delete(
+            f"/api/users/{self.author.pk}/subscribe/"
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            self.feed_ids(self.user), [r.pk for r in self.second_recipes]
+        )
+        self.assertEqual(
+            self.feed_ids(self.other), [r.pk for r in self.recipes]
+        )
+
+    def test_deleted_recipe_leaves_feeds(self):
+        Subscription.objects.create(user=self.user, author=self.author)
+        Recipe.objects.filter(pk=self.recipes[0].pk).delete()
+        self.assertEqual(
+            self.feed_ids(self.user), [r.pk for r in self.recipes[1:]]
+        )
+
+    def test_pages_are_newest_first(self):
+        for author in (self.author, self.second_author):
+            Subscription.objects.create(user=self.user, author=author)
+        Subscription.objects.create(user=self.other, author=self.author)
+        latest = self.publish(self.author)
+        expected = sorted(
+            [r.pk for r in self.recipes + self.second_recipes] + [latest.pk],
+            reverse=True,
+        )
+        pages = self.read_feed(limit=4)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(
+            [r["id"] for page in pages for r in page.data["results"]],
+            expected,
+        )
+        self.assertIsNone(pages[0].data["previous"])
+        previous = self.client.get(pages[1].data["previous"])
+        self.assertEqual(
+            [r["id"] for r in previous.data["results"]],
+            [r["id"] for r in pages[0].data["results"]],
+        )
+
+    @override_settings(FEED_FANOUT_MAX_SUBSCRIBERS=1)
+    def test_popular_author_is_read_from_recipes(self):
+        Subscription.objects.create(user=self.user, author=self.second_author)
+        for user in (self.user, self.other):
+            Subscription.objects.create(user=user, author=self.author)
+        # у автора два подписчика: рецепт не раскладывается по лентам
+        latest = self.publish(self.author)
+        self.assertFalse(FeedItem.objects.filter(recipe=latest).exists())
+        expected = sorted(
+            [r.pk for r in self.recipes + self.second_recipes] + [latest.pk],
+            reverse=True,
+        )
+        self.assertEqual(
+            [
+                r["id"]
+                for page in self.read_feed(limit=4)
+                for r in page.data["results"]
+            ],
+            expected,
+        )
+
+    def test_anonymous(self):
+        self.assertEqual(APIClient().get(FEED_URL).status_code, 401)
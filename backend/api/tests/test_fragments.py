@@ -0,0 +1,148 @@
+from django.test import RequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from api.fragments import recipe_fragments
+from api.tests.fixtures import (clear_caches, create_catalogue, create_recipes,
+                                create_user)
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+
+class FragmentKeyTests(TestCase):
+    """
+    Изменение рецепта, его автора, тега или ингредиента меняет ключ
+    закэшированного представления, и ответ строится заново.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.author = create_user(1)
+        cls.recipe = create_recipes(
+            cls.author, 1, cls.tags, cls.ingredients
+        )[0]
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def fragment_key(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        prefix = recipe_fragments.get_prefix(RequestFactory().get("/"))
+        return f"{prefix}:{recipe.pk}:{recipe.version}"
+
+    def get_recipe(self):
+        response = self.client.get(f"/api/recipes/{self.recipe.pk}/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def change(self, action):
+        """
+        Выполняет action с сигналами после фиксации и возвращает новое
+        представление рецепта, проверив, что ключ кэша сменился.
+        """
+        self.get_recipe()
+        key = self.fragment_key()
+        self.assertIsNotNone(recipe_fragments.cache.get(key))
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+        new_key = self.fragment_key()
+        self.assertNotEqual(new_key, key)
+        data = self.get_recipe()
+        self.assertIsNotNone(recipe_fragments.cache.get(new_key))
+        return data
+
+    def test_tag_change(self):
+        tag = self.recipe.tags.order_by("pk").first()
+        tag.name = "Полдник"
+        data = self.change(tag.save)
+        self.assertIn("Полдник", [item["name"] for item in data["tags"]])
+
+    def test_ingredient_change(self):
+        ingredient = self.recipe.ingredients.order_by("pk").first()
+        ingredient.name = "соль"
+        data = self.change(ingredient.save)
+        self.assertIn(
+            "соль", [item["name"] for item in data["ingredients"]]
+        )
+
+    def test_recipe_change(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.name = "Новое название"
+        data = self.change(recipe.save)
+        self.assertEqual(data["name"], "Новое название")
+
+    def test_author_change(self):
+        self.author.first_name = "Другое"
+        data = self.change(
+            lambda: self.author.save(update_fields=["first_name"])
+        )
+        self.assertEqual(data["author"]["first_name"], "Другое")
+
+    def test_unrelated_changes_keep_key(self):
+        self.get_recipe()
+        key = self.fragment_key()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save(update_fields=["last_login"])
+            Favorite.objects.create(user=create_user(2), recipe=self.recipe)
+        self.assertEqual(self.fragment_key(), key)
+
+
+class FragmentOverlayTests(TestCase):
+    """
+    Закэшированное представление общее для всех пользователей: флаги
+    пользователя подставляются поверх него и не попадают в кэш.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        author = create_user(1)
+        cls.recipe = create_recipes(author, 1, tags, ingredients)[0]
+        cls.owner = create_user(2)
+        cls.other = create_user(3)
+        Favorite.objects.create(user=cls.owner, recipe=cls.recipe)
+        ShoppingCart.objects.create(user=cls.owner, recipe=cls.recipe)
+        Subscription.objects.create(user=cls.owner, author=author)
+
+    def setUp(self):
+        clear_caches()
+
+    def flags(self, user, url):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        data = client.get(url).data
+        if "results" in data:
+            (data,) = data["results"]
+        return (
+            data["is_favorited"],
+            data["is_in_shopping_cart"],
+            data["author"]["is_subscribed"],
+        )
+
+    def test_flags_are_per_user(self):
+        flags = {self.owner: (True, True, True), self.other: (False,) * 3}
+        for url in ("/api/recipes/", f"/api/recipes/{self.recipe.pk}/"):
+            # кэш заполняет то владелец флагов, то другой пользователь
+            for order in (
+                (self.owner, self.other, None),
+                (self.other, None, self.owner),
+            ):
+                clear_caches()
+                for user in order:
+                    with self.subTest(url=url, user=str(user)):
+                        self.assertEqual(
+                            self.flags(user, url),
+                            flags.get(user, (False,) * 3),
+                        )
+
+    def test_cached_fragment_has_no_user_flags(self):
+        self.flags(self.owner, f"/api/recipes/{self.recipe.pk}/")
+        prefix = recipe_fragments.get_prefix(RequestFactory().get("/"))
+        fragment = recipe_fragments.cache.get(
+            f"{prefix}:{self.recipe.pk}:{self.recipe.version}"
+        )
+        self.assertFalse(fragment["is_favorited"])
+        self.assertFalse(fragment["is_in_shopping_cart"])
+        self.assertFalse(fragment["author"]["is_subscribed"])
@@ -0,0 +1,79 @@
+import io
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import clear_caches
+from recipes.models import Ingredient
+
+DATA = Path(__file__).resolve().parent / "data"
+
+# уникальные строки data/ingredients.csv: повторы, пробелы по краям и
+# неполные строки пропускаются
+CSV_INGREDIENTS = {
+    ("соль", "г"),
+    ("сахар", "г"),
+    ("мука, пшеничная", "г"),
+    ("сахар", "кг"),
+    ("яйцо", "шт"),
+}
+
+
+class LoadIngredientsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def load(self, name, **options):
+        stdout = io.StringIO()
+        call_command(
+            "load_ingredients", DATA / name, stdout=stdout, **options
+        )
+        return stdout.getvalue()
+
+    def catalogue(self):
+        return set(
+            Ingredient.objects.values_list("name", "measurement_unit")
+        )
+
+    def test_csv(self):
+        # пачки по две строки: повторы попадают в разные пачки
+        output = self.load("ingredients.csv", batch_size=2)
+        self.assertIn("Прочитано 7 строк, добавлено 5 ингредиентов", output)
+        self.assertEqual(self.catalogue(), CSV_INGREDIENTS)
+
+    def test_rerun_changes_nothing(self):
+        self.load("ingredients.csv")
+        rows = set(Ingredient.objects.values_list("pk", "name"))
+        output = self.load("ingredients.csv")
+        self.assertIn("добавлено 0 ингредиентов", output)
+        self.assertEqual(
+            set(Ingredient.objects.values_list("pk", "name")), rows
+        )
+
+    def test_json_adds_only_new(self):
+        Ingredient.objects.create(name="соль", measurement_unit="г")
+        self.load("ingredients.csv")
+        output = self.load("ingredients.json", batch_size=3)
+        self.assertIn("Прочитано 7 строк, добавлено 1 ингредиентов", output)
+        self.assertEqual(
+            self.catalogue(), CSV_INGREDIENTS | {("молоко", "мл")}
+        )
+
+    def test_catalogue_is_refreshed(self):
+        client = APIClient()
+        self.assertEqual(client.get("/api/ingredients/").json(), [])
+        self.load("ingredients.csv")
+        response = client.get("/api/ingredients/", {"name": "сахар"})
+        self.assertEqual(
+            sorted(
+                (item["name"], item["measurement_unit"])
+                for item in response.json()
+            ),
+            [("сахар", "г"), ("сахар", "кг")],
+        )
+
+    def test_unsupported_format(self):
+        with self.assertRaisesMessage(CommandError, "нужен .csv или .json"):
+            self.load("ingredients.xlsx")
@@ -0,0 +1,126 @@
+import re
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (clear_caches, create_catalogue, create_recipes,
+                                create_user)
+from core.metrics import MetricsRegistry, RequestMetrics
+
+TIMING = re.compile(r'(\w+);dur=([\d.]+)(?:;desc="(\d+) queries")?')
+
+
+def server_timing(response):
+    return {
+        name: (float(duration), queries)
+        for name, duration, queries in TIMING.findall(
+            response["Server-Timing"]
+        )
+    }
+
+
+def sample(registry, name, view, status=200):
+    """Значение строки метрики name представления view."""
+    pattern = (
+        rf'^{name}{{view="{re.escape(view)}",method="GET",'
+        rf'status="{status}"}} ([\d.]+)$'
+    )
+    match = re.search(pattern, registry, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        create_recipes(create_user(1), 10, tags, ingredients)
+        cls.user = create_user(2)
+        cls.staff = create_user(3)
+        cls.staff.is_staff = True
+        cls.staff.save()
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def test_header_has_phases(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/recipes/")
+        timing = server_timing(response)
+        self.assertEqual(
+            set(timing), {"db", "serialize", "render", "total"}
+        )
+        self.assertEqual(timing["db"][1], str(len(queries)))
+        self.assertGreater(timing["serialize"][0], 0)
+        self.assertGreater(timing["render"][0], 0)
+        self.assertGreaterEqual(
+            timing["total"][0], timing["db"][0] + timing["serialize"][0]
+        )
+
+    @override_settings(SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        response = self.client.get("/api/tags/")
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_metrics_are_for_staff_only(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+        self.client.force_authenticate(self.staff)
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+    def test_counters_increase(self):
+        self.client.force_authenticate(self.staff)
+        before = self.client.get("/api/metrics/").content.decode()
+        for _ in range(3):
+            self.client.get("/api/recipes/")
+        after = self.client.get("/api/metrics/").content.decode()
+        view = "RecipeViewSet.list"
+        for name in (
+            "foodgram_request_duration_seconds_count",
+            "foodgram_request_duration_seconds_sum",
+            "foodgram_request_queries_total",
+            "foodgram_request_sql_seconds_total",
+            "foodgram_request_serialize_seconds_total",
+        ):
+            with self.subTest(metric=name):
+                self.assertGreater(
+                    sample(after, name, view), sample(before, name, view)
+                )
+        self.assertEqual(
+            sample(after, "foodgram_request_duration_seconds_count", view)
+            - sample(before, "foodgram_request_duration_seconds_count", view),
+            3,
+        )
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        metrics = RequestMetrics()
+        metrics.view = "TagViewSet.list"
+        metrics.queries = 2
+        for total in (0.003, 0.02, 0.02, 7):
+            registry.record(metrics, "GET", 200, total)
+        text = registry.render()
+        labels = 'view="TagViewSet.list",method="GET",status="200"'
+        for bound, count in (
+            ("0.005", 1), ("0.01", 1), ("0.025", 3), ("5", 3), ("10", 4),
+            ("+Inf", 4),
+        ):
+            with self.subTest(le=bound):
+                self.assertIn(
+                    "foodgram_request_duration_seconds_bucket"
+                    f'{{{labels},le="{bound}"}} {count}\n',
+                    text,
+                )
+        self.assertIn(
+            f"foodgram_request_queries_total{{{labels}}} 8\n", text
+        )
+        self.assertIn(
+            f"foodgram_request_duration_seconds_count{{{labels}}} 4\n", text
+        )
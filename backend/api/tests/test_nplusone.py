@@ -0,0 +1,45 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (clear_caches, create_authors, create_catalogue,
+                                create_recipes, create_user)
+from core.nplusone import NPlusOneError, assert_no_n_plus_one
+from recipes.models import Recipe
+from users.models import Subscription
+
+
+class NPlusOneTests(TestCase):
+    """Списки API не выполняют запрос на каждый объект страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.user = create_user(0)
+        authors = create_authors(10)
+        for author in authors:
+            create_recipes(author, 3, tags, ingredients)
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.user, author=author) for author in authors
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_lists(self):
+        for url in (
+            "/api/recipes/?limit=30",
+            "/api/users/?limit=30",
+            "/api/users/subscriptions/?limit=30",
+        ):
+            with self.subTest(url=url):
+                with assert_no_n_plus_one():
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_detects_query_per_object(self):
+        with self.assertRaisesRegex(NPlusOneError, "test_nplusone.py"):
+            with assert_no_n_plus_one():
+                for recipe in Recipe.objects.all():
+                    recipe.author.username
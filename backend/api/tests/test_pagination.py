@@ -0,0 +1,51 @@
+import base64
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (clear_caches, create_catalogue, create_recipes,
+                                create_user)
+
+
+def cursor(position, reverse=False):
+    payload = json.dumps({"position": position, "reverse": reverse})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        create_recipes(create_user(1), 12, tags, ingredients)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def test_pages_follow_next_links(self):
+        response = self.client.get(
+            "/api/recipes/", {"pagination": "cursor", "limit": 5}
+        )
+        names = [recipe["name"] for recipe in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            self.assertEqual(response.status_code, 200)
+            names += [recipe["name"] for recipe in response.data["results"]]
+        self.assertEqual(len(names), 12)
+        self.assertEqual(names, sorted(names))
+
+    def test_invalid_cursor_is_not_found(self):
+        invalid = {
+            "wrong type": cursor(["Рецепт", "x"]),
+            "null values": cursor([None, None]),
+            "object position": cursor({"name": "Рецепт", "id": 1}),
+            "nested value": cursor([["Рецепт"], 1]),
+            "wrong length": cursor(["Рецепт"]),
+            "not base64": "!!!",
+            "not an object": base64.urlsafe_b64encode(b"[1, 2]").decode(),
+        }
+        for name, value in invalid.items():
+            with self.subTest(cursor=name):
+                response = self.client.get("/api/recipes/", {"cursor": value})
+                self.assertEqual(response.status_code, 404)
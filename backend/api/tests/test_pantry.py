@@ -0,0 +1,159 @@
+import io
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import pantry
+from api.pantry import PantryStore
+from api.tests.fixtures import create_catalogue, create_recipes, create_user
+from core.pantry import (PantryIndex, add_bitmap, parse_changes, select,
+                         write_index)
+from recipes.models import IngredientRecipe
+
+
+def build_index(pairs, generation=1):
+    file = io.BytesIO()
+    write_index(file, pairs, generation)
+    return PantryIndex(file.getvalue())
+
+
+def recipes(bitmap):
+    return {
+        recipe_id
+        for recipe_id in range(bitmap.bit_length())
+        if bitmap >> recipe_id & 1
+    }
+
+
+class BitmapTests(SimpleTestCase):
+    def test_select_by_counter_value(self):
+        planes = []
+        # рецепт 1 встречается в одной карте, 2 - в двух, 3 - в трех
+        for bitmap in (0b1110, 0b1100, 0b1000):
+            add_bitmap(planes, bitmap)
+        self.assertEqual(len(planes), 2)
+        everything = 0b1111
+        self.assertEqual(recipes(select(planes, 0, everything)), {0})
+        self.assertEqual(recipes(select(planes, 1, everything)), {1})
+        self.assertEqual(recipes(select(planes, 2, everything)), {2})
+        self.assertEqual(recipes(select(planes, 3, everything)), {3})
+        # значение шире разрядов счетчика
+        self.assertEqual(select(planes, 4, everything), 0)
+        self.assertEqual(recipes(select(planes, 2, 0b0011)), set())
+
+    def test_rare_and_frequent_ingredients(self):
+        # 100 рецептов: карта занимает 13 байт, массив id - по 4 байта
+        # на рецепт, поэтому ингредиент трех рецептов хранится массивом,
+        # а четырех - картой
+        pairs = [(recipe_id, 1) for recipe_id in (1, 50, 99)]
+        pairs += [(recipe_id, 2) for recipe_id in (2, 3, 60, 98)]
+        index = build_index(pairs)
+        self.assertEqual(index.capacity, 13)
+        self.assertEqual(recipes(index.bitmap(1)), {1, 50, 99})
+        self.assertEqual(recipes(index.bitmap(2)), {2, 3, 60, 98})
+        self.assertEqual(index.bitmap(3), 0)
+
+    def test_order_by_share_of_available_ingredients(self):
+        index = build_index(
+            [(1, 10), (1, 11), (2, 10), (2, 11), (2, 12), (3, 10), (4, 12)]
+        )
+        matches = index.search({10, 11})
+        self.assertEqual(len(matches), 3)
+        # у 3 и 1 есть все ингредиенты, 3 короче
+        self.assertEqual(matches[0:10], [3, 1, 2])
+        self.assertEqual(matches[1:2], [1])
+
+
+class OverlayTests(SimpleTestCase):
+    def setUp(self):
+        self.index = build_index([(1, 10), (2, 10), (2, 11), (3, 11)])
+
+    def test_changed_recipe_replaces_snapshot(self):
+        self.index.apply({1: frozenset({12})})
+        self.assertEqual(self.index.search({10})[:10], [2])
+        self.assertEqual(self.index.search({12})[:10], [1])
+
+    def test_added_recipe(self):
+        self.index.apply(parse_changes("7 10 11\n"))
+        self.assertEqual(self.index.search({10, 11})[:10], [3, 1, 7, 2])
+
+    def test_deleted_recipe(self):
+        self.index.apply(parse_changes("2 10 11\n2\n"))
+        self.assertEqual(len(self.index.search({10, 11})), 2)
+        self.assertEqual(self.index.search({10, 11})[:10], [3, 1])
+
+
+class PantryStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags, cls.ingredients = create_catalogue()
+        cls.recipes = create_recipes(create_user(1), 5, tags, cls.ingredients)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PANTRY_INDEX_DIR=Path(directory.name))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.store = PantryStore()
+
+    def change_ingredients(self, recipe, ingredient):
+        IngredientRecipe.objects.filter(recipe=recipe).delete()
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1
+        )
+
+    def test_record_is_seen_before_rebuild(self):
+        self.store.ensure_fresh()
+        recipe, ingredient = self.recipes[0], self.ingredients[-1]
+        self.change_ingredients(recipe, ingredient)
+        self.store.record(recipe.pk)
+        self.assertEqual(
+            self.store.search([ingredient.pk])[:10], [recipe.pk]
+        )
+        self.assertEqual(self.store.ensure_fresh().generation, 1)
+
+    def test_rebuild_carries_over_log_tail(self):
+        self.store.ensure_fresh()
+        recipe, ingredient = self.recipes[0], self.ingredients[-1]
+
+        def write_during_change(file, pairs, generation):
+            # снимок читает базу до изменения, которое пишется в журнал
+            # во время построения
+            pairs = list(pairs)
+            self.change_ingredients(recipe, ingredient)
+            self.store.record(recipe.pk)
+            write_index(file, pairs, generation)
+
+        with mock.patch.object(pantry, "write_index", write_during_change):
+            self.store.rebuild()
+        index = self.store.ensure_fresh()
+        self.assertEqual(index.generation, 2)
+        self.assertEqual(index.overlay, {recipe.pk: {ingredient.pk}})
+        self.assertFalse(self.store.log_path(1).exists())
+        self.assertEqual(
+            self.store.search([ingredient.pk])[:10], [recipe.pk]
+        )
+
+    def test_long_log_is_compacted(self):
+        self.store.ensure_fresh()
+        recipe, ingredient = self.recipes[0], self.ingredients[-1]
+        self.change_ingredients(recipe, ingredient)
+        with override_settings(PANTRY_LOG_MAX_BYTES=1):
+            self.store.record(recipe.pk)
+        index = self.store.ensure_fresh()
+        self.assertEqual(index.generation, 2)
+        self.assertEqual(index.overlay, {})
+        self.assertEqual(self.store.log_path(2).stat().st_size, 0)
+        self.assertEqual(
+            self.store.search([ingredient.pk])[:10], [recipe.pk]
+        )
+
+    def test_compaction_is_skipped_while_another_build_runs(self):
+        self.store.ensure_fresh()
+        with override_settings(PANTRY_LOG_MAX_BYTES=1):
+            with self.store.locked("pantry.build.lock"):
+                self.store.record(self.recipes[0].pk)
+        self.assertEqual(self.store.current_generation(), 1)
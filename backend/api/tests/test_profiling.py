@@ -0,0 +1,64 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import clear_caches, create_user
+from core.profiling import ProfileCapture
+
+
+class RequestProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_user(1)
+        cls.staff.is_staff = True
+        cls.staff.save()
+        cls.user = create_user(2)
+
+    def setUp(self):
+        clear_caches()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(PROFILE_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def test_staff_request_is_profiled(self):
+        response = self.client_for(self.staff).get(
+            "/api/recipes/", {"profile": "1"}
+        )
+        self.assertEqual(response.status_code, 200)
+        name = response["X-Profile-Id"]
+        self.assertTrue((self.directory / f"{name}.prof").exists())
+        self.assertTrue((self.directory / f"{name}.json").exists())
+
+    def test_other_requests_do_not_start_profiler(self):
+        requests = {
+            "anonymous": (self.client_for(), {"profile": "1"}, {}),
+            "user": (self.client_for(self.user), {"profile": "1"}, {}),
+            "header": (self.client_for(), {}, {"HTTP_X_PROFILE": "1"}),
+            "staff, profile=0": (
+                self.client_for(self.staff),
+                {"profile": "0"},
+                {},
+            ),
+        }
+        for name, (client, params, headers) in requests.items():
+            with self.subTest(request=name):
+                with mock.patch.object(ProfileCapture, "start") as start:
+                    response = client.get("/api/recipes/", params, **headers)
+                self.assertEqual(response.status_code, 200)
+                start.assert_not_called()
+                self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(list(self.directory.iterdir()), [])
@@ -0,0 +1,330 @@
+import base64
+import io
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.serializers import RecipeCreateAndUpdateSerializer
+from api.tests.fixtures import (clear_caches, create_catalogue, create_recipes,
+                                create_user)
+from recipes.models import (IngredientRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem)
+
+# COUNT, страница рецептов с авторами и флагами пользователя, версии
+# каталогов для ключей кэша представлений, теги и ингредиенты рецептов,
+# которых нет в этом кэше
+LIST_QUERIES = 5
+# рецепт с автором и флагами, версии каталогов, теги и ингредиенты
+DETAIL_QUERIES = 4
+# строки ингредиентов рецепта; удаление, вычитание из списков покупок с
+# очисткой нулевых строк, изменение, добавление и прибавление к спискам
+UPDATE_INGREDIENTS_QUERIES = 7
+
+
+class RecipeQueryCountTests(TestCase):
+    """
+    Список и карточка рецепта загружаются за постоянное число запросов,
+    не зависящее от размера страницы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.user = create_user(0)
+        authors = [create_user(number) for number in range(1, 4)]
+        cls.recipes = [
+            recipe
+            for author in authors
+            for recipe in create_recipes(author, 20, tags, ingredients)
+        ]
+
+    def setUp(self):
+        clear_caches()
+        self.anonymous = APIClient()
+        self.authenticated = APIClient()
+        self.authenticated.force_authenticate(self.user)
+
+    def clients(self):
+        return {
+            "anonymous": self.anonymous,
+            "authenticated": self.authenticated,
+        }
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for name, client in self.clients().items():
+            for limit in (5, 50):
+                with self.subTest(client=name, limit=limit):
+                    clear_caches()
+                    with self.assertNumQueries(LIST_QUERIES):
+                        response = client.get(
+                            "/api/recipes/", {"limit": limit}
+                        )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data["results"]), limit)
+
+    def test_detail_queries(self):
+        recipe = self.recipes[0]
+        for name, client in self.clients().items():
+            with self.subTest(client=name):
+                clear_caches()
+                with self.assertNumQueries(DETAIL_QUERIES):
+                    response = client.get(f"/api/recipes/{recipe.pk}/")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data["ingredients"]), 3)
+                self.assertEqual(len(response.data["tags"]), 2)
+
+
+def image_data():
+    buffer = io.BytesIO()
+    Image.new("RGB", (1, 1)).save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class RecipeIngredientsUpdateTests(TestCase):
+    """
+    Изменение рецепта трогает только отличающиеся строки ингредиентов и
+    пересчитывает списки покупок тех, у кого рецепт в корзине.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.author = create_user(1)
+        cls.buyer = create_user(2)
+        cls.recipe, cls.second = create_recipes(
+            cls.author, 2, cls.tags, cls.ingredients
+        )
+        for recipe in (cls.recipe, cls.second):
+            ShoppingCart.objects.create(user=cls.buyer, recipe=recipe)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def rows(self):
+        return {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount in IngredientRecipe.objects.filter(
+                recipe=self.recipe
+            ).values_list("pk", "ingredient_id", "amount")
+        }
+
+    def shopping_list(self):
+        return dict(
+            ShoppingListItem.objects.filter(user=self.buyer).values_list(
+                "ingredient_id", "total_amount"
+            )
+        )
+
+    def test_patch_changes_only_differing_rows(self):
+        # в рецепте ингредиенты 0, 1, 2; 0 остается, 1 меняется,
+        # 2 удаляется, 5 добавляется
+        kept, changed, removed = self.ingredients[:3]
+        added = self.ingredients[5]
+        before = self.rows()
+        response = self.client.patch(
+            f"/api/recipes/{self.recipe.pk}/",
+            {
+                "ingredients": [
+                    {"id": kept.pk, "amount": 100},
+                    {"id": changed.pk, "amount": 50},
+                    {"id": added.pk, "amount": 7},
+                ],
+                "tags": [tag.pk for tag in self.tags[:2]],
+                "image": image_data(),
+                "name": "Рецепт",
+                "text": "Описание",
+                "cooking_time": 5,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        after = self.rows()
+        self.assertEqual(set(after), {kept.pk, changed.pk, added.pk})
+        self.assertEqual(after[kept.pk], before[kept.pk])
+        self.assertEqual(after[changed.pk], (before[changed.pk][0], 50))
+        self.assertEqual(after[added.pk][1], 7)
+        self.assertNotIn(removed.pk, after)
+        # второй рецепт: ингредиенты 1, 2, 3 с количествами 100, 101, 102
+        self.assertEqual(
+            self.shopping_list(),
+            {
+                kept.pk: 100,
+                changed.pk: 150,
+                removed.pk: 101,
+                self.ingredients[3].pk: 102,
+                added.pk: 7,
+            },
+        )
+
+    def update_ingredients(self, data, queries):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        with self.assertNumQueries(queries):
+            return RecipeCreateAndUpdateSerializer().update_ingredients(
+                recipe, data
+            )
+
+    def test_update_queries(self):
+        kept, changed = self.ingredients[:2]
+        result = self.update_ingredients(
+            [
+                {"id": kept.pk, "amount": 100},
+                {"id": changed.pk, "amount": 50},
+                {"id": self.ingredients[5].pk, "amount": 7},
+            ],
+            UPDATE_INGREDIENTS_QUERIES,
+        )
+        self.assertTrue(result)
+
+    def test_unchanged_ingredients_are_not_written(self):
+        before, shopping_list = self.rows(), self.shopping_list()
+        result = self.update_ingredients(
+            [
+                {"id": ingredient_id, "amount": amount}
+                for ingredient_id, (_, amount) in before.items()
+            ],
+            queries=1,
+        )
+        self.assertFalse(result)
+        self.assertEqual(self.rows(), before)
+        self.assertEqual(self.shopping_list(), shopping_list)
+
+
+class RecipeSearchTests(TestCase):
+    """
+    Поиск по названию и описанию: в PostgreSQL - полнотекстовый с
+    ранжированием, в остальных базах - по подстроке. В обоих случаях
+    совпадения в названии идут раньше совпадений в описании.
+    """
+
+    RECIPES = (
+        ("Ячменный борщ", "Сварить бульон, добавить свеклу"),
+        ("Апельсиновый суп", "Подается холодным, почти как борщ"),
+        ("Щи и борщи", "Сборник рецептов"),
+        ("Оладьи", "Мука, кефир и яйца"),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user(1)
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=name,
+                text=text,
+                image="recipes/images/test.png",
+                cooking_time=10,
+            )
+            for name, text in cls.RECIPES
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def search(self, value):
+        response = self.client.get("/api/recipes/", {"search": value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe["name"] for recipe in response.data["results"]]
+
+    def test_name_matches_go_first(self):
+        # "Апельсиновый суп" выше по алфавиту, но совпадает по описанию
+        self.assertEqual(
+            self.search("борщ"),
+            ["Щи и борщи", "Ячменный борщ", "Апельсиновый суп"],
+        )
+
+    def test_no_matches(self):
+        self.assertEqual(self.search("пельмени"), [])
+
+    @skipUnless(connection.vendor == "postgresql", "нужен PostgreSQL")
+    def test_websearch(self):
+        cases = {
+            # словоформы приводятся к основе
+            "борщами": ["Щи и борщи", "Ячменный борщ", "Апельсиновый суп"],
+            "борщ -ячменный": ["Щи и борщи", "Апельсиновый суп"],
+            '"подается холодным"': ["Апельсиновый суп"],
+            '"холодным бульон"': [],
+            "кефир or бульон": ["Оладьи", "Ячменный борщ"],
+        }
+        for value, names in cases.items():
+            with self.subTest(search=value):
+                self.assertCountEqual(self.search(value), names)
+
+    @skipUnless(connection.vendor == "sqlite", "поиск подстроки SQLite")
+    def test_substring(self):
+        # SQLite сравнивает без учета регистра только ASCII
+        self.assertEqual(
+            self.search("орщ"),
+            ["Щи и борщи", "Ячменный борщ", "Апельсиновый суп"],
+        )
+        self.assertEqual(self.search("Щи"), ["Щи и борщи"])
+
+
+class RecipeOrderingTests(TestCase):
+    """ordering=popular: по убыванию избранного, затем по названию и id."""
+
+    FAVORITES = (3, 0, 7, 3, 0, 5, 7)
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        recipes = create_recipes(
+            create_user(1), len(cls.FAVORITES), tags, ingredients
+        )
+        for recipe, count in zip(recipes, cls.FAVORITES):
+            Recipe.objects.filter(pk=recipe.pk).update(favorites_count=count)
+        cls.expected = [
+            recipe.pk
+            for recipe in sorted(
+                Recipe.objects.all(),
+                key=lambda recipe: (
+                    -recipe.favorites_count,
+                    recipe.name,
+                    recipe.pk,
+                ),
+            )
+        ]
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def collect(self, params):
+        response = self.client.get("/api/recipes/", params)
+        ids = [recipe["id"] for recipe in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe["id"] for recipe in response.data["results"]]
+        return ids
+
+    def test_popular_pages(self):
+        self.assertEqual(
+            self.collect({"ordering": "popular", "limit": 3}), self.expected
+        )
+
+    def test_popular_cursor_pages(self):
+        self.assertEqual(
+            self.collect(
+                {"ordering": "popular", "limit": 3, "pagination": "cursor"}
+            ),
+            self.expected,
+        )
+
+    def test_unknown_ordering(self):
+        response = self.client.get("/api/recipes/", {"ordering": "random"})
+        self.assertEqual(response.status_code, 400)
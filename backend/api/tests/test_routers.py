@@ -0,0 +1,141 @@
+import tempfile
+from pathlib import Path
+
+from django.contrib.sessions.models import Session
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.http import HttpResponse, JsonResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+
+from api.tests.fixtures import create_catalogue
+from core.cache import get_version
+from core.routers import STICKY_COOKIE, ReplicaMiddleware, use_primary
+from recipes.models import DataVersion, Recipe, Tag
+
+REPLICAS = ["replica_1", "replica_2"]
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS, REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Запросы не выполняются: база, выбранная роутером, видна в
+    QuerySet.db, а обращаться к репликам тесту не нужно.
+    """
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.routed = {}
+        self.middleware = ReplicaMiddleware(self.view)
+
+    def view(self, request):
+        self.routed = {
+            "recipe": Recipe.objects.all().db,
+            "version": DataVersion.objects.all().db,
+            "session": Session.objects.all().db,
+            "write": router.db_for_write(Recipe),
+        }
+        with use_primary():
+            self.routed["primary"] = Recipe.objects.all().db
+        return HttpResponse()
+
+    def request(self, method, cookies=None):
+        request = getattr(self.factory, method)("/api/recipes/")
+        request.COOKIES.update(cookies or {})
+        return self.middleware(request)
+
+    def test_reads_go_to_replica(self):
+        for method in ("get", "head", "options"):
+            with self.subTest(method=method):
+                response = self.request(method)
+                self.assertIn(self.routed["recipe"], REPLICAS)
+                self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_writes_go_to_default(self):
+        self.request("get")
+        self.assertEqual(self.routed["write"], DEFAULT_DB_ALIAS)
+        self.request("post")
+        self.assertEqual(self.routed["recipe"], DEFAULT_DB_ALIAS)
+        self.assertEqual(self.routed["write"], DEFAULT_DB_ALIAS)
+
+    def test_primary_models_are_read_from_default(self):
+        self.request("get")
+        self.assertEqual(self.routed["version"], DEFAULT_DB_ALIAS)
+        self.assertEqual(self.routed["session"], DEFAULT_DB_ALIAS)
+        self.assertEqual(self.routed["primary"], DEFAULT_DB_ALIAS)
+
+    def test_get_after_post_is_sticky(self):
+        response = self.request("post")
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertEqual(cookie["max-age"], 10)
+        # другой экземпляр - как другой воркер без общего кэша
+        self.middleware = ReplicaMiddleware(self.view)
+        self.request("get", {STICKY_COOKIE: cookie.value})
+        self.assertEqual(self.routed["recipe"], DEFAULT_DB_ALIAS)
+
+    def test_forged_or_expired_cookie_is_ignored(self):
+        cookie = self.request("post").cookies[STICKY_COOKIE].value
+        self.request("get", {STICKY_COOKIE: "1"})
+        self.assertIn(self.routed["recipe"], REPLICAS)
+        with override_settings(REPLICA_STICKY_SECONDS=-1):
+            self.request("get", {STICKY_COOKIE: cookie})
+        self.assertIn(self.routed["recipe"], REPLICAS)
+
+    def test_outside_requests_read_from_default(self):
+        self.assertEqual(Recipe.objects.all().db, DEFAULT_DB_ALIAS)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"])
+class SQLiteReplicaTests(TestCase):
+    """
+    Реплика - отдельный файл SQLite с отстающей копией тегов: по
+    возвращенным строкам видно, с какой базы они прочитаны.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        connections.settings["replica_1"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": str(Path(directory.name) / "replica.sqlite3"),
+        }
+        connections.ensure_defaults("replica_1")
+        connections.prepare_test_settings("replica_1")
+        self.addCleanup(self.remove_replica)
+        with connections["replica_1"].schema_editor() as editor:
+            editor.create_model(Tag)
+        Tag.objects.using("replica_1").create(
+            name="Старый", color="#000000", slug="old"
+        )
+        self.middleware = ReplicaMiddleware(self.view)
+        self.factory = RequestFactory()
+
+    def remove_replica(self):
+        connections["replica_1"].close()
+        del connections["replica_1"]
+        del connections.settings["replica_1"]
+
+    def view(self, request):
+        # версий данных на реплике нет: прочитать их оттуда - ошибка
+        get_version("tag-catalogue-version")
+        return JsonResponse(
+            sorted(Tag.objects.values_list("slug", flat=True)), safe=False
+        )
+
+    def request(self, method, cookies=None):
+        request = getattr(self.factory, method)("/api/tags/")
+        request.COOKIES.update(cookies or {})
+        response = self.middleware(request)
+        return response, response.content.decode()
+
+    def test_get_reads_replica_and_post_reads_default(self):
+        response, slugs = self.request("get")
+        self.assertEqual(slugs, '["old"]')
+        response, slugs = self.request("post")
+        self.assertEqual(slugs, '["breakfast", "dinner", "lunch"]')
+        cookie = response.cookies[STICKY_COOKIE].value
+        response, slugs = self.request("get", {STICKY_COOKIE: cookie})
+        self.assertEqual(slugs, '["breakfast", "dinner", "lunch"]')
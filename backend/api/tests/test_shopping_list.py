@@ -0,0 +1,234 @@
+import io
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (clear_caches, create_catalogue, create_recipes,
+                                create_user)
+from recipes.models import Recipe, ShoppingCart, ShoppingListItem
+
+DOWNLOAD_URL = "/api/recipes/download_shopping_cart/"
+
+
+class ShoppingListExportTests(TestCase):
+    """
+    Выгрузка суммирует ингредиенты рецептов корзины: у первых двух
+    рецептов набора общие ингредиенты 1 и 2.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.user = create_user(1)
+        recipes = create_recipes(create_user(2), 3, tags, ingredients)
+        for recipe in recipes[:2]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, **params):
+        response = self.client.get(DOWNLOAD_URL, params)
+        if response.streaming:
+            content = b"".join(response.streaming_content)
+        else:
+            content = response.content
+        return response, content
+
+    def test_txt_is_default(self):
+        response, content = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        self.assertEqual(
+            response["Content-Disposition"],
+            'attachment; filename="shopping_list.txt"',
+        )
+        self.assertEqual(
+            content.decode(),
+            "Список покупок\n"
+            "1. Ингредиент 0 (г) - 100\n"
+            "2. Ингредиент 1 (г) - 201\n"
+            "3. Ингредиент 2 (г) - 203\n"
+            "4. Ингредиент 3 (г) - 102\n",
+        )
+
+    def test_csv(self):
+        response, content = self.download(format="csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(
+            content.decode(),
+            "\ufeffИнгредиент,Единица измерения,Количество\r\n"
+            "ингредиент 0,г,100\r\n"
+            "ингредиент 1,г,201\r\n"
+            "ингредиент 2,г,203\r\n"
+            "ингредиент 3,г,102\r\n",
+        )
+
+    def test_pdf(self):
+        response, content = self.download(format="pdf")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(
+            response["Content-Disposition"],
+            'attachment; filename="shopping_list.pdf"',
+        )
+        self.assertTrue(content.startswith(b"%PDF"))
+
+    def test_pdf_lines(self):
+        with mock.patch(
+            "api.shopping_list.render_shopping_list_pdf", return_value=b""
+        ) as render:
+            self.download(format="pdf")
+        title, lines, _ = render.call_args.args
+        self.assertEqual(title, "Список покупок")
+        self.assertEqual(
+            lines,
+            [
+                "1. Ингредиент 0 (г) - 100",
+                "2. Ингредиент 1 (г) - 201",
+                "3. Ингредиент 2 (г) - 203",
+                "4. Ингредиент 3 (г) - 102",
+            ],
+        )
+
+    def test_unknown_format(self):
+        response, _ = self.download(format="xlsx")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"errors": "Допустимые форматы: txt, csv, pdf"}
+        )
+
+    def test_anonymous(self):
+        response = APIClient().get(DOWNLOAD_URL)
+        self.assertEqual(response.status_code, 401)
+
+
+class ShoppingListItemTests(TestCase):
+    """
+    Список покупок поддерживается при изменении корзины: в рецепте n
+    набора ингредиенты n, n + 1, n + 2 с количествами 100, 101, 102.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, cls.ingredients = create_catalogue()
+        cls.user = create_user(1)
+        cls.other = create_user(2)
+        cls.recipes = create_recipes(create_user(3), 3, tags, cls.ingredients)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def cart(self, method, recipe):
+        response = getattr(self.client, method)(
+            f"/api/recipes/{recipe.pk}/shopping_cart/"
+        )
+        self.assertIn(response.status_code, (201, 204))
+
+    def shopping_list(self, user=None):
+        """Список покупок: номер ингредиента -> количество."""
+        numbers = {
+            ingredient.pk: number
+            for number, ingredient in enumerate(self.ingredients)
+        }
+        return {
+            numbers[ingredient_id]: total
+            for ingredient_id, total in ShoppingListItem.objects.filter(
+                user=user or self.user
+            ).values_list("ingredient_id", "total_amount")
+        }
+
+    def test_amounts_add_up_across_recipes(self):
+        for recipe in self.recipes:
+            self.cart("post", recipe)
+        self.assertEqual(
+            self.shopping_list(), {0: 100, 1: 201, 2: 303, 3: 203, 4: 102}
+        )
+        self.assertEqual(self.shopping_list(self.other), {})
+
+    def test_removal_subtracts_and_deletes_empty_rows(self):
+        first, second, _ = self.recipes
+        for user in (self.user, self.other):
+            ShoppingCart.objects.create(user=user, recipe=first)
+            ShoppingCart.objects.create(user=user, recipe=second)
+        self.cart("delete", first)
+        # ингредиент 0 был только в первом рецепте
+        self.assertEqual(self.shopping_list(), {1: 100, 2: 101, 3: 102})
+        self.cart("delete", second)
+        self.assertEqual(self.shopping_list(), {})
+        self.assertEqual(
+            self.shopping_list(self.other), {0: 100, 1: 201, 2: 203, 3: 102}
+        )
+
+    def test_deleted_recipe_leaves_lists(self):
+        first, second, _ = self.recipes
+        for recipe in (first, second):
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        Recipe.objects.filter(pk=second.pk).delete()
+        self.assertEqual(self.shopping_list(), {0: 100, 1: 101, 2: 102})
+
+
+class ReconcileShoppingListsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.users = [create_user(number) for number in (1, 2)]
+        recipes = create_recipes(create_user(3), 3, tags, ingredients)
+        for user, count in zip(cls.users, (2, 3)):
+            for recipe in recipes[:count]:
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+        cls.expected = sorted(
+            ShoppingListItem.objects.values_list(
+                "user_id", "ingredient_id", "total_amount"
+            )
+        )
+        cls.spare = ingredients[-1]
+
+    def reconcile(self, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command(
+            "reconcile_shopping_lists", *args, stdout=stdout, stderr=stderr
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def rows(self):
+        return sorted(
+            ShoppingListItem.objects.values_list(
+                "user_id", "ingredient_id", "total_amount"
+            )
+        )
+
+    def corrupt(self):
+        first, second = self.users
+        item = ShoppingListItem.objects.filter(user=first).first()
+        item.total_amount += 1
+        item.save()
+        ShoppingListItem.objects.filter(user=second).first().delete()
+        ShoppingListItem.objects.create(
+            user=first, ingredient=self.spare, total_amount=5
+        )
+
+    def test_consistent_lists_pass_check(self):
+        stdout, stderr = self.reconcile("--check")
+        self.assertIn("совпадают", stdout)
+        self.assertEqual(stderr, "")
+
+    def test_check_reports_mismatches(self):
+        self.corrupt()
+        with self.assertRaisesMessage(CommandError, "Расхождений: 3"):
+            self.reconcile("--check")
+        self.assertNotEqual(self.rows(), self.expected)
+
+    def test_rebuild_fixes_mismatches(self):
+        self.corrupt()
+        stdout, _ = self.reconcile()
+        self.assertIn("пересобраны", stdout)
+        self.assertIn("совпадают", stdout)
+        self.assertEqual(self.rows(), self.expected)
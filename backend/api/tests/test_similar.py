@@ -0,0 +1,168 @@
+import io
+import math
+from collections import defaultdict
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (clear_caches, create_catalogue, create_recipes,
+                                create_user)
+from core.constraints import SIMILAR_RECIPES
+from recipes.models import IngredientRecipe, Recipe, SimilarRecipe
+
+RECIPES = 14
+
+
+def build(**options):
+    stdout = io.StringIO()
+    call_command("build_similar_recipes", workers=0, stdout=stdout, **options)
+    return stdout.getvalue()
+
+
+def brute_force():
+    """
+    Списки похожих перебором всех пар: косинус между наборами
+    ингредиентов и тегов с весами idf.
+    """
+    features = defaultdict(set)
+    for recipe_id, ingredient_id in IngredientRecipe.objects.values_list(
+        "recipe_id", "ingredient_id"
+    ):
+        features[recipe_id].add(("ingredient", ingredient_id))
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+        "recipe_id", "tag_id"
+    ):
+        features[recipe_id].add(("tag", tag_id))
+    recipes = defaultdict(int)
+    for items in features.values():
+        for feature in items:
+            recipes[feature] += 1
+    weights = {
+        feature: math.log(1 + len(features) / count) ** 2
+        for feature, count in recipes.items()
+    }
+
+    def norm(items):
+        return math.sqrt(sum(weights[feature] for feature in items))
+
+    lists = {}
+    for recipe_id, items in features.items():
+        scores = [
+            (
+                sum(weights[feature] for feature in items & other_items)
+                / (norm(items) * norm(other_items)),
+                other,
+            )
+            for other, other_items in features.items()
+            if other != recipe_id and items & other_items
+        ]
+        scores.sort(key=lambda item: (-round(item[0], 9), item[1]))
+        lists[recipe_id] = scores[:SIMILAR_RECIPES]
+    return lists
+
+
+class SimilarRecipesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.recipes = create_recipes(
+            create_user(1), RECIPES, tags, ingredients
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def similar_ids(self, recipe_id):
+        response = self.client.get(f"/api/recipes/{recipe_id}/similar/")
+        self.assertEqual(response.status_code, 200)
+        return [recipe["id"] for recipe in response.data]
+
+    def test_lists_match_brute_force(self):
+        build(full=True)
+        for recipe_id, expected in brute_force().items():
+            with self.subTest(recipe=recipe_id):
+                self.assertEqual(
+                    self.similar_ids(recipe_id),
+                    [other for _, other in expected],
+                )
+                scores = SimilarRecipe.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list("score", flat=True)
+                for score, (expected_score, _) in zip(scores, expected):
+                    self.assertAlmostEqual(score, expected_score)
+
+    def test_recipe_without_list(self):
+        self.assertEqual(self.similar_ids(self.recipes[0].pk), [])
+        response = self.client.get("/api/recipes/100000/similar/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_replace_keeps_only_new_rows(self):
+        first, second, third = self.recipes[:3]
+        SimilarRecipe.objects.replace(
+            {first.pk: [(second.pk, 0.5), (third.pk, 0.4)]}, {first.pk: 3}
+        )
+        SimilarRecipe.objects.replace(
+            {first.pk: [(third.pk, 0.7)], second.pk: []},
+            {first.pk: 4, second.pk: 2},
+        )
+        self.assertEqual(
+            list(
+                SimilarRecipe.objects.values_list(
+                    "recipe_id", "similar_id", "score"
+                )
+            ),
+            [(first.pk, third.pk, 0.7)],
+        )
+        self.assertEqual(
+            list(
+                Recipe.objects.filter(pk__in=[first.pk, second.pk])
+                .order_by("pk")
+                .values_list("similar_version", flat=True)
+            ),
+            [4, 2],
+        )
+
+    def test_deleted_recipe_expires_lists(self):
+        build(full=True)
+        deleted = self.recipes[1]
+        holders = set(
+            SimilarRecipe.objects.filter(similar=deleted).values_list(
+                "recipe_id", flat=True
+            )
+        )
+        self.assertTrue(holders)
+        deleted.delete()
+        self.assertEqual(
+            set(
+                Recipe.objects.filter(similar_version=0).values_list(
+                    "pk", flat=True
+                )
+            ),
+            holders,
+        )
+        build()
+        self.assertFalse(Recipe.objects.filter(similar_version=0).exists())
+        for recipe_id, expected in brute_force().items():
+            with self.subTest(recipe=recipe_id):
+                self.assertEqual(
+                    self.similar_ids(recipe_id),
+                    [other for _, other in expected],
+                )
+
+    def test_only_changed_recipes_are_rebuilt(self):
+        build(full=True)
+        self.assertIn("актуальны", build())
+        changed = self.recipes[0]
+        changed.tags.clear()
+        changed.save()
+        self.assertIn("изменилось 1", build())
+        self.assertFalse(
+            Recipe.objects.exclude(similar_version=F("version")).exists()
+        )
+        self.assertEqual(
+            self.similar_ids(changed.pk),
+            [other for _, other in brute_force()[changed.pk]],
+        )
@@ -0,0 +1,57 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (clear_caches, create_authors, create_catalogue,
+                                create_recipes, create_user)
+from users.models import CustomUser, Subscription
+
+AUTHORS = 100
+RECIPES_PER_AUTHOR = 4
+
+# COUNT и страница подписок с авторами, флаги is_subscribed, рецепты
+# всех авторов страницы
+SUBSCRIPTIONS_QUERIES = 4
+
+
+class SubscriptionQueryCountTests(TestCase):
+    """
+    Список подписок загружается за постоянное число запросов при любом
+    количестве авторов на странице, с recipes_limit и без него.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.user = create_user(0)
+        authors = create_authors(AUTHORS)
+        for author in authors:
+            create_recipes(author, RECIPES_PER_AUTHOR, tags, ingredients)
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.user, author=author) for author in authors
+        )
+        CustomUser.objects.recount()
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_subscriptions(self, **params):
+        with self.assertNumQueries(SUBSCRIPTIONS_QUERIES):
+            response = self.client.get(
+                "/api/users/subscriptions/", {"limit": AUTHORS, **params}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), AUTHORS)
+        return response.data["results"]
+
+    def test_all_recipes(self):
+        for author in self.get_subscriptions():
+            self.assertTrue(author["is_subscribed"])
+            self.assertEqual(author["recipes_count"], RECIPES_PER_AUTHOR)
+            self.assertEqual(len(author["recipes"]), RECIPES_PER_AUTHOR)
+
+    def test_recipes_limit(self):
+        for author in self.get_subscriptions(recipes_limit=2):
+            self.assertEqual(author["recipes_count"], RECIPES_PER_AUTHOR)
+            self.assertEqual(len(author["recipes"]), 2)
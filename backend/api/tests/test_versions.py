@@ -0,0 +1,112 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.catalogue import tag_catalogue
+from api.search import INGREDIENT_INDEX_VERSION, ingredient_index
+from api.tests.fixtures import clear_caches, create_catalogue
+from core.cache import forget_versions, get_version
+from recipes.models import DataVersion, Ingredient, Tag
+
+
+class DataVersionTests(TestCase):
+    """
+    Версии данных хранятся в базе: изменение, сделанное другим процессом
+    (командой управления, другим воркером), видно без общего кэша.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue()
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def ttl_expired(self):
+        later = time.monotonic() + settings.DATA_VERSION_TTL + 1
+        return mock.patch("core.cache.time.monotonic", return_value=later)
+
+    def test_version_does_not_live_in_cache(self):
+        version = get_version(INGREDIENT_INDEX_VERSION)
+        for cache in caches.all():
+            cache.clear()
+        forget_versions()
+        self.assertEqual(get_version(INGREDIENT_INDEX_VERSION), version)
+
+    def test_unknown_version_is_read_without_writes(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_version("unknown-version"), "0")
+        self.assertFalse(DataVersion.objects.filter(key="unknown-version"))
+
+    @override_settings(DATA_VERSION_TTL=60)
+    def test_index_follows_version_from_database(self):
+        self.assertEqual(ingredient_index.search("шафран"), [])
+        # так записывает load_ingredients: без сигналов, версия меняется
+        # в другом процессе
+        Ingredient.objects.bulk_create(
+            [Ingredient(name="шафран", measurement_unit="г")]
+        )
+        DataVersion.objects.bump(INGREDIENT_INDEX_VERSION)
+        # до истечения TTL поиск не обращается к базе
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/ingredients/", {"name": "шафр"})
+        self.assertEqual(response.data, [])
+        with self.ttl_expired():
+            response = self.client.get("/api/ingredients/", {"name": "шафр"})
+        self.assertEqual(
+            [item["name"] for item in response.data], ["шафран"]
+        )
+
+    def test_bump_is_seen_by_own_process_at_once(self):
+        ingredient_index.ensure_fresh()
+        Ingredient.objects.bulk_create(
+            [Ingredient(name="шафран", measurement_unit="г")]
+        )
+        ingredient_index.invalidate()
+        self.assertEqual(
+            [item["name"] for item in ingredient_index.search("шафр")],
+            ["шафран"],
+        )
+
+    @override_settings(DATA_VERSION_TTL=60)
+    def test_catalogue_is_served_without_queries(self):
+        self.client.get("/api/tags/")
+        for encoding in ("", "gzip", "br"):
+            with self.subTest(encoding=encoding):
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        "/api/tags/", HTTP_ACCEPT_ENCODING=encoding
+                    )
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        "/api/tags/",
+                        HTTP_ACCEPT_ENCODING=encoding,
+                        HTTP_IF_NONE_MATCH=response["ETag"],
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    @override_settings(DATA_VERSION_TTL=60)
+    def test_catalogue_etag_follows_version_from_database(self):
+        response = self.client.get("/api/tags/")
+        etag = response["ETag"]
+        self.assertEqual(len(response.json()), 3)
+        Tag.objects.bulk_create(
+            [Tag(name="Перекус", color="#FFFFFF", slug="snack")]
+        )
+        DataVersion.objects.bump(tag_catalogue.version_key)
+        # до истечения TTL воркер отдает прежний каталог
+        response = self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.ttl_expired():
+            response = self.client.get(
+                "/api/tags/", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 4)
@@ -1,8 +1,12 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import (TokenObtainPairView,
+                                            TokenRefreshView, TokenVerifyView)
 
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet)
+from api.serializers import (SignedTokenObtainSerializer,
+                             SignedTokenRefreshSerializer)
+from api.views import (CustomUserViewSet, IngredientViewSet, MetricsView,
+                       RecipeViewSet, TagViewSet)
 
 v1_router = DefaultRouter()
 v1_router.register("tags", TagViewSet, basename="tag")
@@ -14,4 +18,20 @@ urlpatterns = [
     path("", include(v1_router.urls)),
     path("", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
+    path(
+        "auth/jwt/create/",
+        TokenObtainPairView.as_view(
+            serializer_class=SignedTokenObtainSerializer
+        ),
+        name="jwt-create",
+    ),
+    path(
+        "auth/jwt/refresh/",
+        TokenRefreshView.as_view(
+            serializer_class=SignedTokenRefreshSerializer
+        ),
+        name="jwt-refresh",
+    ),
+    path("auth/jwt/verify/", TokenVerifyView.as_view(), name="jwt-verify"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
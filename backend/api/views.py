@@ -1,25 +1,46 @@
 import django_filters
-from django.db.models import Sum
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from api.catalogue import ingredient_catalogue, tag_catalogue
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import LimitPageNumberPagination
+from api.fragments import recipe_fragments
+from api.pagination import KeysetPagination, LimitPageNumberPagination
+from api.pantry import pantry_index
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (FavoriteCreateSerializer, IngredientSerializer,
+from api.search import ingredient_index
+from api.serializers import (BulkRecipesSerializer, FavoriteCreateSerializer,
+                             IngredientSerializer, PantrySerializer,
                              RecipeCreateAndUpdateSerializer,
                              RecipeReadSerializer,
                              ShoppingCartCreateSerializer,
-                             SubscribeCreateSerializer, TagSerializer)
+                             SubscribeCreateSerializer, SubscribeSerializer,
+                             TagSerializer)
+from api.shopping_list import (EXPORT_FORMATS, ExportContentNegotiation,
+                               shopping_list_response)
+from api.subscriptions import load_subscription_data
+from core.metrics import metrics_registry
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 from users.models import Subscription
 
 
+def bulk_results(recipe_ids, statuses):
+    """
+    Возвращает результат массовой операции по каждому id в порядке
+    запроса. statuses: статус -> множество id с этим статусом.
+    """
+    status_of = {pk: name for name, ids in statuses.items() for pk in ids}
+    return {
+        "recipes": [{"id": pk, "status": status_of[pk]} for pk in recipe_ids]
+    }
+
+
 class CustomUserViewSet(UserViewSet):
     """
     Вьюсет для операций с пользователями.
@@ -33,6 +54,12 @@ class CustomUserViewSet(UserViewSet):
             return [IsAuthenticated()]
         return super(CustomUserViewSet, self).get_permissions()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ["list", "retrieve"]:
+            return queryset.with_subscription_flag(self.request.user)
+        return queryset
+
     @action(
         detail=True,
         methods=["POST"],
@@ -71,10 +98,15 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated],
     )
     def subscriptions(self, request):
-        queryset = Subscription.objects.filter(user=request.user)
+        queryset = Subscription.objects.filter(
+            user=request.user
+        ).select_related("author")
         pages = self.paginate_queryset(queryset)
-        serializer = SubscribeCreateSerializer(
-            pages,
+        authors = load_subscription_data(
+            [subscription.author for subscription in pages], request
+        )
+        serializer = SubscribeSerializer(
+            authors,
             many=True,
             context={"request": request},
         )
@@ -91,6 +123,11 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == "json":
+            return tag_catalogue.response(request)
+        return super().list(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """
@@ -105,11 +142,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.action in ["list", "retrieve"]:
+            return Recipe.objects.with_user_flags(self.request.user)
+        return super().get_queryset()
+
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
             return RecipeReadSerializer
         return RecipeCreateAndUpdateSerializer
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                recipe_fragments.represent(page, request)
+            )
+        return Response(recipe_fragments.represent(list(queryset), request))
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        return Response(recipe_fragments.represent([recipe], request)[0])
+
     def add_item(self, serializer_type, request, pk):
         serializer = serializer_type(
             data={"recipe": pk}, context={"request": request}
@@ -131,6 +186,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def bulk_add_items(self, model, request):
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data["recipes"]
+        added, existing, missing = model.objects.bulk_add(
+            request.user, recipe_ids
+        )
+        return Response(
+            bulk_results(
+                recipe_ids,
+                {"added": added, "exists": existing, "not_found": missing},
+            )
+        )
+
+    def bulk_delete_items(self, model, request):
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data["recipes"]
+        removed, absent = model.objects.bulk_remove(request.user, recipe_ids)
+        return Response(
+            bulk_results(recipe_ids, {"removed": removed, "absent": absent})
+        )
+
     @action(
         detail=True,
         methods=["POST"],
@@ -161,38 +239,89 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        methods=["GET"],
-        url_path="download_shopping_cart",
-        url_name="download_shopping_cart",
+        methods=["POST"],
+        url_path="favorite",
+        url_name="favorite_bulk",
         permission_classes=[IsAuthenticated],
     )
-    def download_shopping_cart(self, request):
-        shopping_list = []
-
-        ingredients = (
-            ShoppingCart.objects.filter(user=request.user)
-            .values("recipe")
-            .values_list(
-                "recipe__ingredients__name",
-                "recipe__ingredients__measurement_unit",
-            )
-            .annotate(total_amount=Sum("recipe__ingredientes__amount"))
-        )
+    def favorite_bulk(self, request):
+        return self.bulk_add_items(Favorite, request)
 
-        shopping_list.append("Список покупок\n")
+    @favorite_bulk.mapping.delete
+    def delete_favorite_bulk(self, request):
+        return self.bulk_delete_items(Favorite, request)
 
-        for i, ingredient in enumerate(ingredients, start=1):
-            shopping_list.append(
-                f"{i}. {ingredient[0].capitalize()} "
-                f"({ingredient[1]}) - {ingredient[2]}\n"
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="shopping_cart",
+        url_name="shopping_cart_bulk",
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_add_items(ShoppingCart, request)
+
+    @shopping_cart_bulk.mapping.delete
+    def delete_shopping_cart_bulk(self, request):
+        return self.bulk_delete_items(ShoppingCart, request)
+
+    @action(detail=True, methods=["GET"])
+    def similar(self, request, pk=None):
+        recipes = list(
+            Recipe.objects.with_user_flags(request.user).similar_to(pk)
+        )
+        if not recipes:
+            get_object_or_404(Recipe, pk=pk)
+        return Response(recipe_fragments.represent(recipes, request))
+
+    @action(detail=False, methods=["POST"], permission_classes=[AllowAny])
+    def cookable(self, request):
+        serializer = PantrySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        matches = pantry_index.search(serializer.validated_data["ingredients"])
+        paginator = LimitPageNumberPagination()
+        page = paginator.paginate_queryset(matches, request, self)
+        recipes = Recipe.objects.with_user_flags(request.user).in_bulk(page)
+        return paginator.get_paginated_response(
+            recipe_fragments.represent(
+                [recipes[pk] for pk in page if pk in recipes], request
             )
+        )
 
-        response = HttpResponse(shopping_list, content_type="text/plain")
-        response["Content-Disposition"] = (
-            'attachment; filename="shopping_list.txt"'
+    @action(
+        detail=False,
+        methods=["GET"],
+        permission_classes=[IsAuthenticated],
+    )
+    def feed(self, request):
+        queryset = Recipe.objects.with_user_flags(request.user).feed(
+            request.user
+        )
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, self)
+        return paginator.get_paginated_response(
+            recipe_fragments.represent(page, request)
         )
 
-        return response
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="download_shopping_cart",
+        url_name="download_shopping_cart",
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=ExportContentNegotiation,
+    )
+    def download_shopping_cart(self, request):
+        export_format = request.query_params.get("format", "txt")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {
+                    "errors": "Допустимые форматы: "
+                    + ", ".join(EXPORT_FORMATS)
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return shopping_list_response(request.user, export_format)
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -208,3 +337,26 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_class = IngredientFilter
     search_fields = ("name",)
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if name:
+            return Response(ingredient_index.search(name))
+        if request.accepted_renderer.format == "json":
+            return ingredient_catalogue.response(request)
+        return super().list(request, *args, **kwargs)
+
+
+class MetricsView(APIView):
+    """
+    Замеры запросов текущего процесса в текстовом формате Prometheus.
+    Доступно только персоналу.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            metrics_registry.render(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
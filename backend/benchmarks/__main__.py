@@ -0,0 +1,9 @@
+import sys
+
+from benchmarks import setup_django
+
+setup_django()
+
+from benchmarks.runner import main  # noqa: E402
+
+sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Пропускная способность API при разных режимах соединений с PostgreSQL:
+новое соединение на каждый запрос, постоянные соединения потоков и пул
+соединений процесса.
+
+    python -m benchmarks.connection_pool --requests 2000 --threads 4
+
+Настройки соединений читаются при запуске Django, поэтому каждый режим
+замеряется в отдельном процессе. Запросы проходят через WSGI-обработчик
+целиком, как в gunicorn: соединения закрываются или возвращаются в пул
+сигналом request_finished.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks import setup_django
+
+setup_django()
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+
+from benchmarks.dataset import seed  # noqa: E402
+from benchmarks.runner import test_database  # noqa: E402
+from core.db.pool import connection_stats  # noqa: E402
+
+# переменные окружения режимов
+MODES = {
+    "none": {"DB_CONN_MAX_AGE": "0", "DB_POOL": "False"},
+    "persistent": {"DB_CONN_MAX_AGE": "600", "DB_POOL": "False"},
+    "pool": {"DB_CONN_MAX_AGE": "600", "DB_POOL": "True"},
+}
+
+PATHS = ("/api/tags/", "/api/ingredients/?name=%D1%81", "/api/recipes/")
+
+
+def request(application, path):
+    path, _, query = path.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "HTTP_HOST": "testserver",
+    }
+    setup_testing_defaults(environ)
+    status = []
+    result = application(
+        environ, lambda code, headers, *args: status.append(code)
+    )
+    try:
+        for _ in result:
+            pass
+    finally:
+        # как WSGI-сервер: close отправляет сигнал request_finished
+        result.close()
+    if not status[0].startswith("200"):
+        raise RuntimeError(f"{path}: {status[0]}")
+
+
+def worker(application, paths, barrier):
+    # прогрев: кэши Django и первое соединение потока
+    for path in PATHS:
+        request(application, path)
+    barrier.wait()
+    for path in paths:
+        request(application, path)
+    barrier.wait()
+    # постоянные соединения потоков не дали бы удалить тестовую базу
+    connections.close_all()
+
+
+def measure(total, threads):
+    """Запросы в секунду для total запросов из threads потоков."""
+    application = get_wsgi_application()
+    paths = [PATHS[number % len(PATHS)] for number in range(total)]
+    barrier = threading.Barrier(threads + 1)
+    workers = [
+        threading.Thread(
+            target=worker,
+            args=(application, paths[number::threads], barrier),
+        )
+        for number in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    stats = dict(connection_stats[connection.alias])
+    start = time.perf_counter()
+    barrier.wait()
+    elapsed = time.perf_counter() - start
+    for thread in workers:
+        thread.join()
+    opened = connection_stats[connection.alias]["opened"] - stats.get(
+        "opened", 0
+    )
+    return {"rps": total / elapsed, "opened": opened}
+
+
+def run_mode(mode, total, threads):
+    """Запускает замер режима mode в отдельном процессе."""
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.connection_pool",
+            "--child",
+            "--requests",
+            str(total),
+            "--threads",
+            str(threads),
+        ],
+        env={**os.environ, **MODES[mode]},
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.connection_pool"
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if connection.vendor != "postgresql":
+        sys.exit("Бенчмарк соединений работает только с PostgreSQL")
+
+    if args.child:
+        with test_database():
+            seed("small")
+            result = measure(args.requests, args.threads)
+        print(json.dumps(result))
+        return
+
+    print(f"Запросов: {args.requests}, потоков: {args.threads}")
+    results = {
+        mode: run_mode(mode, args.requests, args.threads) for mode in MODES
+    }
+    base = results["none"]["rps"]
+    for mode, result in results.items():
+        print(
+            f"{mode:<12} {result['rps']:8.0f} запросов/с "
+            f"({result['rps'] / base:.2f}x), новых соединений: "
+            f"{result['opened']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import csv
+import io
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+
+from api.pantry import pantry_index
+from recipes.models import (Favorite, FeedItem, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingCart, ShoppingListItem, Tag)
+from users.models import CustomUser, Subscription
+
+INGREDIENTS_CSV = settings.BASE_DIR.parent / "data" / "ingredients.csv"
+
+BENCHMARK_PASSWORD = "benchmark-password"
+
+# размеры наборов данных, на которых прогоняются бенчмарки
+SIZES = {
+    "small": {
+        "users": 20,
+        "recipes": 200,
+        "favorites_per_user": 10,
+        "cart_per_user": 5,
+        "subscriptions_per_user": 5,
+    },
+    "medium": {
+        "users": 200,
+        "recipes": 2000,
+        "favorites_per_user": 20,
+        "cart_per_user": 10,
+        "subscriptions_per_user": 20,
+    },
+    "large": {
+        "users": 1000,
+        "recipes": 10000,
+        "favorites_per_user": 30,
+        "cart_per_user": 15,
+        "subscriptions_per_user": 50,
+    },
+}
+
+TAGS = (
+    ("Завтрак", "#E26C2D", "breakfast"),
+    ("Обед", "#49B64E", "lunch"),
+    ("Ужин", "#8775D2", "dinner"),
+    ("Десерт", "#F7C948", "dessert"),
+    ("Выпечка", "#B5651D", "bakery"),
+    ("Напитки", "#2D9CDB", "drinks"),
+)
+
+# сколько рецептов главного пользователя лежит в корзине и избранном
+MAIN_USER_ITEMS = 20
+
+# сколько рецептов добавляется и удаляется массовыми операциями
+MEAL_PLAN_SIZE = 20
+
+
+class Dataset:
+    """Сгенерированные данные, на которые ссылаются сценарии бенчмарков."""
+
+    def __init__(self, size, users, tags, ingredients, recipes):
+        self.size = size
+        self.users = users
+        self.tags = tags
+        self.ingredients = ingredients
+        self.recipes = recipes
+
+    @property
+    def main_user(self):
+        """Пользователь с большой корзиной и множеством подписок."""
+        return self.users[0]
+
+    @property
+    def spare_user(self):
+        """Пользователь, на которого главный пользователь не подписан."""
+        return self.users[-1]
+
+    @property
+    def login_user(self):
+        """Пользователь для сценариев входа и выхода."""
+        return self.users[-2]
+
+    @property
+    def recipe(self):
+        return self.recipes[0]
+
+    @property
+    def spare_recipe(self):
+        """Рецепт, которого нет в избранном и корзине главного пользователя."""
+        return self.recipes[-1]
+
+    @property
+    def meal_plan(self):
+        """
+        Рецепты, которых нет в избранном и корзине главного пользователя,
+        для массовых операций.
+        """
+        return self.recipes[MAIN_USER_ITEMS:MAIN_USER_ITEMS + MEAL_PLAN_SIZE]
+
+
+def load_ingredients():
+    """
+    Читает каталог ингредиентов из data/ingredients.csv. Если файла нет,
+    например внутри docker-образа, генерирует синтетический каталог.
+    """
+    if INGREDIENTS_CSV.exists():
+        with open(INGREDIENTS_CSV, encoding="utf-8") as file:
+            return [tuple(row) for row in csv.reader(file) if len(row) == 2]
+    return [(f"ингредиент {i}", "г") for i in range(2000)]
+
+
+def seed(size, seed=0):
+    """Наполняет базу данных детерминированным набором данных."""
+    params = SIZES[size]
+    rnd = random.Random(seed)
+    password = make_password(BENCHMARK_PASSWORD)
+
+    CustomUser.objects.bulk_create(
+        CustomUser(
+            email=f"user{i}@example.com",
+            username=f"user{i}",
+            first_name=f"Имя{i}",
+            last_name=f"Фамилия{i}",
+            password=password,
+        )
+        for i in range(params["users"])
+    )
+    users = list(CustomUser.objects.order_by("id"))
+
+    Tag.objects.bulk_create(
+        Tag(name=name, color=color, slug=slug) for name, color, slug in TAGS
+    )
+    tags = list(Tag.objects.order_by("id"))
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit=unit)
+        for name, unit in load_ingredients()
+    )
+    ingredients = list(Ingredient.objects.order_by("id"))
+
+    # популярные авторы пишут заметно больше рецептов
+    authors = users[:-2]
+    weights = [1 / (rank + 1) for rank in range(len(authors))]
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f"Рецепт {i:06}",
+            text=f"Описание рецепта {i}",
+            image="recipes/images/benchmark.png",
+            cooking_time=rnd.randint(5, 180),
+        )
+        for i, author in enumerate(
+            rnd.choices(authors, weights=weights, k=params["recipes"])
+        )
+    )
+    recipes = list(Recipe.objects.order_by("id"))
+
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipes
+        for tag in rnd.sample(tags, rnd.randint(1, 3))
+    )
+    IngredientRecipe.objects.bulk_create(
+        (
+            IngredientRecipe(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient.id,
+                amount=rnd.randint(1, 500),
+            )
+            for recipe in recipes
+            for ingredient in rnd.sample(ingredients, rnd.randint(3, 10))
+        ),
+        batch_size=5000,
+    )
+
+    candidates = recipes[:-1]
+    main_items = candidates[:MAIN_USER_ITEMS]
+    favorites, cart, subscriptions = [], [], []
+    for user in users:
+        if user == users[0]:
+            favorite_recipes = cart_recipes = main_items
+            followed = users[1:-1]
+        else:
+            favorite_recipes = rnd.sample(
+                candidates, params["favorites_per_user"]
+            )
+            cart_recipes = rnd.sample(candidates, params["cart_per_user"])
+            followed = rnd.sample(authors, params["subscriptions_per_user"])
+        favorites += [Favorite(user=user, recipe=r) for r in favorite_recipes]
+        cart += [ShoppingCart(user=user, recipe=r) for r in cart_recipes]
+        subscriptions += [
+            Subscription(user=user, author=author)
+            for author in followed
+            if author != user
+        ]
+    Favorite.objects.bulk_create(favorites, batch_size=5000)
+    ShoppingCart.objects.bulk_create(cart, batch_size=5000)
+    ShoppingListItem.objects.rebuild()
+    Subscription.objects.bulk_create(subscriptions, batch_size=5000)
+    Recipe.objects.recount()
+    CustomUser.objects.recount()
+    FeedItem.objects.fill_recent("1 = 1", [])
+    call_command(
+        "build_similar_recipes", full=True, workers=0, stdout=io.StringIO()
+    )
+    pantry_index.rebuild()
+
+    return Dataset(size, users, tags, ingredients, recipes)
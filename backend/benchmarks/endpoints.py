@@ -0,0 +1,465 @@
+import base64
+import io
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.catalogue import ingredient_catalogue
+from api.pagination import KeysetPagination
+from api.serializers import SignedTokenObtainSerializer
+from benchmarks.dataset import BENCHMARK_PASSWORD
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser, Subscription
+
+
+def make_image():
+    """Возвращает картинку в base64, как ее присылает фронтенд."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "#E26C2D").save(buffer, format="PNG")
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f"data:image/png;base64,{encoded}"
+
+
+IMAGE = make_image()
+
+
+class Case:
+    """
+    Сценарий бенчмарка: один HTTP-запрос к API.
+
+    path, data и headers могут быть функциями от набора данных. headers -
+    дополнительные заголовки в формате WSGI (HTTP_...). setup выполняется
+    перед каждым замером, teardown - после него, оба не входят в замер.
+    """
+
+    def __init__(
+        self,
+        name,
+        method,
+        path,
+        user="main",
+        data=None,
+        setup=None,
+        teardown=None,
+        headers=None,
+    ):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.user = user
+        self.data = data
+        self.setup = setup
+        self.teardown = teardown
+        self.headers = headers
+
+    def resolve(self, value, dataset):
+        return value(dataset) if callable(value) else value
+
+
+def recipe_payload(dataset):
+    return {
+        "name": "Рецепт для бенчмарка",
+        "text": "Описание рецепта для бенчмарка",
+        "cooking_time": 10,
+        "image": IMAGE,
+        "tags": [tag.id for tag in dataset.tags[:2]],
+        "ingredients": [
+            {"id": ingredient.id, "amount": 100}
+            for ingredient in dataset.ingredients[:5]
+        ],
+    }
+
+
+def delete_benchmark_recipes(dataset):
+    Recipe.objects.filter(name="Рецепт для бенчмарка").delete()
+
+
+def create_benchmark_recipe(dataset):
+    delete_benchmark_recipes(dataset)
+    dataset.benchmark_recipe = Recipe.objects.create(
+        author=dataset.main_user,
+        name="Рецепт для бенчмарка",
+        text="Описание рецепта для бенчмарка",
+        image="recipes/images/benchmark.png",
+        cooking_time=10,
+    )
+
+
+def delete_user_items(model):
+    def teardown(dataset):
+        model.objects.filter(
+            user=dataset.main_user, recipe=dataset.spare_recipe
+        ).delete()
+
+    return teardown
+
+
+def create_user_items(model):
+    def setup(dataset):
+        model.objects.get_or_create(
+            user=dataset.main_user, recipe=dataset.spare_recipe
+        )
+
+    return setup
+
+
+def meal_plan_data(dataset):
+    return {"recipes": [recipe.id for recipe in dataset.meal_plan]}
+
+
+def remove_meal_plan(model):
+    def teardown(dataset):
+        model.objects.bulk_remove(
+            dataset.main_user, meal_plan_data(dataset)["recipes"]
+        )
+
+    return teardown
+
+
+def add_meal_plan(model):
+    def setup(dataset):
+        model.objects.bulk_add(
+            dataset.main_user, meal_plan_data(dataset)["recipes"]
+        )
+
+    return setup
+
+
+def delete_spare_subscription(dataset):
+    Subscription.objects.filter(
+        user=dataset.main_user, author=dataset.spare_user
+    ).delete()
+
+
+def create_spare_subscription(dataset):
+    Subscription.objects.get_or_create(
+        user=dataset.main_user, author=dataset.spare_user
+    )
+
+
+def delete_new_user(dataset):
+    CustomUser.objects.filter(username="benchmark").delete()
+
+
+def create_login_token(dataset):
+    Token.objects.get_or_create(user=dataset.login_user)
+
+
+def delete_login_token(dataset):
+    Token.objects.filter(user=dataset.login_user).delete()
+
+
+def bearer(dataset):
+    token = SignedTokenObtainSerializer.get_token(dataset.main_user)
+    return {"HTTP_AUTHORIZATION": f"Bearer {token.access_token}"}
+
+
+def pantry_data(dataset):
+    return {
+        "ingredients": list(
+            dataset.recipe.ingredientes.values_list(
+                "ingredient_id", flat=True
+            )
+        )
+    }
+
+
+def recipe_url(dataset):
+    return f"/api/recipes/{dataset.recipe.id}/"
+
+
+def spare_recipe_url(action):
+    return lambda dataset: f"/api/recipes/{dataset.spare_recipe.id}/{action}/"
+
+
+def tags_query(*indexes):
+    def query(dataset):
+        return "&".join(f"tags={dataset.tags[i].slug}" for i in indexes)
+
+    return query
+
+
+def recipes_url(*parts):
+    def url(dataset):
+        query = "&".join(
+            part(dataset) if callable(part) else part for part in parts
+        )
+        return f"/api/recipes/?{query}"
+
+    return url
+
+
+def deep_cursor_query(dataset):
+    """Курсор на ту же позицию, что и recipes-list-deep-page."""
+    recipe = Recipe.objects.order_by("name", "id")[6 * 29 - 1]
+    cursor = KeysetPagination().encode_cursor([recipe.name, recipe.id])
+    return f"cursor={cursor}"
+
+
+def catalogue_etag(dataset):
+    return {"HTTP_IF_NONE_MATCH": ingredient_catalogue.get().etag}
+
+
+def author_query(dataset):
+    return f"author={dataset.users[1].id}"
+
+
+CASES = [
+    Case("tags-list", "get", "/api/tags/"),
+    Case(
+        "tags-detail",
+        "get",
+        lambda dataset: f"/api/tags/{dataset.tags[0].id}/",
+    ),
+    Case("ingredients-list", "get", "/api/ingredients/"),
+    Case(
+        "ingredients-list-brotli",
+        "get",
+        "/api/ingredients/",
+        headers={"HTTP_ACCEPT_ENCODING": "gzip, deflate, br"},
+    ),
+    Case(
+        "ingredients-list-not-modified",
+        "get",
+        "/api/ingredients/",
+        headers=catalogue_etag,
+    ),
+    Case("ingredients-search", "get", "/api/ingredients/?name=мук"),
+    Case(
+        "ingredients-detail",
+        "get",
+        lambda dataset: f"/api/ingredients/{dataset.ingredients[0].id}/",
+    ),
+    Case("recipes-list", "get", recipes_url("limit=6")),
+    Case("recipes-list-jwt", "get", recipes_url("limit=6"), headers=bearer),
+    Case("recipes-list-anonymous", "get", recipes_url("limit=6"), user=None),
+    Case("recipes-list-limit-50", "get", recipes_url("limit=50")),
+    Case("recipes-list-deep-page", "get", recipes_url("limit=6", "page=30")),
+    Case(
+        "recipes-list-cursor",
+        "get",
+        recipes_url("limit=6", "pagination=cursor"),
+    ),
+    Case(
+        "recipes-list-deep-cursor",
+        "get",
+        recipes_url("limit=6", deep_cursor_query),
+    ),
+    Case("recipes-filter-tag", "get", recipes_url("limit=6", tags_query(0))),
+    Case(
+        "recipes-filter-tags",
+        "get",
+        recipes_url("limit=6", tags_query(0, 1, 2)),
+    ),
+    Case("recipes-filter-author", "get", recipes_url("limit=6", author_query)),
+    Case(
+        "recipes-filter-favorited",
+        "get",
+        recipes_url("limit=6", "is_favorited=1"),
+    ),
+    Case(
+        "recipes-filter-shopping-cart",
+        "get",
+        recipes_url("limit=6", "is_in_shopping_cart=1"),
+    ),
+    Case(
+        "recipes-filter-combined",
+        "get",
+        recipes_url(
+            "limit=6",
+            "is_favorited=1",
+            "is_in_shopping_cart=1",
+            tags_query(0, 1),
+        ),
+    ),
+    Case(
+        "recipes-search",
+        "get",
+        recipes_url("limit=6", "search=рецепт"),
+    ),
+    Case(
+        "recipes-search-filtered",
+        "get",
+        recipes_url("limit=6", "search=рецепт", tags_query(0, 1)),
+    ),
+    Case(
+        "recipes-popular",
+        "get",
+        recipes_url("limit=6", "ordering=popular"),
+    ),
+    Case(
+        "recipes-popular-cursor",
+        "get",
+        recipes_url("limit=6", "ordering=popular", "pagination=cursor"),
+    ),
+    Case("recipes-detail", "get", recipe_url),
+    Case(
+        "recipes-cookable",
+        "post",
+        "/api/recipes/cookable/?limit=6",
+        data=pantry_data,
+    ),
+    Case(
+        "recipes-similar",
+        "get",
+        lambda dataset: f"/api/recipes/{dataset.recipe.id}/similar/",
+    ),
+    Case(
+        "recipes-create",
+        "post",
+        "/api/recipes/",
+        data=recipe_payload,
+        teardown=delete_benchmark_recipes,
+    ),
+    Case(
+        "recipes-update",
+        "patch",
+        lambda dataset: f"/api/recipes/{dataset.benchmark_recipe.id}/",
+        data=recipe_payload,
+        setup=create_benchmark_recipe,
+        teardown=delete_benchmark_recipes,
+    ),
+    Case(
+        "recipes-delete",
+        "delete",
+        lambda dataset: f"/api/recipes/{dataset.benchmark_recipe.id}/",
+        setup=create_benchmark_recipe,
+    ),
+    Case(
+        "favorite-add",
+        "post",
+        spare_recipe_url("favorite"),
+        teardown=delete_user_items(Favorite),
+    ),
+    Case(
+        "favorite-delete",
+        "delete",
+        spare_recipe_url("favorite"),
+        setup=create_user_items(Favorite),
+    ),
+    Case(
+        "shopping-cart-add",
+        "post",
+        spare_recipe_url("shopping_cart"),
+        teardown=delete_user_items(ShoppingCart),
+    ),
+    Case(
+        "shopping-cart-delete",
+        "delete",
+        spare_recipe_url("shopping_cart"),
+        setup=create_user_items(ShoppingCart),
+    ),
+    Case(
+        "favorite-bulk-add",
+        "post",
+        "/api/recipes/favorite/",
+        data=meal_plan_data,
+        teardown=remove_meal_plan(Favorite),
+    ),
+    Case(
+        "favorite-bulk-delete",
+        "delete",
+        "/api/recipes/favorite/",
+        data=meal_plan_data,
+        setup=add_meal_plan(Favorite),
+    ),
+    Case(
+        "shopping-cart-bulk-add",
+        "post",
+        "/api/recipes/shopping_cart/",
+        data=meal_plan_data,
+        teardown=remove_meal_plan(ShoppingCart),
+    ),
+    Case(
+        "shopping-cart-bulk-delete",
+        "delete",
+        "/api/recipes/shopping_cart/",
+        data=meal_plan_data,
+        setup=add_meal_plan(ShoppingCart),
+    ),
+    Case(
+        "download-shopping-cart",
+        "get",
+        "/api/recipes/download_shopping_cart/",
+    ),
+    Case("users-list", "get", "/api/users/?limit=6"),
+    Case("users-list-cursor", "get", "/api/users/?limit=6&pagination=cursor"),
+    Case(
+        "users-detail",
+        "get",
+        lambda dataset: f"/api/users/{dataset.users[1].id}/",
+    ),
+    Case("users-me", "get", "/api/users/me/"),
+    Case("users-me-jwt", "get", "/api/users/me/", headers=bearer),
+    Case(
+        "users-create",
+        "post",
+        "/api/users/",
+        user=None,
+        data={
+            "email": "benchmark@example.com",
+            "username": "benchmark",
+            "first_name": "Бенчмарк",
+            "last_name": "Бенчмарков",
+            "password": BENCHMARK_PASSWORD,
+        },
+        teardown=delete_new_user,
+    ),
+    Case("recipes-feed", "get", "/api/recipes/feed/?limit=6"),
+    Case("subscriptions", "get", "/api/users/subscriptions/?limit=6"),
+    Case(
+        "subscriptions-cursor",
+        "get",
+        "/api/users/subscriptions/?limit=6&pagination=cursor",
+    ),
+    Case(
+        "subscriptions-recipes-limit",
+        "get",
+        "/api/users/subscriptions/?limit=6&recipes_limit=3",
+    ),
+    Case(
+        "subscriptions-all-authors",
+        "get",
+        "/api/users/subscriptions/?limit=100&recipes_limit=3",
+    ),
+    Case(
+        "subscribe",
+        "post",
+        lambda dataset: f"/api/users/{dataset.spare_user.id}/subscribe/",
+        teardown=delete_spare_subscription,
+    ),
+    Case(
+        "unsubscribe",
+        "delete",
+        lambda dataset: f"/api/users/{dataset.spare_user.id}/subscribe/",
+        setup=create_spare_subscription,
+    ),
+    Case(
+        "token-login",
+        "post",
+        "/api/auth/token/login/",
+        user=None,
+        data=lambda dataset: {
+            "email": dataset.login_user.email,
+            "password": BENCHMARK_PASSWORD,
+        },
+        teardown=delete_login_token,
+    ),
+    Case(
+        "jwt-create",
+        "post",
+        "/api/auth/jwt/create/",
+        user=None,
+        data=lambda dataset: {
+            "email": dataset.login_user.email,
+            "password": BENCHMARK_PASSWORD,
+        },
+    ),
+    Case(
+        "token-logout",
+        "post",
+        "/api/auth/token/logout/",
+        user="login",
+        setup=create_login_token,
+    ),
+]
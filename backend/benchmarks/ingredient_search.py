@@ -0,0 +1,76 @@
+"""
+Сравнение скорости автодополнения ингредиентов: индекс в памяти против
+фильтра icontains через ORM с сериализацией.
+
+    python -m benchmarks.ingredient_search --lookups 2000
+"""
+import argparse
+import random
+import time
+
+from benchmarks import setup_django
+
+setup_django()
+
+from api.search import ingredient_index  # noqa: E402
+from api.serializers import IngredientSerializer  # noqa: E402
+from benchmarks.dataset import load_ingredients  # noqa: E402
+from benchmarks.runner import test_database  # noqa: E402
+from recipes.models import Ingredient  # noqa: E402
+
+
+def make_queries(names, count, seed=0):
+    """Начала и фрагменты названий длиной 1-5 символов, как при наборе."""
+    rnd = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        name = rnd.choice(names)
+        start = rnd.choice((0, 0, rnd.randrange(len(name))))
+        queries.append(name[start:start + rnd.randint(1, 5)])
+    return queries
+
+
+def orm_lookup(query):
+    return IngredientSerializer(
+        Ingredient.objects.filter(name__icontains=query), many=True
+    ).data
+
+
+def throughput(function, queries):
+    """Возвращает количество поисков в секунду."""
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.ingredient_search"
+    )
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    with test_database():
+        catalogue = load_ingredients()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in catalogue
+        )
+        queries = make_queries([name for name, _ in catalogue], args.lookups)
+
+        start = time.perf_counter()
+        ingredient_index.ensure_fresh()
+        build = time.perf_counter() - start
+
+        orm = throughput(orm_lookup, queries)
+        index = throughput(ingredient_index.search, queries)
+
+    print(f"Ингредиентов в каталоге: {len(catalogue)}")
+    print(f"Построение индекса: {build * 1000:.1f} мс")
+    print(f"ORM icontains:      {orm:10.0f} поисков/с")
+    print(f"Индекс в памяти:    {index:10.0f} поисков/с ({index / orm:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
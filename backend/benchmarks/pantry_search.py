@@ -0,0 +1,97 @@
+"""
+Сравнение поиска рецептов по имеющимся ингредиентам: битовые карты
+индекса против группировки IngredientRecipe через ORM. Первые страницы
+обоих способов сверяются между собой.
+
+    python -m benchmarks.pantry_search --size large --searches 200
+"""
+import argparse
+import random
+import time
+
+from benchmarks import setup_django
+
+setup_django()
+
+from django.db.models import Count, F, FloatField, Q  # noqa: E402
+from django.db.models.functions import Cast  # noqa: E402
+
+from api.pantry import pantry_index  # noqa: E402
+from benchmarks.dataset import SIZES, seed  # noqa: E402
+from benchmarks.runner import test_database  # noqa: E402
+from core.constraints import PAGE_SIZE  # noqa: E402
+from recipes.models import IngredientRecipe, Recipe  # noqa: E402
+
+
+def make_pantries(count, seed=0):
+    """
+    Наборы из 3-15 ингредиентов. Ингредиенты берутся из случайных строк
+    IngredientRecipe, поэтому частые попадаются чаще, как и в жизни.
+    """
+    rnd = random.Random(seed)
+    used = list(
+        IngredientRecipe.objects.values_list("ingredient_id", flat=True)
+    )
+    return [
+        {rnd.choice(used) for _ in range(rnd.randint(3, 15))}
+        for _ in range(count)
+    ]
+
+
+def orm_search(ingredients):
+    return list(
+        Recipe.objects.annotate(
+            matched=Count(
+                "ingredientes",
+                filter=Q(ingredientes__ingredient_id__in=ingredients),
+            ),
+            total=Count("ingredientes"),
+        )
+        .filter(matched__gt=0)
+        .annotate(share=Cast("matched", FloatField()) / F("total"))
+        .order_by("-share", "total", "-id")
+        .values_list("id", flat=True)[:PAGE_SIZE]
+    )
+
+
+def index_search(ingredients):
+    return pantry_index.search(ingredients)[:PAGE_SIZE]
+
+
+def throughput(function, pantries):
+    """Возвращает количество поисков в секунду."""
+    start = time.perf_counter()
+    for pantry in pantries:
+        function(pantry)
+    return len(pantries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pantry_search")
+    parser.add_argument("--size", choices=SIZES, default="large")
+    parser.add_argument("--searches", type=int, default=200)
+    args = parser.parse_args()
+
+    with test_database():
+        seed(args.size)
+        pantries = make_pantries(args.searches)
+
+        start = time.perf_counter()
+        pantry_index.rebuild()
+        pantry_index.ensure_fresh()
+        build = time.perf_counter() - start
+
+        for pantry in pantries:
+            assert orm_search(pantry) == index_search(pantry), pantry
+        orm = throughput(orm_search, pantries)
+        index = throughput(index_search, pantries)
+        recipes = Recipe.objects.count()
+
+    print(f"Рецептов: {recipes}, поисков: {len(pantries)}")
+    print(f"Построение индекса: {build * 1000:.1f} мс")
+    print(f"ORM GROUP BY:       {orm:10.0f} поисков/с")
+    print(f"Битовые карты:      {index:10.0f} поисков/с ({index / orm:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
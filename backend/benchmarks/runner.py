@@ -0,0 +1,298 @@
+import argparse
+import json
+import math
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import (override_settings, setup_databases,
+                               setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.catalogue import ingredient_catalogue, tag_catalogue
+from api.search import ingredient_index
+from benchmarks.dataset import SIZES, seed
+from benchmarks.endpoints import CASES
+from core.nplusone import detect_n_plus_one
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BASELINE = BENCHMARKS_DIR / "baseline.json"
+REPORT = BENCHMARKS_DIR / "report.json"
+
+# количество прогревочных запросов, не попадающих в замеры
+WARMUP = 2
+
+# пользователи набора данных, от имени которых выполняются сценарии
+CASE_USERS = {
+    "main": "main_user",
+    "login": "login_user",
+}
+
+
+class QueryTimer:
+    """Обертка выполнения SQL, считающая запросы и их суммарное время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+@contextmanager
+def test_database():
+    """
+    Создает тестовую базу данных, временные MEDIA_ROOT и каталог индексов
+    на время замеров и удаляет их после.
+    """
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(
+                MEDIA_ROOT=media_root,
+                PANTRY_INDEX_DIR=Path(media_root) / "indexes",
+            ):
+                yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def percentile(values, fraction):
+    """Возвращает перцентиль fraction по методу ближайшего ранга."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def credentials(case, dataset):
+    """Возвращает заголовок авторизации для пользователя сценария."""
+    if case.user is None:
+        return {}
+    token, _ = Token.objects.get_or_create(
+        user=getattr(dataset, CASE_USERS[case.user])
+    )
+    return {"HTTP_AUTHORIZATION": f"Token {token.key}"}
+
+
+def measure(client, case, dataset, repeat):
+    """
+    Выполняет сценарий repeat раз и возвращает количество SQL-запросов,
+    суммарное время SQL и перцентили времени ответа в миллисекундах.
+    В последнем прогревочном запросе ищутся N+1: количество запросов
+    повторившихся форм попадает в отчет.
+    """
+    timings, sql_timings = [], []
+    repeated = 0
+    for iteration in range(WARMUP + repeat):
+        if case.setup:
+            case.setup(dataset)
+        path = case.resolve(case.path, dataset)
+        data = case.resolve(case.data, dataset)
+        request = getattr(client, case.method)
+        headers = credentials(case, dataset)
+        headers.update(case.resolve(case.headers, dataset) or {})
+
+        timer = QueryTimer()
+        with ExitStack() as stack:
+            if iteration == WARMUP - 1:
+                detector = stack.enter_context(detect_n_plus_one())
+            stack.enter_context(connection.execute_wrapper(timer))
+            start = time.perf_counter()
+            response = request(path, data=data, format="json", **headers)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        if iteration == WARMUP - 1 and detector.repeated():
+            repeated = sum(count for _, count, _ in detector.repeated())
+            print(
+                f"N+1 в {case.name}:\n{detector.report()}", file=sys.stderr
+            )
+
+        if case.teardown:
+            case.teardown(dataset)
+        if iteration < WARMUP:
+            continue
+        timings.append(elapsed * 1000)
+        sql_timings.append(timer.duration * 1000)
+
+    return {
+        "status": response.status_code,
+        "queries": timer.count,
+        "sql_ms": round(sum(sql_timings) / len(sql_timings), 3),
+        "p50_ms": round(percentile(timings, 0.5), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "repeated_queries": repeated,
+    }
+
+
+def run(sizes, repeat, selected):
+    """Прогоняет сценарии на каждом размере набора данных."""
+    results = {}
+    client = APIClient()
+    cases = [
+        case
+        for case in CASES
+        if not selected or any(name in case.name for name in selected)
+    ]
+    for size in sizes:
+        call_command("flush", interactive=False, verbosity=0)
+        for cache in caches.all():
+            cache.clear()
+        dataset = seed(size)
+        # flush удалил версии данных, а набор загружен без сигналов:
+        # индекс и каталоги прежнего размера не должны считаться свежими
+        ingredient_index.invalidate()
+        tag_catalogue.invalidate()
+        ingredient_catalogue.invalidate()
+        results[size] = {}
+        for case in cases:
+            result = measure(client, case, dataset, repeat)
+            results[size][case.name] = result
+            print(
+                f"{size:<7} {case.name:<32} {result['status']:>4} "
+                f"{result['queries']:>5} q {result['sql_ms']:>9.3f} ms sql "
+                f"{result['p50_ms']:>9.3f} ms p50 "
+                f"{result['p95_ms']:>9.3f} ms p95"
+            )
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "database": connection.vendor,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """
+    Сравнивает отчет с эталоном. Возвращает список регрессий по числу
+    запросов и статусам ответов и список регрессий по задержке p95.
+    """
+    queries, latency = [], []
+    for size, cases in report["results"].items():
+        for name, result in cases.items():
+            expected = baseline["results"].get(size, {}).get(name)
+            if expected is None:
+                continue
+            if result["status"] != expected["status"]:
+                queries.append(
+                    f"{size}/{name}: статус {expected['status']} -> "
+                    f"{result['status']}"
+                )
+            if result["queries"] > expected["queries"]:
+                queries.append(
+                    f"{size}/{name}: запросов {expected['queries']} -> "
+                    f"{result['queries']}"
+                )
+            if result["repeated_queries"] > expected.get(
+                "repeated_queries", 0
+            ):
+                queries.append(
+                    f"{size}/{name}: запросов с повторяющейся формой (N+1) "
+                    f"{expected.get('repeated_queries', 0)} -> "
+                    f"{result['repeated_queries']}"
+                )
+            if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+                latency.append(
+                    f"{size}/{name}: p95 {expected['p95_ms']} мс -> "
+                    f"{result['p95_ms']} мс"
+                )
+    return queries, latency
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Замеры числа SQL-запросов и задержек эндпоинтов API.",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        choices=SIZES,
+        default=["small", "medium"],
+        help="Размеры наборов данных.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="Количество замеров каждого сценария.",
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        default=[],
+        help="Запускать только сценарии, содержащие эти подстроки.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=REPORT,
+        help="Путь для JSON-отчета.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=BASELINE,
+        help="Путь к эталонному отчету.",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Записать отчет в качестве нового эталона.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Допустимый относительный рост p95 по сравнению с эталоном.",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Считать рост задержки ошибкой, а не предупреждением.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with test_database():
+        report = run(args.sizes, args.repeat, args.cases)
+
+    args.output.write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    if args.update_baseline:
+        args.baseline.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        return 0
+    if not args.baseline.exists():
+        print(f"Эталон {args.baseline} не найден, сравнение пропущено.")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    queries, latency = compare(report, baseline, args.tolerance)
+    for problem in queries + latency:
+        print(f"РЕГРЕССИЯ {problem}", file=sys.stderr)
+    if queries or (args.strict and latency):
+        return 1
+    return 0
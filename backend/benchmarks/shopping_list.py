@@ -0,0 +1,121 @@
+"""
+Память и время выгрузки списка покупок для корзин разного размера.
+Пиковая память процесса при потоковой выгрузке не должна зависеть от
+количества рецептов в корзине.
+
+    python -m benchmarks.shopping_list --carts 100 500 1000 2000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from benchmarks import setup_django
+
+setup_django()
+
+from rest_framework.test import APIClient  # noqa: E402
+
+from benchmarks.dataset import load_ingredients  # noqa: E402
+from benchmarks.runner import test_database  # noqa: E402
+from recipes.models import (Ingredient, IngredientRecipe, Recipe,  # noqa: E402
+                            ShoppingCart, ShoppingListItem)
+from users.models import CustomUser  # noqa: E402
+
+INGREDIENTS_PER_RECIPE = 10
+
+
+def seed_recipes(count, author, ingredient_ids, seed=0):
+    """Создает count рецептов со случайными ингредиентами из каталога."""
+    rnd = random.Random(seed)
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f"Рецепт {number}",
+            text="Описание",
+            image="recipes/images/benchmark.png",
+            cooking_time=10,
+        )
+        for number in range(count)
+    )
+    recipes = list(Recipe.objects.filter(author=author).order_by("id"))
+    IngredientRecipe.objects.bulk_create(
+        (
+            IngredientRecipe(
+                recipe=recipe, ingredient_id=pk, amount=rnd.randint(1, 500)
+            )
+            for recipe in recipes
+            for pk in rnd.sample(ingredient_ids, INGREDIENTS_PER_RECIPE)
+        ),
+        batch_size=1_000,
+    )
+    return recipes
+
+
+def measure(client, export_format):
+    """
+    Возвращает размер ответа, пиковую память в Кб и время в мс для
+    выгрузки, включая чтение всего тела ответа.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(
+        "/api/recipes/download_shopping_cart/", {"format": export_format}
+    )
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak / 1024, elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.shopping_list")
+    parser.add_argument(
+        "--carts", nargs="+", type=int, default=[100, 500, 1000, 2000]
+    )
+    parser.add_argument("--formats", nargs="+", default=["txt", "csv", "pdf"])
+    args = parser.parse_args()
+
+    with test_database():
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in load_ingredients()
+        )
+        ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+        user = CustomUser.objects.create_user(
+            email="shopper@example.com",
+            username="shopper",
+            first_name="Покупатель",
+            last_name="Покупателев",
+        )
+        recipes = seed_recipes(max(args.carts), user, ingredient_ids)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        print(
+            f"{'рецептов':>8} {'формат':>6} {'байт':>9} "
+            f"{'пик, Кб':>9} {'время, мс':>10}"
+        )
+        in_cart = 0
+        for cart in sorted(args.carts):
+            ShoppingCart.objects.bulk_create(
+                ShoppingCart(user=user, recipe=recipe)
+                for recipe in recipes[in_cart:cart]
+            )
+            ShoppingListItem.objects.rebuild()
+            in_cart = cart
+            for export_format in args.formats:
+                measure(client, export_format)
+                size, peak, elapsed = measure(client, export_format)
+                print(
+                    f"{cart:>8} {export_format:>6} {size:>9} "
+                    f"{peak:>9.0f} {elapsed:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
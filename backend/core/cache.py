@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+
+from recipes.models import DataVersion
+
+# версии, прочитанные процессом: ключ -> (версия, до какого момента
+# time.monotonic() ее можно не перечитывать)
+_versions = {}
+
+
+def get_versions(*keys):
+    """
+    Возвращает текущие версии данных keys. Версии хранятся в базе данных
+    и общие для всех воркеров и серверов; процесс перечитывает их одним
+    запросом не чаще раза в DATA_VERSION_TTL секунд.
+    """
+    now = time.monotonic()
+    known = [_versions.get(key) for key in keys]
+    if all(entry is not None and entry[1] > now for entry in known):
+        return [version for version, _ in known]
+    versions = DataVersion.objects.get_versions(keys)
+    expires = now + settings.DATA_VERSION_TTL
+    for key, version in zip(keys, versions):
+        _versions[key] = (version, expires)
+    return versions
+
+
+def get_version(key):
+    """Возвращает текущую версию данных key."""
+    return get_versions(key)[0]
+
+
+def bump_version(key):
+    """Меняет версию данных, чтобы все процессы сбросили свои копии."""
+    DataVersion.objects.bump(key)
+    # этот процесс видит изменение сразу, остальные - через TTL
+    _versions.pop(key, None)
+
+
+def forget_versions():
+    """Забывает прочитанные версии: следующее чтение пойдет в базу."""
+    _versions.clear()
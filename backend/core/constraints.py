@@ -20,3 +20,12 @@ MAX_COOKING_TIME = MAX_AMOUNT = 32000
 
 # количество элементов, возвращаемых на страницу в постраничном ответе
 PAGE_SIZE = 5
+
+# максимальное количество рецептов в одной массовой операции
+MAX_BULK_RECIPES = 100
+
+# количество похожих рецептов, хранимых для каждого рецепта
+SIMILAR_RECIPES = 10
+
+# максимальное количество ингредиентов в поиске по имеющимся продуктам
+MAX_PANTRY_INGREDIENTS = 100
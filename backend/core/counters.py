@@ -0,0 +1,53 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def count_related(queryset, field):
+    """
+    Подзапрос с количеством строк queryset, у которых поле field ссылается
+    на строку внешнего запроса.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        Value(0),
+    )
+
+
+def change_counter(queryset, field, delta):
+    """
+    Атомарно изменяет счетчик field у строк queryset на delta одним
+    UPDATE, не опуская его ниже нуля.
+    """
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+class CounterFieldsMixin:
+    """
+    Примесь для моделей с денормализованными счетчиками counter_fields.
+
+    Счетчики меняются только через UPDATE с F(), поэтому при сохранении
+    существующего объекта без update_fields они не записываются: иначе
+    save() вернул бы в базу значения, прочитанные вместе с объектом.
+    Отложенные поля тоже не записываются, как в обычном save(): иначе
+    каждое из них загружалось бы отдельным запросом.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.db.utils import OperationalError
+
+# события соединений по базам данных: opened, reused, closed, discarded,
+# health_checks, failed_checks, waits, timeouts
+connection_stats = defaultdict(Counter)
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+# пулы родителя в дочернем процессе: сборка их соединений отправила бы
+# серверу завершение сеанса через общий с родителем сокет
+_inherited = []
+
+
+class PooledConnection:
+    __slots__ = ("connection", "created", "released")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created = time.monotonic()
+        self.released = self.created
+
+
+class ConnectionPool:
+    """
+    Пул соединений процесса с одной базой данных.
+
+    Открыто не больше max_size соединений: когда все заняты, поток ждет
+    освобождения до timeout секунд. Свободное соединение перед выдачей
+    проверяется check, если простаивало дольше check_interval секунд, и
+    закрывается, если живет дольше max_age секунд.
+    """
+
+    def __init__(self, alias, max_size, timeout, max_age, check_interval):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.condition = threading.Condition()
+        self.idle = []
+        self.in_use = {}
+        self.size = 0
+        self.stats = connection_stats[alias]
+
+    def acquire(self, connect, check):
+        """
+        Возвращает проверенное свободное соединение или открывает новое
+        через connect.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = self.take(deadline)
+            if entry is None:
+                return self.open(connect)
+            if self.usable(entry, check):
+                with self.condition:
+                    self.in_use[id(entry.connection)] = entry
+                    self.stats["reused"] += 1
+                return entry.connection
+            self.discard(entry)
+
+    def take(self, deadline):
+        """
+        Свободное соединение или None, если можно открыть новое: место
+        под него уже занято.
+        """
+        with self.condition:
+            while True:
+                if self.idle:
+                    # последнее освобожденное: у него теплые кэши сервера
+                    return self.idle.pop()
+                if self.size < self.max_size:
+                    self.size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise OperationalError(
+                        f"Нет свободных соединений с базой {self.alias}: "
+                        f"все {self.max_size} заняты"
+                    )
+                self.stats["waits"] += 1
+                self.condition.wait(remaining)
+
+    def open(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.in_use[id(connection)] = PooledConnection(connection)
+            self.stats["opened"] += 1
+        return connection
+
+    def expired(self, entry):
+        return (
+            self.max_age is not None
+            and time.monotonic() - entry.created >= self.max_age
+        )
+
+    def usable(self, entry, check):
+        if entry.connection.closed or self.expired(entry):
+            return False
+        if time.monotonic() - entry.released < self.check_interval:
+            return True
+        self.stats["health_checks"] += 1
+        if check(entry.connection):
+            return True
+        self.stats["failed_checks"] += 1
+        return False
+
+    def release(self, connection, reset):
+        """
+        Возвращает соединение в пул. reset откатывает незавершенную
+        транзакцию и сообщает, можно ли использовать соединение дальше.
+        """
+        with self.condition:
+            entry = self.in_use.pop(id(connection), None)
+        if entry is None:
+            connection.close()
+            return
+        if not reset(connection) or self.expired(entry):
+            self.discard(entry)
+            return
+        entry.released = time.monotonic()
+        with self.condition:
+            self.idle.append(entry)
+            self.condition.notify()
+
+    def discard(self, entry):
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.size -= 1
+            self.stats["discarded"] += 1
+            self.condition.notify()
+
+    def close_idle(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for entry in idle:
+            self.discard(entry)
+
+    def forget(self, connection):
+        """Соединение закрыто в обход пула и освобождает место."""
+        with self.condition:
+            if self.in_use.pop(id(connection), None) is not None:
+                self.size -= 1
+                self.stats["closed"] += 1
+                self.condition.notify()
+
+
+def get_pool(alias, params, options):
+    """
+    Пул для базы alias с параметрами подключения params. Тестовая база
+    и база без имени для ее создания получают отдельные пулы. После
+    fork пулы родителя не используются: их сокеты общие с родителем.
+    """
+    global _pools_pid
+    key = (
+        alias,
+        tuple(sorted((name, str(value)) for name, value in params.items())),
+    )
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            _inherited.append(dict(_pools))
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                alias,
+                max_size=options["MAX_SIZE"],
+                timeout=options["TIMEOUT"],
+                max_age=options["MAX_AGE"],
+                check_interval=options["CHECK_INTERVAL"],
+            )
+    return pool
+
+
+def close_idle(alias):
+    """Закрывает свободные соединения пулов базы alias."""
+    with _pools_lock:
+        pools = [pool for pool in _pools.values() if pool.alias == alias]
+    for pool in pools:
+        pool.close_idle()
+
+
+def render_metrics():
+    """Строки текстового формата Prometheus со статистикой соединений."""
+    lines = [
+        "# HELP foodgram_db_connection_events_total События соединений с "
+        "базой данных.",
+        "# TYPE foodgram_db_connection_events_total counter",
+    ]
+    for alias, events in sorted(connection_stats.items()):
+        for event, count in sorted(events.items()):
+            lines.append(
+                "foodgram_db_connection_events_total"
+                f'{{database="{alias}",event="{event}"}} {count}'
+            )
+
+    states = defaultdict(Counter)
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        with pool.condition:
+            states[pool.alias]["idle"] += len(pool.idle)
+            states[pool.alias]["in_use"] += len(pool.in_use)
+            states[pool.alias]["max"] += pool.max_size
+    lines += [
+        "# HELP foodgram_db_pool_connections Соединения в пулах процесса.",
+        "# TYPE foodgram_db_pool_connections gauge",
+    ]
+    for alias, counts in sorted(states.items()):
+        for state, count in sorted(counts.items()):
+            lines.append(
+                "foodgram_db_pool_connections"
+                f'{{database="{alias}",state="{state}"}} {count}'
+            )
+    return lines
@@ -0,0 +1,127 @@
+from functools import partial
+
+import psycopg2
+from django.db.backends.postgresql import base
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from core.db.pool import connection_stats, get_pool
+from core.db.postgresql.creation import DatabaseCreation
+
+
+def check_connection(connection):
+    """Соединение живо: сервер отвечает на SELECT 1."""
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def reset_connection(connection):
+    """Откатывает незавершенную транзакцию перед возвратом в пул."""
+    if connection.closed:
+        return False
+    try:
+        if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с проверкой соединений перед повторным использованием и
+    пулом соединений процесса.
+
+    CONN_HEALTH_CHECKS: постоянное соединение (CONN_MAX_AGE > 0)
+    проверяется при первом обращении в каждом запросе и открывается
+    заново, если сервер его разорвал.
+
+    POOL: соединение в конце запроса не закрывается, а возвращается в
+    общий пул процесса, откуда его берет следующий запрос любого потока.
+    Ключи: MAX_SIZE - наибольшее число соединений, TIMEOUT - сколько
+    секунд ждать свободного, MAX_AGE - время жизни соединения,
+    CHECK_INTERVAL - сколько секунд простоя соединение выдается без
+    проверки.
+    """
+
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.release_to_pool = False
+        self.stats = connection_stats[self.alias]
+
+    @property
+    def pool(self):
+        return get_pool(
+            self.alias,
+            self.get_connection_params(),
+            self.settings_dict["POOL"],
+        )
+
+    def connect(self):
+        # новое соединение не проверяется: connect сам вызывает
+        # ensure_connection из set_autocommit
+        self.health_check_done = True
+        super().connect()
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            # первое обращение к соединению, оставшемуся от прошлого запроса
+            self.health_check_done = True
+            self.stats["reused"] += 1
+            if self.settings_dict.get("CONN_HEALTH_CHECKS"):
+                self.stats["health_checks"] += 1
+                if not self.is_usable():
+                    self.stats["failed_checks"] += 1
+                    self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        # вызывается в начале и в конце каждого запроса
+        self.health_check_done = False
+        self.release_to_pool = True
+        try:
+            super().close_if_unusable_or_obsolete()
+        finally:
+            self.release_to_pool = False
+
+    def get_new_connection(self, conn_params):
+        if not self.settings_dict.get("POOL"):
+            self.stats["opened"] += 1
+            return super().get_new_connection(conn_params)
+        connection = self.pool.acquire(
+            partial(super().get_new_connection, conn_params),
+            check_connection,
+        )
+        # уровень изоляции соединения из пула; для нового его уже
+        # установил get_new_connection
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return None
+        if not self.settings_dict.get("POOL"):
+            self.stats["closed"] += 1
+            return super()._close()
+        if self.release_to_pool and not self.in_atomic_block:
+            self.pool.release(self.connection, reset_connection)
+            return None
+        # закрыто в обход пула: разрыв, незавершенная транзакция, тесты
+        try:
+            return super()._close()
+        finally:
+            self.pool.forget(self.connection)
@@ -0,0 +1,10 @@
+from django.db.backends.postgresql import creation
+
+from core.db.pool import close_idle
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # соединения из пула не дали бы удалить тестовую базу
+        close_idle(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
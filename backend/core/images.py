@@ -0,0 +1,44 @@
+import io
+
+from PIL import Image, ImageOps
+
+# варианты картинки рецепта: название -> наибольшая сторона в пикселях
+IMAGE_VARIANTS = {
+    "card": 480,
+    "detail": 960,
+    "retina": 1920,
+}
+
+# форматы вариантов: расширение -> (формат Pillow, параметры сохранения)
+IMAGE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def render_variants(content):
+    """
+    Уменьшает картинку content до размеров всех вариантов и кодирует их
+    во всех форматах. Возвращает словарь (вариант, расширение) -> байты.
+
+    Функция не использует Django и выполняется в отдельных процессах.
+    """
+    with Image.open(io.BytesIO(content)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        if image.mode == "RGBA":
+            # JPEG не поддерживает прозрачность, заливаем фон белым
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+
+        variants = {}
+        for variant, size in IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            for extension, (image_format, params) in IMAGE_FORMATS.items():
+                buffer = io.BytesIO()
+                resized.save(buffer, format=image_format, **params)
+                variants[variant, extension] = buffer.getvalue()
+        return variants
@@ -0,0 +1,246 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from core.db.pool import render_metrics as connection_metrics
+
+# верхние границы корзин гистограммы времени ответа, в секундах
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# фазы запроса, время которых суммируется по представлениям
+PHASES = ("sql", "serialize", "render")
+
+current_request = ContextVar("current_request", default=None)
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.view = "unresolved"
+        self.queries = 0
+        self.sql = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.view_started = None
+        self.view_sql = 0.0
+        self.render_started = None
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка выполнения SQL для connection.execute_wrapper."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - start
+            self.queries += 1
+
+    def start_view(self):
+        self.view_started = time.perf_counter()
+        self.view_sql = self.sql
+
+    def finish_view(self):
+        """
+        Время представления без SQL. В API это в основном сериализация:
+        рендеринг ответа DRF откладывает до выхода из представления.
+        """
+        self.render_started = time.perf_counter()
+        if self.view_started is not None:
+            elapsed = self.render_started - self.view_started
+            self.serialize = max(elapsed - (self.sql - self.view_sql), 0.0)
+
+    def finish_render(self, response):
+        self.render = time.perf_counter() - self.render_started
+
+    def server_timing(self, total):
+        return ", ".join(
+            (
+                f'db;dur={self.sql * 1000:.1f};desc="{self.queries} queries"',
+                f"serialize;dur={self.serialize * 1000:.1f}",
+                f"render;dur={self.render * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            )
+        )
+
+
+def view_name(view_func, method):
+    """
+    Имя представления для меток: RecipeViewSet.list,
+    CustomUserViewSet.subscriptions, TokenObtainPairView.post.
+    """
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        name = getattr(view_func, "__qualname__", type(view_func).__name__)
+        return f"{view_func.__module__}.{name}"
+    actions = getattr(view_func, "actions", None) or {}
+    return f"{view_class.__name__}.{actions.get(method, method)}"
+
+
+class Histogram:
+    """Гистограмма с накопленными корзинами, как в формате Prometheus."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), self.buckets):
+            total += count
+            yield bound, total
+
+
+class ViewMetrics:
+    """Накопленные замеры одного представления."""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.queries = 0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+
+
+def label(value):
+    value = str(value)
+    return (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+class MetricsRegistry:
+    """
+    Замеры запросов, накопленные в памяти процесса. Каждый воркер
+    считает свои запросы с момента запуска.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, metrics, method, status, total):
+        key = (metrics.view, method, status)
+        with self.lock:
+            view = self.views.get(key)
+            if view is None:
+                view = self.views[key] = ViewMetrics()
+            view.latency.observe(total)
+            view.queries += metrics.queries
+            for phase in PHASES:
+                view.phases[phase] += getattr(metrics, phase)
+
+    def render(self):
+        """Текстовый формат Prometheus."""
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = [
+                "# HELP foodgram_request_duration_seconds "
+                "Время обработки запроса.",
+                "# TYPE foodgram_request_duration_seconds histogram",
+            ]
+            for (view, method, status), metrics in views:
+                labels = (
+                    f'view="{label(view)}",method="{method}",'
+                    f'status="{status}"'
+                )
+                for bound, count in metrics.latency.cumulative():
+                    lines.append(
+                        "foodgram_request_duration_seconds_bucket"
+                        f'{{{labels},le="{bound}"}} {count}'
+                    )
+                lines.append(
+                    f"foodgram_request_duration_seconds_sum{{{labels}}} "
+                    f"{metrics.latency.sum:.6f}"
+                )
+                lines.append(
+                    f"foodgram_request_duration_seconds_count{{{labels}}} "
+                    f"{metrics.latency.count}"
+                )
+            lines += [
+                "# HELP foodgram_request_queries_total "
+                "Количество SQL-запросов.",
+                "# TYPE foodgram_request_queries_total counter",
+            ]
+            for (view, method, status), metrics in views:
+                lines.append(
+                    f'foodgram_request_queries_total{{view="{label(view)}",'
+                    f'method="{method}",status="{status}"}} {metrics.queries}'
+                )
+            for phase in PHASES:
+                name = f"foodgram_request_{phase}_seconds_total"
+                lines += [
+                    f"# HELP {name} Суммарное время фазы {phase}.",
+                    f"# TYPE {name} counter",
+                ]
+                for (view, method, status), metrics in views:
+                    lines.append(
+                        f'{name}{{view="{label(view)}",method="{method}",'
+                        f'status="{status}"}} {metrics.phases[phase]:.6f}'
+                    )
+        lines += connection_metrics()
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет количество и время SQL-запросов, время сериализации и
+    рендеринга ответа по представлениям. Возвращает замеры в заголовке
+    Server-Timing и копит гистограммы времени ответа в metrics_registry.
+
+    Фазы отделяются хуками промежуточного слоя, без подмены классов DRF:
+    сериализация - время от process_view до process_template_response
+    за вычетом SQL, рендеринг - до post-render callback ответа.
+
+    Подключается первой в MIDDLEWARE, чтобы учитывать запросы остальных
+    промежуточных слоев.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(metrics.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        total = time.perf_counter() - start
+
+        metrics_registry.record(
+            metrics, request.method, response.status_code, total
+        )
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = metrics.server_timing(total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.view = view_name(view_func, request.method.lower())
+            metrics.start_view()
+
+    def process_template_response(self, request, response):
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.finish_view()
+            response.add_post_render_callback(metrics.finish_render)
+        return response
@@ -0,0 +1,149 @@
+import logging
+import re
+import sys
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import Field, ListSerializer
+
+logger = logging.getLogger(__name__)
+
+# литералы и списки параметров не меняют форму запроса
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PARAMETER_LISTS = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+SPACES = re.compile(r"\s+")
+
+# обертки самих замеров не считаются местом вызова запроса
+INSTRUMENTATION = ("core/metrics.py", "core/nplusone.py", "core/profiling.py")
+
+# служебные запросы вложенных транзакций повторяются законно
+IGNORED = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class NPlusOneError(AssertionError):
+    """Запрос одной формы повторился чаще порога."""
+
+
+def query_shape(sql):
+    """Форма запроса: текст без литералов и длины списков IN (...)."""
+    shape = LITERALS.sub("?", sql)
+    shape = PARAMETER_LISTS.sub("(...)", shape)
+    return SPACES.sub(" ", shape).strip()
+
+
+def is_project_code(filename):
+    return (
+        filename.startswith(str(settings.BASE_DIR))
+        and "site-packages" not in filename
+        and not filename.endswith(INSTRUMENTATION)
+    )
+
+
+def query_origin(frame):
+    """
+    Откуда выполняется запрос: цепочка полей сериализаторов от внешнего
+    к внутреннему, например ListSerializer >
+    CustomUserSerializer.is_subscribed, и ближайшая строка кода проекта.
+    """
+    fields = []
+    line = None
+    while frame is not None:
+        code = frame.f_code
+        field = frame.f_locals.get("self")
+        if code.co_name == "to_representation" and isinstance(field, Field):
+            if field.parent is None:
+                fields.append(type(field).__name__)
+            elif not isinstance(field.parent, ListSerializer):
+                fields.append(
+                    f"{type(field.parent).__name__}.{field.field_name}"
+                )
+        elif line is None and is_project_code(code.co_filename):
+            path = code.co_filename[len(str(settings.BASE_DIR)) + 1:]
+            line = f"{path}:{frame.f_lineno} ({code.co_name})"
+        frame = frame.f_back
+    return " > ".join([*reversed(fields), line or "?"])
+
+
+class QueryShapeDetector:
+    """
+    Обертка выполнения SQL, группирующая запросы по форме и месту вызова.
+    Форма, выполненная не меньше threshold раз, считается N+1.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.shapes = defaultdict(Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = query_shape(sql)
+        if not shape.startswith(IGNORED):
+            self.shapes[shape][query_origin(sys._getframe(1))] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """Повторившиеся формы: (форма, количество, места вызова)."""
+        return sorted(
+            (
+                (shape, sum(origins.values()), origins)
+                for shape, origins in self.shapes.items()
+                if sum(origins.values()) >= self.threshold
+            ),
+            key=lambda item: -item[1],
+        )
+
+    def report(self):
+        lines = []
+        for shape, count, origins in self.repeated():
+            lines.append(f"{count} x {shape}")
+            for origin, times in origins.most_common():
+                lines.append(f"    {times} x {origin}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def detect_n_plus_one(threshold=None):
+    """Собирает формы запросов ко всем базам данных внутри блока."""
+    detector = QueryShapeDetector(threshold or settings.NPLUSONE_THRESHOLD)
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(detector))
+        yield detector
+
+
+@contextmanager
+def assert_no_n_plus_one(threshold=None):
+    """Для тестов: NPlusOneError, если внутри блока найден N+1."""
+    with detect_n_plus_one(threshold) as detector:
+        yield detector
+    if detector.repeated():
+        raise NPlusOneError("N+1 запросов:\n" + detector.report())
+
+
+class NPlusOneMiddleware:
+    """
+    Ищет N+1 запросов при обработке каждого запроса и пишет их в лог, а
+    при NPLUSONE_RAISE выбрасывает NPlusOneError, которую тестовый клиент
+    Django пробрасывает в тест. Включается NPLUSONE_DETECT, по умолчанию
+    только при DEBUG.
+    """
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_DETECT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with detect_n_plus_one() as detector:
+            response = self.get_response(request)
+        if detector.repeated():
+            message = (
+                f"N+1 запросов в {request.method} {request.get_full_path()}:"
+                f"\n{detector.report()}"
+            )
+            logger.warning(message)
+            if settings.NPLUSONE_RAISE:
+                raise NPlusOneError(message)
+        return response
@@ -0,0 +1,281 @@
+import struct
+from array import array
+from collections import defaultdict
+
+MAGIC = b"FGPI"
+FORMAT = 1
+
+# заголовок: метка, версия формата, поколение, байт в битовой карте,
+# количество ингредиентов, количество разрядов размера рецепта
+HEADER = struct.Struct("=4sIQIII")
+# запись каталога: id ингредиента, количество рецептов, смещение списка
+ENTRY = struct.Struct("=IIQ")
+
+RECIPE_IDS = "I"
+
+
+def popcount(bitmap):
+    """Количество единичных битов (int.bit_count есть только с 3.10)."""
+    return bin(bitmap).count("1")
+
+
+def add_bitmap(planes, bitmap):
+    """
+    Прибавляет битовую карту к счетчикам, хранящимся по разрядам:
+    planes[i] - карта рецептов, у которых i-й бит счетчика равен 1.
+    Одно сложение - несколько операций над целыми числами вместо
+    прохода по рецептам.
+    """
+    carry = bitmap
+    for position, plane in enumerate(planes):
+        planes[position] = plane ^ carry
+        carry &= plane
+        if not carry:
+            return
+    planes.append(carry)
+
+
+def select(planes, value, bitmap):
+    """Рецепты из bitmap, у которых счетчик planes равен value."""
+    if value >> len(planes):
+        return 0
+    for position, plane in enumerate(planes):
+        if value >> position & 1:
+            bitmap &= plane
+        else:
+            bitmap &= ~plane
+        if not bitmap:
+            break
+    return bitmap
+
+
+def write_index(file, pairs, generation):
+    """
+    Записывает в file снимок индекса по парам (id рецепта, id
+    ингредиента).
+
+    Бит с номером id рецепта в карте ингредиента означает, что рецепт
+    его содержит. Редкие ингредиенты хранятся отсортированным массивом
+    id рецептов, частые - битовой картой: выбирается то, что короче.
+    Количество ингредиентов рецептов хранится по разрядам, тоже картами.
+    """
+    postings = defaultdict(list)
+    sizes = defaultdict(int)
+    for recipe_id, ingredient_id in pairs:
+        postings[ingredient_id].append(recipe_id)
+        sizes[recipe_id] += 1
+    capacity = max(sizes, default=0) // 8 + 1
+    planes = [
+        bytearray(capacity)
+        for _ in range(max(sizes.values(), default=0).bit_length())
+    ]
+    for recipe_id, size in sizes.items():
+        for position, plane in enumerate(planes):
+            if size >> position & 1:
+                plane[recipe_id >> 3] |= 1 << (recipe_id & 7)
+
+    offset = (
+        HEADER.size + ENTRY.size * len(postings) + capacity * len(planes)
+    )
+    containers = []
+    file.write(
+        HEADER.pack(
+            MAGIC, FORMAT, generation, capacity, len(postings), len(planes)
+        )
+    )
+    for ingredient_id in sorted(postings):
+        recipes = sorted(postings[ingredient_id])
+        if len(recipes) * 4 < capacity:
+            container = array(RECIPE_IDS, recipes).tobytes()
+        else:
+            container = bytearray(capacity)
+            for recipe_id in recipes:
+                container[recipe_id >> 3] |= 1 << (recipe_id & 7)
+        file.write(ENTRY.pack(ingredient_id, len(recipes), offset))
+        containers.append(container)
+        offset += len(container)
+    for plane in planes:
+        file.write(plane)
+    for container in containers:
+        file.write(container)
+
+
+def read_generation(file):
+    """Поколение снимка в file или None, если это не снимок индекса."""
+    header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    magic, version, generation, *_ = HEADER.unpack(header)
+    if magic != MAGIC or version != FORMAT:
+        return None
+    return generation
+
+
+def parse_changes(data):
+    """
+    Разбирает строки журнала "id_рецепта id_ингредиента ..." в словарь
+    id рецепта -> множество ингредиентов. Пустое множество - рецепт
+    удален. Более поздняя строка рецепта заменяет предыдущие.
+    """
+    changes = {}
+    for line in data.splitlines():
+        recipe_id, *ingredients = map(int, line.split())
+        changes[recipe_id] = frozenset(ingredients)
+    return changes
+
+
+def format_change(recipe_id, ingredients):
+    """Строка журнала для рецепта с ингредиентами ingredients."""
+    return " ".join(map(str, (recipe_id, *ingredients))) + "\n"
+
+
+class PantryIndex:
+    """
+    Инвертированный индекс ингредиент -> битовая карта рецептов для
+    поиска рецептов по имеющимся ингредиентам.
+
+    Снимок читается из буфера (обычно mmap файла, общий для процессов
+    через страничный кэш), карты ингредиентов достаются из него при
+    запросе. Рецепты, изменившиеся после построения снимка, хранятся
+    поверх него целиком (overlay) и в картах снимка не учитываются.
+    Работает без Django.
+    """
+
+    def __init__(self, buffer):
+        (
+            _,
+            _,
+            self.generation,
+            self.capacity,
+            ingredients,
+            planes,
+        ) = HEADER.unpack_from(buffer)
+        self.buffer = buffer
+        self.entries = {}
+        for position in range(ingredients):
+            ingredient_id, count, offset = ENTRY.unpack_from(
+                buffer, HEADER.size + ENTRY.size * position
+            )
+            self.entries[ingredient_id] = (count, offset)
+        start = HEADER.size + ENTRY.size * ingredients
+        self.size_planes = [
+            int.from_bytes(
+                buffer[
+                    start + self.capacity * position:
+                    start + self.capacity * (position + 1)
+                ],
+                "little",
+            )
+            for position in range(planes)
+        ]
+        self.overlay = {}
+        self.overlay_mask = 0
+
+    def bitmap(self, ingredient_id):
+        """Битовая карта рецептов снимка с ингредиентом ingredient_id."""
+        if ingredient_id not in self.entries:
+            return 0
+        count, offset = self.entries[ingredient_id]
+        if count * 4 >= self.capacity:
+            return int.from_bytes(
+                self.buffer[offset:offset + self.capacity], "little"
+            )
+        recipes = array(RECIPE_IDS, self.buffer[offset:offset + count * 4])
+        bitmap = bytearray(self.capacity)
+        for recipe_id in recipes:
+            bitmap[recipe_id >> 3] |= 1 << (recipe_id & 7)
+        return int.from_bytes(bitmap, "little")
+
+    def apply(self, changes):
+        """Учитывает изменения рецептов: id рецепта -> ингредиенты."""
+        for recipe_id in changes.keys() - self.overlay.keys():
+            self.overlay_mask |= 1 << recipe_id
+        self.overlay.update(changes)
+
+    def search(self, ingredients):
+        """Рецепты, в которых есть хотя бы один из ingredients."""
+        return PantryMatches(self, frozenset(ingredients))
+
+
+class PantryMatches:
+    """
+    Найденные рецепты в порядке убывания доли имеющихся ингредиентов,
+    при равной доле - с меньшим числом недостающих, затем новые первыми.
+
+    Для каждого рецепта считается, сколько его ингредиентов есть среди
+    имеющихся: карты ингредиентов складываются по разрядам. Рецепты
+    делятся на группы (совпало, всего), группы просматриваются по
+    порядку, а внутри группы рецепты берутся из карты по убыванию id.
+    Поддерживает len() и срезы, поэтому подходит для Paginator.
+    """
+
+    def __init__(self, index, ingredients):
+        self.index = index
+        self.counts = []
+        for ingredient_id in ingredients:
+            bitmap = index.bitmap(ingredient_id) & ~index.overlay_mask
+            if bitmap:
+                add_bitmap(self.counts, bitmap)
+        self.found = 0
+        for plane in self.counts:
+            self.found |= plane
+        self.extra = defaultdict(int)
+        for recipe_id, items in index.overlay.items():
+            matched = len(items & ingredients)
+            if matched:
+                self.extra[matched, len(items)] |= 1 << recipe_id
+        self.total = popcount(self.found) + sum(
+            map(popcount, self.extra.values())
+        )
+
+    def __len__(self):
+        return self.total
+
+    def groups(self):
+        """Пары (совпало, всего) в порядке выдачи."""
+        groups = set(self.extra)
+        for matched in range(1, 1 << len(self.counts)):
+            for size in range(matched, 1 << len(self.index.size_planes)):
+                groups.add((matched, size))
+        return sorted(
+            groups, key=lambda group: (-group[0] / group[1], group[1])
+        )
+
+    def bitmaps(self):
+        """Битовые карты непустых групп в порядке выдачи."""
+        matched_cache, size_cache = {}, {}
+        for matched, size in self.groups():
+            if matched not in matched_cache:
+                matched_cache[matched] = select(
+                    self.counts, matched, self.found
+                )
+            bitmap = matched_cache[matched]
+            if bitmap:
+                if size not in size_cache:
+                    size_cache[size] = select(
+                        self.index.size_planes, size, self.found
+                    )
+                bitmap &= size_cache[size]
+            bitmap |= self.extra.get((matched, size), 0)
+            if bitmap:
+                yield bitmap
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(self.total)
+        wanted = stop - start
+        recipes = []
+        for bitmap in self.bitmaps():
+            if len(recipes) >= wanted:
+                break
+            count = popcount(bitmap)
+            if start >= count:
+                start -= count
+                continue
+            while bitmap and len(recipes) < wanted:
+                recipe_id = bitmap.bit_length() - 1
+                bitmap ^= 1 << recipe_id
+                if start:
+                    start -= 1
+                else:
+                    recipes.append(recipe_id)
+        return recipes
@@ -0,0 +1,51 @@
+import io
+import os
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+FONT_NAME = "ShoppingListFont"
+# встроенный шрифт, если TTF-шрифт не найден (без кириллицы)
+FALLBACK_FONT = "Helvetica"
+
+MARGIN = 20 * mm
+TITLE_SIZE = 16
+LINE_SIZE = 11
+LINE_HEIGHT = 6 * mm
+
+
+def register_font(font_path):
+    """Регистрирует TTF-шрифт с кириллицей и возвращает его имя."""
+    if not font_path or not os.path.exists(font_path):
+        return FALLBACK_FONT
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+    return FONT_NAME
+
+
+def render_shopping_list_pdf(title, lines, font_path):
+    """
+    Рендерит список покупок в PDF и возвращает его байты.
+    """
+    font = register_font(font_path)
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    pdf.setTitle(title)
+    width, height = A4
+
+    pdf.setFont(font, TITLE_SIZE)
+    pdf.drawString(MARGIN, height - MARGIN, title)
+    y = height - MARGIN - 2 * LINE_HEIGHT
+    pdf.setFont(font, LINE_SIZE)
+    for line in lines:
+        if y < MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, LINE_SIZE)
+            y = height - MARGIN
+        pdf.drawString(MARGIN, y, line)
+        y -= LINE_HEIGHT
+    pdf.save()
+    return buffer.getvalue()
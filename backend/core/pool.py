@@ -0,0 +1,34 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from threading import Lock
+
+from django.conf import settings
+
+
+class ProcessPool:
+    """
+    Пул процессов для тяжелых вычислений вне потока запроса, создаваемый
+    при первом обращении. Размер пула берется из настройки workers_setting.
+
+    Процессы запускаются через spawn: они не наследуют соединения с базой
+    данных и состояние потоков родителя, поэтому выполняемые в них функции
+    не должны зависеть от Django.
+    """
+
+    def __init__(self, workers_setting):
+        self.workers_setting = workers_setting
+        self._lock = Lock()
+        self._executor = None
+
+    @property
+    def workers(self):
+        return getattr(settings, self.workers_setting)
+
+    def submit(self, function, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=get_context("spawn"),
+                )
+        return self._executor.submit(function, *args)
@@ -0,0 +1,187 @@
+import cProfile
+import itertools
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from core.metrics import view_name
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_PARAM = "profile"
+# значения заголовка и параметра, включающие профилирование
+PROFILE_VALUES = ("1", "true", "yes", "on")
+
+
+class ProfileCapture:
+    """Профиль cProfile и SQL-запросы одного запроса."""
+
+    def __init__(self, view, trigger):
+        self.view = view
+        self.trigger = trigger
+        self.name = "{}-{}-{}".format(
+            timezone.now().strftime("%Y%m%d-%H%M%S-%f"),
+            os.getpid(),
+            uuid4().hex[:6],
+        )
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.stack = ExitStack()
+        self.started = None
+        self.duration = 0.0
+
+    def execute(self, execute, sql, params, many, context):
+        # параметры не сохраняются: в них бывают пароли и токены
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {"sql": sql, "ms": (time.perf_counter() - start) * 1000}
+            )
+
+    def start(self):
+        for alias in connections:
+            self.stack.enter_context(
+                connections[alias].execute_wrapper(self.execute)
+            )
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration += time.perf_counter() - self.started
+        self.stack.close()
+
+    def stream(self, content, request, response):
+        """
+        Потоковый ответ формируется уже после выхода из представления:
+        профилирование продолжается, пока отдается содержимое.
+        """
+        self.start()
+        try:
+            yield from content
+        finally:
+            self.stop()
+            self.save(request, response)
+
+    def save(self, request, response):
+        """
+        Записывает профиль в PROFILE_DIR: NAME.prof в формате pstats и
+        NAME.json с описанием запроса и SQL.
+        """
+        directory = settings.PROFILE_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        self.profiler.dump_stats(directory / f"{self.name}.prof")
+        (directory / f"{self.name}.json").write_text(
+            json.dumps(
+                {
+                    "view": self.view,
+                    "trigger": self.trigger,
+                    "method": request.method,
+                    "path": request.get_full_path(),
+                    "status": response.status_code,
+                    "user": request.user.pk,
+                    "created": timezone.now().isoformat(),
+                    "duration_ms": self.duration * 1000,
+                    "sql_ms": sum(query["ms"] for query in self.queries),
+                    "queries": self.queries,
+                },
+                ensure_ascii=False,
+            )
+        )
+        rotate_profiles(directory, settings.PROFILE_KEEP)
+
+
+def rotate_profiles(directory, keep):
+    """Оставляет keep последних профилей. Имена упорядочены по времени."""
+    profiles = sorted(directory.glob("*.json"))
+    for meta in profiles[: max(len(profiles) - keep, 0)]:
+        meta.with_suffix(".prof").unlink(missing_ok=True)
+        meta.unlink(missing_ok=True)
+
+
+class RequestProfilingMiddleware:
+    """
+    Профилирует обработку запроса представлением через cProfile и
+    записывает профиль вместе с выполненными SQL-запросами.
+
+    Профиль снимается по запросу персонала (заголовок X-Profile или
+    параметр ?profile=1, имя профиля возвращается в X-Profile-Id) и для
+    каждого N-го запроса к представлениям из PROFILE_SAMPLE. DRF
+    аутентифицирует запрос только внутри представления, поэтому перед
+    профилированием по запросу пользователь проверяется заранее: иначе
+    включить профилировщик мог бы любой клиент.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.counters = defaultdict(itertools.count)
+
+    def __call__(self, request):
+        request.profile_capture = None
+        try:
+            response = self.get_response(request)
+        finally:
+            capture = request.profile_capture
+            if capture is not None:
+                capture.stop()
+        if capture is None:
+            return response
+
+        if capture.trigger == "request":
+            response["X-Profile-Id"] = capture.name
+        if response.streaming:
+            response.streaming_content = capture.stream(
+                response.streaming_content, request, response
+            )
+        else:
+            capture.save(request, response)
+        return response
+
+    def is_requested(self, request):
+        value = request.headers.get(PROFILE_HEADER) or request.GET.get(
+            PROFILE_PARAM, ""
+        )
+        return value.lower() in PROFILE_VALUES
+
+    def is_staff(self, request):
+        """
+        Пользователь запроса - персонал: по сессии (админка) или по
+        аутентификаторам DRF, которые читают только заголовки запроса.
+        """
+        if getattr(request.user, "is_staff", False):
+            return True
+        for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            try:
+                result = authenticator().authenticate(request)
+            except APIException:
+                return False
+            if result is not None:
+                return result[0].is_staff
+        return False
+
+    def get_trigger(self, request, view):
+        if self.is_requested(request) and self.is_staff(request):
+            return "request"
+        every = settings.PROFILE_SAMPLE.get(view) or (
+            settings.PROFILE_SAMPLE.get(view.rpartition(".")[2])
+        )
+        if every and next(self.counters[view]) % every == 0:
+            return "sample"
+        return None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = view_name(view_func, request.method.lower())
+        trigger = self.get_trigger(request, view)
+        if trigger is not None:
+            request.profile_capture = ProfileCapture(view, trigger)
+            request.profile_capture.start()
@@ -0,0 +1,111 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# база данных для чтения в текущем запросе; None - основная
+read_database = ContextVar("read_database", default=None)
+
+# модели, которые всегда читаются с основной базы: токен и сессия нужны
+# сразу после входа, когда реплика их еще может не получить, а по
+# версиям данных процессы сбрасывают свои копии
+PRIMARY_MODELS = {"authtoken.Token", "sessions.Session", "recipes.DataVersion"}
+
+# подписанная кука с меткой времени последнего изменения клиента
+STICKY_COOKIE = "replica_sticky"
+STICKY_SALT = "core.routers.ReplicaMiddleware"
+
+
+@contextmanager
+def use_primary():
+    """
+    Читает с основной базы внутри блока. Нужно для снимков, которые
+    кэшируются под уже увеличенной версией: прочитанные с отстающей
+    реплики, они остались бы устаревшими до следующего изменения.
+    """
+    token = read_database.set(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Роутер баз данных: запись и миграции - только в основную базу,
+    чтение - в базу, выбранную для запроса ReplicaMiddleware. Вне
+    запросов (команды, пулы процессов) все читается с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        # иначе объект, прочитанный с реплики, сохранился бы в нее
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Направляет чтение безопасных запросов (GET, HEAD, OPTIONS) на одну
+    из реплик DATABASE_REPLICAS, выбранную на весь запрос.
+
+    После изменяющего запроса клиент на REPLICA_STICKY_SECONDS
+    прикрепляется к основной базе, чтобы сразу видеть свои изменения,
+    пока они доходят до реплик. Метка хранится у клиента в подписанной
+    куке с временем выдачи, поэтому ее видит любой воркер, обработавший
+    следующий запрос, а продлить ее клиент не может.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def is_sticky(self, request):
+        return (
+            request.get_signed_cookie(
+                STICKY_COOKIE,
+                default=None,
+                salt=STICKY_SALT,
+                max_age=settings.REPLICA_STICKY_SECONDS,
+            )
+            is not None
+        )
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        if safe and not self.is_sticky(request):
+            database = random.choice(settings.DATABASE_REPLICAS)
+        else:
+            database = DEFAULT_DB_ALIAS
+
+        token = read_database.set(database)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+
+        if not safe:
+            response.set_signed_cookie(
+                STICKY_COOKIE,
+                "1",
+                salt=STICKY_SALT,
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
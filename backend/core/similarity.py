@@ -0,0 +1,126 @@
+import numpy as np
+from scipy import sparse
+
+# количество ячеек плотного блока строк матрицы близости, считаемого за
+# раз: 4M float64 - 32 МБ на процесс при любом количестве рецептов
+BLOCK_CELLS = 4_000_000
+
+# близость округляется: равные по построению значения, посчитанные с
+# разным порядком сложения, иначе различались бы в последних битах, и
+# порядок по id при равной близости нарушался бы
+SCORE_DECIMALS = 12
+
+
+def tag_feature(tag_id):
+    """Признак тега: отрицательный, чтобы не совпадать с ингредиентами."""
+    return -tag_id
+
+
+class SimilarityIndex:
+    """
+    Разреженная матрица рецепт × признак (ингредиенты и теги) с весами
+    idf и строками единичной длины.
+
+    Косинусная близость рецептов - строки произведения матрицы на
+    транспонированную. Оно считается блоками строк (см. BLOCK_CELLS):
+    частые признаки вроде тегов делают строку близости почти плотной, и
+    произведение целиком не поместилось бы в память. Работает без Django,
+    чтобы индекс можно было передать в процессы пула.
+    """
+
+    def __init__(self, features):
+        """features: словарь id рецепта -> множество признаков."""
+        self.ids = np.array(sorted(features), dtype=np.int64)
+        self.positions = {
+            recipe_id: position
+            for position, recipe_id in enumerate(self.ids.tolist())
+        }
+        columns, rows, cols = {}, [], []
+        for position, recipe_id in enumerate(self.ids.tolist()):
+            for feature in set(features[recipe_id]):
+                rows.append(position)
+                cols.append(columns.setdefault(feature, len(columns)))
+        cols = np.array(cols, dtype=np.int64)
+        idf = np.log1p(
+            len(self.ids) / np.bincount(cols, minlength=len(columns))
+        )
+        matrix = sparse.csr_matrix(
+            (idf[cols], (rows, cols)), shape=(len(self.ids), len(columns))
+        )
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)))
+        norms[norms == 0] = 1
+        self.matrix = sparse.csr_matrix(matrix.multiply(1 / norms))
+
+    def blocks(self, recipe_ids):
+        """
+        Плотные блоки строк матрицы близости рецептов recipe_ids: пары
+        (id рецептов блока, строки близости со всеми рецептами). Близость
+        рецепта с самим собой обнулена. Рецепты должны быть в индексе.
+        """
+        size = max(1, BLOCK_CELLS // max(len(self.ids), 1))
+        for start in range(0, len(recipe_ids), size):
+            block = recipe_ids[start:start + size]
+            positions = [self.positions[recipe_id] for recipe_id in block]
+            # разреженная матрица на плотный блок: результат сразу
+            # плотный, без промежуточной разреженной строки близости
+            scores = np.ascontiguousarray(
+                (self.matrix @ self.matrix[positions].T.toarray()).T
+            )
+            scores[np.arange(len(block)), positions] = 0
+            yield block, scores
+
+    def row(self, recipe_id):
+        """
+        Близость recipe_id со всеми рецептами, у которых с ним есть общие
+        признаки, - строка матрицы близости целиком.
+        """
+        if recipe_id not in self.positions:
+            return {}
+        _, scores = next(self.blocks([recipe_id]))
+        found = np.flatnonzero(scores[0] > 0)
+        values = scores[0, found].round(SCORE_DECIMALS)
+        return dict(zip(self.ids[found].tolist(), values.tolist()))
+
+    def top(self, scores, limit):
+        """
+        До limit пар (id рецепта, близость) строки scores в порядке
+        убывания близости, при равной близости - по возрастанию id.
+        """
+        found = np.flatnonzero(scores > 0)
+        values = scores[found].round(SCORE_DECIMALS)
+        if len(found) > limit:
+            # отбор limit лучших без полной сортировки строки; равные
+            # последнему отобранному остаются, чтобы порядок по id был
+            # точным
+            last = len(found) - limit
+            best = values >= np.partition(values, last)[last]
+            found, values = found[best], values[best]
+        order = np.lexsort((self.ids[found], -values))[:limit]
+        found, values = found[order], values[order]
+        return list(zip(self.ids[found].tolist(), values.tolist()))
+
+    def neighbours(self, recipe_ids, limit):
+        """
+        Пары (id рецепта, его соседи по top) для рецептов recipe_ids. У
+        рецептов без ингредиентов и тегов соседей нет.
+        """
+        neighbours = {recipe_id: [] for recipe_id in recipe_ids}
+        indexed = [pk for pk in recipe_ids if pk in self.positions]
+        for block, scores in self.blocks(indexed):
+            for recipe_id, row in zip(block, scores):
+                neighbours[recipe_id] = self.top(row, limit)
+        return list(neighbours.items())
+
+
+_index = None
+
+
+def init_worker(index):
+    """Инициализатор процесса пула: сохраняет индекс в процессе."""
+    global _index
+    _index = index
+
+
+def neighbours_chunk(recipe_ids, limit):
+    """Соседи рецептов recipe_ids по индексу, переданному в init_worker."""
+    return _index.neighbours(recipe_ids, limit)
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
 from django.core.management.utils import get_random_secret_key
@@ -35,6 +36,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.metrics.RequestMetricsMiddleware",
+    "core.profiling.RequestProfilingMiddleware",
+    "core.nplusone.NPlusOneMiddleware",
+    "core.routers.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -44,6 +49,29 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# заголовок Server-Timing с временем SQL, сериализации и рендеринга
+SERVER_TIMING = os.getenv("SERVER_TIMING", default="True") == "True"
+
+# профили запросов: каталог, сколько последних хранить и выборка по
+# представлениям, например "RecipeViewSet.list=100,download_shopping_cart=10"
+# профилирует каждый сотый запрос списка рецептов и каждую десятую выгрузку
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", BASE_DIR / "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 200))
+PROFILE_SAMPLE = {
+    view: int(every)
+    for view, every in (
+        item.split("=") for item in os.getenv("PROFILE_SAMPLE", "").split(",")
+        if item
+    )
+}
+
+# поиск N+1: запрос одной формы, выполненный за обработку запроса не
+# меньше NPLUSONE_THRESHOLD раз, пишется в лог, а при NPLUSONE_RAISE
+# приводит к ошибке
+NPLUSONE_DETECT = os.getenv("NPLUSONE_DETECT", default=str(DEBUG)) == "True"
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", 3))
+NPLUSONE_RAISE = os.getenv("NPLUSONE_RAISE", default="False") == "True"
+
 ROOT_URLCONF = "foodgram_project_backend.urls"
 
 TEMPLATES = [
@@ -77,14 +105,79 @@ else:
 
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.postgresql",
+            "ENGINE": "core.db.postgresql",
             "NAME": os.getenv("POSTGRES_DB", "foodgrasm"),
             "USER": os.getenv("POSTGRES_USER", "flyshy"),
             "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
             "HOST": os.getenv("DB_HOST", ""),
             "PORT": os.getenv("DB_PORT", 5432),
+            # сколько секунд соединение живет между запросами потока
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+            "CONN_HEALTH_CHECKS": (
+                os.getenv("DB_CONN_HEALTH_CHECKS", default="True") == "True"
+            ),
         },
     }
+    if os.getenv("DB_POOL", default="False") == "True":
+        # соединение возвращается в пул процесса после каждого запроса
+        DATABASES["default"]["POOL"] = {
+            "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", 4)),
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "MAX_AGE": DATABASES["default"]["CONN_MAX_AGE"],
+            "CHECK_INTERVAL": float(os.getenv("DB_POOL_CHECK_INTERVAL", 0)),
+        }
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+
+# реплики только для чтения: для PostgreSQL адреса host[:port] через
+# запятую, для SQLite - пути к копиям файла базы
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv("DB_REPLICAS", "").split(",")), start=1
+):
+    if database_type == "sqlite3":
+        location = {"NAME": replica}
+    else:
+        host, _, port = replica.partition(":")
+        location = {"HOST": host, "PORT": port or DATABASES["default"]["PORT"]}
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        **location,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{number}")
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+# сколько секунд после изменения клиент читает с основной базы
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 10))
+
+# сколько секунд процесс не перечитывает версии данных (индекса
+# ингредиентов, каталогов) из базы: столько же после изменения другие
+# воркеры могут отдавать прежнюю копию
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", 2))
+
+LOCAL_CACHE_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+RECIPE_CACHE_BACKEND = os.getenv("RECIPE_CACHE_BACKEND", LOCAL_CACHE_BACKEND)
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", LOCAL_CACHE_BACKEND),
+        "LOCATION": os.getenv("CACHE_LOCATION", "default"),
+    },
+    "recipes": {
+        "BACKEND": RECIPE_CACHE_BACKEND,
+        "LOCATION": os.getenv("RECIPE_CACHE_LOCATION", "recipes"),
+        "TIMEOUT": int(os.getenv("RECIPE_CACHE_TIMEOUT", 24 * 60 * 60)),
+    },
+}
+
+# memcached вытесняет записи сам (LRU), для локальных бэкендов
+# ограничиваем количество записей и долю удаляемых при переполнении
+if "memcached" not in RECIPE_CACHE_BACKEND:
+    CACHES["recipes"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(os.getenv("RECIPE_CACHE_MAX_ENTRIES", 10_000)),
+        "CULL_FREQUENCY": int(os.getenv("RECIPE_CACHE_CULL_FREQUENCY", 3)),
+    }
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -117,6 +210,31 @@ STATIC_ROOT = "/app/static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "/app/media/"
 
+# количество процессов для построения вариантов картинок рецептов,
+# 0 - строить варианты сразу в потоке запроса
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+
+# рецепты авторов, у которых подписчиков больше этого числа, не
+# раскладываются по лентам подписчиков, а подмешиваются при чтении ленты
+FEED_FANOUT_MAX_SUBSCRIBERS = int(
+    os.getenv("FEED_FANOUT_MAX_SUBSCRIBERS", 10_000)
+)
+
+# сколько последних рецептов автора попадает в ленту при подписке на него
+FEED_INITIAL_RECIPES = max(int(os.getenv("FEED_INITIAL_RECIPES", 100)), 1)
+
+# каталог файлов индекса поиска рецептов по имеющимся ингредиентам,
+# общий для процессов бэкенда
+PANTRY_INDEX_DIR = Path(os.getenv("PANTRY_INDEX_DIR", BASE_DIR / "indexes"))
+# размер журнала изменений индекса в байтах, после которого индекс
+# перестраивается (строка журнала - около 50 байт)
+PANTRY_LOG_MAX_BYTES = int(os.getenv("PANTRY_LOG_MAX_BYTES", 256 * 1024))
+
+# TTF-шрифт с кириллицей для PDF
+PDF_FONT = os.getenv(
+    "PDF_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "users.CustomUser"
@@ -127,11 +245,25 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.SignedTokenAuthentication",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
 }
 
+# подписанные токены (вход через /api/auth/jwt/create/): короткоживущий
+# токен доступа проверяется без запроса к базе данных
+SIMPLE_JWT = {
+    "ACCESS_TOKEN_LIFETIME": timedelta(
+        minutes=int(os.getenv("JWT_ACCESS_MINUTES", 15))
+    ),
+    "REFRESH_TOKEN_LIFETIME": timedelta(
+        hours=int(os.getenv("JWT_REFRESH_HOURS", 24))
+    ),
+    "SIGNING_KEY": os.getenv("JWT_SIGNING_KEY", SECRET_KEY),
+    "AUTH_HEADER_TYPES": ("Bearer",),
+}
+
 DJOSER = {
     "LOGIN_FIELD": "email",
     "HIDE_USERS": False,
@@ -1,9 +1,9 @@
 from django.contrib import admin
-from django.db.models import Count
 from import_export.admin import ImportExportModelAdmin
 
 from core.resources import IngredientResource
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
 
 
 class TagInline(admin.StackedInline):
@@ -47,7 +47,8 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         "name",
         "author",
-        "favorite_count",
+        "favorites_count",
+        "in_carts_count",
     )
     search_fields = (
         "name",
@@ -63,16 +64,14 @@ class RecipeAdmin(admin.ModelAdmin):
         TagInline,
     )
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(favorite_count=Count("favorite"))
-        return queryset
-
-    def favorite_count(self, obj):
-        return obj.favorite_count
-
-    favorite_count.admin_order_field = "favorite_count"
-    favorite_count.short_description = "В избранном"
+    def save_related(self, request, form, formsets, change):
+        # ингредиенты меняются в инлайнах, поэтому списки покупок
+        # пересчитываются вокруг их сохранения
+        if change:
+            ShoppingListItem.objects.remove_recipe(form.instance.pk)
+        super().save_related(request, form, formsets, change)
+        if change:
+            ShoppingListItem.objects.add_recipe(form.instance.pk)
 
 
 @admin.register(ShoppingCart)
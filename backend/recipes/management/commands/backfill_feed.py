@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.models import FeedItem
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет ленты подписок последними рецептами авторов по "
+        "существующим подпискам. Рецепты, уже попавшие в ленту, "
+        "пропускаются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1_000,
+            help="Количество подписок, обрабатываемых одним запросом.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        started = time.perf_counter()
+        last = Subscription.objects.aggregate(last=Max("pk"))["last"] or 0
+        added = 0
+        # каждый диапазон подписок вставляется в своей транзакции, чтобы не
+        # держать блокировки на всей таблице лент
+        for start in range(0, last + 1, batch_size):
+            with transaction.atomic():
+                added += FeedItem.objects.fill_recent(
+                    "subscription.id >= %s AND subscription.id < %s",
+                    [start, start + batch_size],
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"В ленты добавлено {added} рецептов за "
+                f"{time.perf_counter() - started:.1f} с"
+            )
+        )
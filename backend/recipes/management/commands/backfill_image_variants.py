@@ -0,0 +1,91 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+
+from api.images import read_image, store_variants
+from core.images import render_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит уменьшенные варианты картинок (WebP и JPEG) для рецептов, "
+        "у которых их еще нет."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Количество процессов для обработки картинок.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Количество картинок, читаемых в память за раз.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Перестроить варианты и для картинок, у которых они есть.",
+        )
+
+    def get_sources(self, force):
+        """Возвращает картинки рецептов, для которых нужны варианты."""
+        sources = set()
+        recipes = Recipe.objects.exclude(image="").values_list(
+            "image", "image_variants"
+        )
+        for source, variants in recipes.iterator():
+            if force or variants.get("source") != source:
+                sources.add(source)
+        return sorted(sources)
+
+    def read_batch(self, sources):
+        batch = []
+        for source in sources:
+            try:
+                batch.append((source, read_image(source)))
+            except OSError as error:
+                self.stderr.write(f"{source}: {error}")
+        return batch
+
+    def handle(self, *args, **options):
+        sources = self.get_sources(options["force"])
+        batch_size = options["batch_size"]
+        started = time.perf_counter()
+        done = recipes = 0
+
+        # дочерние процессы запускаются через spawn: им не нужен Django,
+        # и они не наследуют открытые соединения с базой данных
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], mp_context=get_context("spawn")
+        ) as executor:
+            for start in range(0, len(sources), batch_size):
+                futures = [
+                    (source, executor.submit(render_variants, content))
+                    for source, content in self.read_batch(
+                        sources[start:start + batch_size]
+                    )
+                ]
+                for source, future in futures:
+                    try:
+                        variants = future.result()
+                    except Exception as error:
+                        self.stderr.write(f"{source}: {error}")
+                        continue
+                    recipes += store_variants(source, variants)
+                    done += 1
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Построены варианты {done} из {len(sources)} картинок "
+                f"для {recipes} рецептов за {elapsed:.1f} с"
+            )
+        )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.pantry import pantry_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит заново индекс поиска рецептов по имеющимся ингредиентам. "
+        "Изменения рецептов, накопленные в журнале, входят в новый снимок, "
+        "и журнал начинается заново."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        pantry_index.rebuild()
+        index = pantry_index.ensure_fresh()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Индекс построен за {time.perf_counter() - started:.1f} с: "
+                f"ингредиентов {len(index.entries)}, "
+                f"поколение {index.generation}"
+            )
+        )
@@ -0,0 +1,146 @@
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Min
+
+from core.constraints import SIMILAR_RECIPES
+from core.similarity import (SimilarityIndex, init_worker, neighbours_chunk,
+                             tag_feature)
+from recipes.models import IngredientRecipe, Recipe, SimilarRecipe
+
+# количество строк, получаемых из базы данных за раз
+CHUNK_SIZE = 50_000
+
+# если изменилось больше этой доли рецептов, пересчитываются все
+FULL_SHARE = 0.1
+
+
+class Command(BaseCommand):
+    help = (
+        "Считает для рецептов списки похожих по ингредиентам и тегам. По "
+        "умолчанию пересчитываются только рецепты, изменившиеся с прошлого "
+        "запуска, и рецепты, на списки которых эти изменения влияют."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Пересчитать списки всех рецептов.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Количество процессов для расчета, 0 - считать в текущем.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1_000,
+            help="Количество рецептов в одной задаче и одной транзакции "
+            "записи.",
+        )
+
+    def load_index(self):
+        features = defaultdict(set)
+        rows = IngredientRecipe.objects.values_list(
+            "recipe_id", "ingredient_id"
+        )
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=CHUNK_SIZE):
+            features[recipe_id].add(ingredient_id)
+        rows = Recipe.tags.through.objects.values_list("recipe_id", "tag_id")
+        for recipe_id, tag_id in rows.iterator(chunk_size=CHUNK_SIZE):
+            features[recipe_id].add(tag_feature(tag_id))
+        return SimilarityIndex(features)
+
+    def affected(self, index, changed):
+        """
+        Рецепты, списки которых могут измениться вслед за рецептами
+        changed: изменившийся рецепт уже есть в списке или теперь ближе
+        последнего рецепта списка. Близость симметрична, поэтому берется
+        из строки изменившегося рецепта.
+        """
+        affected = set(
+            SimilarRecipe.objects.filter(similar_id__in=changed).values_list(
+                "recipe_id", flat=True
+            )
+        )
+        thresholds = {
+            recipe_id: lowest
+            for recipe_id, count, lowest in SimilarRecipe.objects.order_by()
+            .values("recipe_id")
+            .annotate(count=Count("id"), lowest=Min("score"))
+            .values_list("recipe_id", "count", "lowest")
+            .iterator(chunk_size=CHUNK_SIZE)
+            if count >= SIMILAR_RECIPES
+        }
+        for recipe_id in changed:
+            for other, score in index.row(recipe_id).items():
+                if score >= thresholds.get(other, 0.0):
+                    affected.add(other)
+        return affected
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        versions = dict(Recipe.objects.values_list("id", "version"))
+        changed = set(
+            Recipe.objects.exclude(similar_version=F("version")).values_list(
+                "id", flat=True
+            )
+        )
+        full = options["full"] or len(changed) > FULL_SHARE * len(versions)
+        if not full and not changed:
+            self.stdout.write(
+                self.style.SUCCESS("Списки похожих рецептов актуальны")
+            )
+            return
+
+        index = self.load_index()
+        targets = set(versions)
+        if not full:
+            targets &= changed | self.affected(index, changed)
+        targets = sorted(targets)
+        size = options["chunk_size"]
+        chunks = [
+            targets[start:start + size]
+            for start in range(0, len(targets), size)
+        ]
+
+        done = 0
+        if options["workers"]:
+            # индекс передается каждому процессу один раз при запуске
+            executor = ProcessPoolExecutor(
+                max_workers=options["workers"],
+                mp_context=get_context("spawn"),
+                initializer=init_worker,
+                initargs=(index,),
+            )
+            results = executor.map(
+                neighbours_chunk, chunks, repeat(SIMILAR_RECIPES)
+            )
+        else:
+            executor = None
+            init_worker(index)
+            results = map(neighbours_chunk, chunks, repeat(SIMILAR_RECIPES))
+        try:
+            for result in results:
+                SimilarRecipe.objects.replace(dict(result), versions)
+                done += len(result)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - started
+        scope = "все" if full else f"изменилось {len(changed)}"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Пересчитаны похожие рецепты для {done} рецептов ({scope}) "
+                f"за {elapsed:.1f} с"
+            )
+        )
@@ -0,0 +1,536 @@
+import csv
+import io
+import os
+import random
+import time
+from itertools import accumulate
+from multiprocessing import Pool
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, connections
+from django.db.models import Max
+
+from api.catalogue import ingredient_catalogue, tag_catalogue
+from api.search import ingredient_index
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import CustomUser, Subscription
+
+DEFAULT_INGREDIENTS = settings.BASE_DIR.parent / "data" / "ingredients.csv"
+
+SYNTHETIC_PASSWORD = "synthetic-password"
+SYNTHETIC_IMAGE = "recipes/images/synthetic.png"
+
+DEFAULT_TAGS = (
+    ("Завтрак", "#E26C2D", "breakfast"),
+    ("Обед", "#49B64E", "lunch"),
+    ("Ужин", "#8775D2", "dinner"),
+)
+
+DISHES = (
+    "Салат",
+    "Суп",
+    "Рагу",
+    "Запеканка",
+    "Пирог",
+    "Омлет",
+    "Каша",
+    "Паста",
+    "Плов",
+    "Котлеты",
+    "Блины",
+    "Соус",
+)
+STYLES = (
+    "по-домашнему",
+    "по-деревенски",
+    "быстрый",
+    "праздничный",
+    "постный",
+    "острый",
+    "бабушкин",
+    "летний",
+)
+METHODS = (
+    "запекаем",
+    "тушим",
+    "варим",
+    "обжариваем",
+    "томим",
+)
+
+# кэш накопленных весов степенного распределения внутри процесса
+_weights = {}
+
+
+def cumulative_weights(count, exponent):
+    """
+    Возвращает накопленные веса степенного распределения: элемент с рангом
+    r выбирается с вероятностью, пропорциональной 1 / (r + 1) ** exponent.
+    """
+    key = (count, exponent)
+    if key not in _weights:
+        _weights[key] = list(
+            accumulate(1 / (rank + 1) ** exponent for rank in range(count))
+        )
+    return _weights[key]
+
+
+def chunk_random(options, phase, start):
+    """
+    Генератор случайных чисел для куска данных. Зависит только от seed,
+    фазы и начала куска, поэтому результат не зависит от числа процессов.
+    """
+    return random.Random(f"{options['seed']}:{phase}:{start}")
+
+
+def sample_unique(rnd, count, cum_weights, size):
+    """Выбирает до size различных рангов с весами cum_weights."""
+    size = min(size, count)
+    chosen = set()
+    for _ in range(10):
+        if len(chosen) >= size:
+            break
+        chosen.update(
+            rnd.choices(
+                range(count), cum_weights=cum_weights, k=size - len(chosen)
+            )
+        )
+    return chosen
+
+
+def activity(rnd, mean):
+    """Количество действий пользователя с экспоненциальным хвостом."""
+    return int(rnd.expovariate(1 / mean)) if mean else 0
+
+
+def copy_value(value):
+    """Преобразует значение в текстовый формат COPY PostgreSQL."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, int):
+        return str(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+    )
+
+
+def write_rows(model, fields, rows, batch_size):
+    """
+    Записывает строки в таблицу модели: через COPY в PostgreSQL и через
+    bulk_create в остальных базах данных. Поля, которых нет в fields,
+    кроме первичного ключа, заполняются значениями по умолчанию.
+    """
+    if not rows:
+        return 0
+    if connection.vendor != "postgresql":
+        model.objects.bulk_create(
+            (model(**dict(zip(fields, row))) for row in rows),
+            batch_size=batch_size,
+        )
+        return len(rows)
+
+    extra = [
+        field
+        for field in model._meta.concrete_fields
+        if field.attname not in fields and not field.primary_key
+    ]
+    defaults = [
+        copy_value(field.get_db_prep_save(field.get_default(), connection))
+        for field in extra
+    ]
+    columns = ", ".join(
+        connection.ops.quote_name(column)
+        for column in [model._meta.get_field(name).column for name in fields]
+        + [field.column for field in extra]
+    )
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join([copy_value(value) for value in row]))
+        if defaults:
+            buffer.write("\t")
+            buffer.write("\t".join(defaults))
+        buffer.write("\n")
+    buffer.seek(0)
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+    return len(rows)
+
+
+def generate_users(task):
+    """Создает пользователей с номерами из диапазона [start, stop)."""
+    start, stop, options = task
+    rows = []
+    for index in range(start, stop):
+        user_id = options["users_start"] + index
+        rows.append(
+            (
+                user_id,
+                f"synthetic{user_id}",
+                f"synthetic{user_id}@example.com",
+                f"Имя{user_id}",
+                f"Фамилия{user_id}",
+                options["password"],
+            )
+        )
+    return write_rows(
+        CustomUser,
+        ("id", "username", "email", "first_name", "last_name", "password"),
+        rows,
+        options["batch_size"],
+    )
+
+
+def generate_recipes(task):
+    """
+    Создает рецепты с номерами из диапазона [start, stop) вместе с их
+    ингредиентами и тегами. Авторы выбираются по степенному закону.
+    """
+    start, stop, options = task
+    rnd = chunk_random(options, "recipes", start)
+    authors = rnd.choices(
+        range(options["users"]),
+        cum_weights=cumulative_weights(
+            options["users"], options["author_exponent"]
+        ),
+        k=stop - start,
+    )
+    ingredient_ids = options["ingredient_ids"]
+    ingredient_weights = cumulative_weights(
+        len(ingredient_ids), options["ingredient_exponent"]
+    )
+
+    recipes, ingredients, tags = [], [], []
+    for index, author in zip(range(start, stop), authors):
+        recipe_id = options["recipes_start"] + index
+        chosen = [
+            ingredient_ids[rank]
+            for rank in sample_unique(
+                rnd,
+                len(ingredient_ids),
+                ingredient_weights,
+                rnd.randint(
+                    options["min_ingredients"], options["max_ingredients"]
+                ),
+            )
+        ]
+        names = [options["ingredient_names"][pk] for pk in chosen]
+        cooking_time = rnd.randint(5, 240)
+        recipes.append(
+            (
+                recipe_id,
+                f"{rnd.choice(DISHES)} {rnd.choice(STYLES)}: {names[0]} "
+                f"№{recipe_id}",
+                f"Понадобится: {', '.join(names)}. Всё "
+                f"{rnd.choice(METHODS)} около {cooking_time} минут.",
+                options["users_start"] + author,
+                SYNTHETIC_IMAGE,
+                cooking_time,
+            )
+        )
+        ingredients += [
+            (recipe_id, pk, rnd.randint(1, 500)) for pk in chosen
+        ]
+        tags += [
+            (recipe_id, tag_id)
+            for tag_id in rnd.sample(
+                options["tag_ids"],
+                rnd.randint(1, min(3, len(options["tag_ids"]))),
+            )
+        ]
+
+    count = write_rows(
+        Recipe,
+        ("id", "name", "text", "author_id", "image", "cooking_time"),
+        recipes,
+        options["batch_size"],
+    )
+    write_rows(
+        IngredientRecipe,
+        ("recipe_id", "ingredient_id", "amount"),
+        ingredients,
+        options["batch_size"],
+    )
+    write_rows(
+        Recipe.tags.through,
+        ("recipe_id", "tag_id"),
+        tags,
+        options["batch_size"],
+    )
+    return count
+
+
+def generate_activity(task):
+    """
+    Создает избранное, корзины и подписки пользователей с номерами из
+    диапазона [start, stop). Популярные рецепты и авторы выбираются чаще.
+    """
+    start, stop, options = task
+    rnd = chunk_random(options, "activity", start)
+    recipe_weights = cumulative_weights(
+        options["recipes"], options["recipe_exponent"]
+    )
+    author_weights = cumulative_weights(
+        options["users"], options["author_exponent"]
+    )
+
+    favorites, cart, subscriptions = [], [], []
+    for index in range(start, stop):
+        user_id = options["users_start"] + index
+        for rows, mean in (
+            (favorites, options["favorites_per_user"]),
+            (cart, options["cart_per_user"]),
+        ):
+            rows += [
+                (user_id, options["recipes_start"] + rank)
+                for rank in sample_unique(
+                    rnd,
+                    options["recipes"],
+                    recipe_weights,
+                    activity(rnd, mean),
+                )
+            ]
+        subscriptions += [
+            (user_id, options["users_start"] + rank)
+            for rank in sample_unique(
+                rnd,
+                options["users"],
+                author_weights,
+                activity(rnd, options["subscriptions_per_user"]),
+            )
+            if rank != index
+        ]
+
+    fields = ("user_id", "recipe_id")
+    return (
+        write_rows(Favorite, fields, favorites, options["batch_size"])
+        + write_rows(ShoppingCart, fields, cart, options["batch_size"])
+        + write_rows(
+            Subscription,
+            ("user_id", "author_id"),
+            subscriptions,
+            options["batch_size"],
+        )
+    )
+
+
+def init_worker():
+    """Инициализирует Django в дочернем процессе."""
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует детерминированный синтетический набор данных: "
+        "пользователей, рецепты с ингредиентами и тегами, избранное, "
+        "корзины и подписки со степенными распределениями популярности."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--recipes", type=int, default=1_000_000)
+        parser.add_argument(
+            "--favorites",
+            type=int,
+            default=5_000_000,
+            help="Ожидаемое общее количество записей в избранном.",
+        )
+        parser.add_argument(
+            "--cart",
+            type=int,
+            default=5_000_000,
+            help="Ожидаемое общее количество записей в корзинах.",
+        )
+        parser.add_argument(
+            "--subscriptions",
+            type=int,
+            default=1_000_000,
+            help="Ожидаемое общее количество подписок.",
+        )
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=1.0,
+            help="Множитель для всех количеств, например 0.01.",
+        )
+        parser.add_argument("--min-ingredients", type=int, default=3)
+        parser.add_argument("--max-ingredients", type=int, default=12)
+        parser.add_argument(
+            "--author-exponent",
+            type=float,
+            default=1.1,
+            help="Показатель степенного закона популярности авторов.",
+        )
+        parser.add_argument(
+            "--recipe-exponent",
+            type=float,
+            default=1.0,
+            help="Показатель степенного закона популярности рецептов.",
+        )
+        parser.add_argument(
+            "--ingredient-exponent",
+            type=float,
+            default=0.8,
+            help="Показатель степенного закона частоты ингредиентов.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Количество процессов; для SQLite всегда 1.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10_000,
+            help="Количество пользователей или рецептов в одной задаче.",
+        )
+        parser.add_argument(
+            "--ingredients-file",
+            default=DEFAULT_INGREDIENTS,
+            help="CSV-файл каталога ингредиентов.",
+        )
+
+    def handle(self, *args, **options):
+        users = max(int(options["users"] * options["scale"]), 2)
+        recipes = max(int(options["recipes"] * options["scale"]), 1)
+        workers = options["workers"]
+        if connection.vendor == "sqlite":
+            workers = 1
+
+        ingredients = self.ensure_ingredients(options["ingredients_file"])
+        tag_ids = self.ensure_tags()
+        rnd = random.Random(options["seed"])
+        ingredient_ids = sorted(ingredients)
+        rnd.shuffle(ingredient_ids)
+
+        params = {
+            "seed": options["seed"],
+            "users": users,
+            "recipes": recipes,
+            "users_start": self.next_id(CustomUser),
+            "recipes_start": self.next_id(Recipe),
+            "password": make_password(SYNTHETIC_PASSWORD),
+            "ingredient_ids": ingredient_ids,
+            "ingredient_names": ingredients,
+            "tag_ids": tag_ids,
+            "favorites_per_user": options["favorites"]
+            * options["scale"]
+            / users,
+            "cart_per_user": options["cart"] * options["scale"] / users,
+            "subscriptions_per_user": options["subscriptions"]
+            * options["scale"]
+            / users,
+            "min_ingredients": options["min_ingredients"],
+            "max_ingredients": options["max_ingredients"],
+            "author_exponent": options["author_exponent"],
+            "recipe_exponent": options["recipe_exponent"],
+            "ingredient_exponent": options["ingredient_exponent"],
+            "batch_size": 2_000,
+        }
+        chunk = options["chunk_size"]
+
+        self.run_phase(
+            "Пользователи", generate_users, users, chunk, params, workers
+        )
+        self.run_phase(
+            "Рецепты", generate_recipes, recipes, chunk, params, workers
+        )
+        self.reset_sequences()
+        self.run_phase(
+            "Избранное, корзины и подписки",
+            generate_activity,
+            users,
+            chunk,
+            params,
+            workers,
+        )
+        # данные загружены в обход сигналов, списки покупок и счетчики
+        # пересчитываются одним запросом каждый, ленты подписок
+        # заполняются по подпискам, похожие рецепты и индекс поиска по
+        # ингредиентам строятся заново
+        ShoppingListItem.objects.rebuild()
+        Recipe.objects.recount()
+        CustomUser.objects.recount()
+        call_command("backfill_feed", stdout=self.stdout)
+        call_command(
+            "build_similar_recipes",
+            full=True,
+            workers=workers,
+            stdout=self.stdout,
+        )
+        call_command("build_pantry_index", stdout=self.stdout)
+
+    def ensure_ingredients(self, path):
+        """
+        Загружает каталог ингредиентов из CSV, если он еще не загружен,
+        и возвращает словарь id -> название.
+        """
+        if not Ingredient.objects.exists():
+            with open(path, encoding="utf-8") as file:
+                Ingredient.objects.bulk_create(
+                    (
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in csv.reader(file)
+                    ),
+                    batch_size=1_000,
+                    ignore_conflicts=True,
+                )
+            ingredient_index.invalidate()
+            ingredient_catalogue.invalidate()
+        return dict(Ingredient.objects.values_list("id", "name"))
+
+    def ensure_tags(self):
+        """Создает теги по умолчанию, если тегов нет, и возвращает их id."""
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in DEFAULT_TAGS
+            )
+            tag_catalogue.invalidate()
+        return list(Tag.objects.values_list("id", flat=True))
+
+    def next_id(self, model):
+        return (model.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+
+    def reset_sequences(self):
+        """Сдвигает последовательности id после вставки с явными id."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [CustomUser, Recipe]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def run_phase(self, title, function, total, chunk, params, workers):
+        """Делит диапазон [0, total) на задачи и выполняет их в пуле."""
+        tasks = [
+            (start, min(start + chunk, total), params)
+            for start in range(0, total, chunk)
+        ]
+        started = time.perf_counter()
+        if workers > 1:
+            connections.close_all()
+            with Pool(workers, initializer=init_worker) as pool:
+                rows = sum(pool.imap_unordered(function, tasks))
+        else:
+            rows = sum(map(function, tasks))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{title}: {rows} строк за {elapsed:.1f} с "
+                f"({rows / max(elapsed, 1e-9):.0f} строк/с)"
+            )
+        )
@@ -0,0 +1,187 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.catalogue import ingredient_catalogue
+from api.search import ingredient_index
+from recipes.models import Ingredient
+
+DEFAULT_PATH = settings.BASE_DIR.parent / "data" / "ingredients.csv"
+
+# размер куска файла, читаемого за раз при разборе JSON
+READ_SIZE = 64 * 1024
+
+STAGING_TABLE = "ingredient_staging"
+
+
+def read_csv(file):
+    """Строки (название, единица измерения) из CSV без заголовка."""
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """
+    Строки (название, единица измерения) из JSON-массива объектов.
+    Массив разбирается по одному объекту, не загружая файл целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n[],":
+            position += 1
+        if position == len(buffer) and eof:
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(READ_SIZE)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+        yield item["name"], item["measurement_unit"]
+
+
+READERS = {".csv": read_csv, ".json": read_json}
+
+
+def clean(rows):
+    """Убирает пробелы по краям и пропускает неполные строки."""
+    for name, unit in rows:
+        name, unit = str(name).strip(), str(unit).strip()
+        if name and unit:
+            yield name, unit
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def copy_value(value):
+    """Экранирует строку для текстового формата COPY."""
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def upsert_postgresql(batch):
+    """
+    Загружает пачку через COPY во временную таблицу и переносит новые
+    строки в каталог одним INSERT ... ON CONFLICT по unique_ingredients.
+    Возвращает количество добавленных строк.
+    """
+    table = Ingredient._meta.db_table
+    buffer = io.StringIO(
+        "".join(
+            f"{copy_value(name)}\t{copy_value(unit)}\n"
+            for name, unit in batch
+        )
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} (name, measurement_unit) FROM STDIN",
+            buffer,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (name, measurement_unit)
+            SELECT DISTINCT name, measurement_unit FROM {STAGING_TABLE}
+            ON CONFLICT ON CONSTRAINT unique_ingredients DO NOTHING
+            """
+        )
+        return cursor.rowcount
+
+
+def upsert_default(batch):
+    """
+    Загружает пачку через bulk_create с пропуском конфликтов по
+    unique_ingredients и возвращает количество добавленных строк.
+    """
+    before = Ingredient.objects.count()
+    Ingredient.objects.bulk_create(
+        (Ingredient(name=name, measurement_unit=unit) for name, unit in batch),
+        ignore_conflicts=True,
+    )
+    return Ingredient.objects.count() - before
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает каталог ингредиентов из CSV или JSON большими пачками. "
+        "Уже существующие ингредиенты пропускаются, поэтому повторный "
+        "запуск ничего не меняет."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            type=Path,
+            default=DEFAULT_PATH,
+            help="Файл .csv (название,единица) или .json (массив объектов "
+            "с полями name и measurement_unit).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50_000,
+            help="Количество строк, загружаемых одним запросом.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(
+                f"Неподдерживаемый формат {path.suffix}: нужен .csv или .json"
+            )
+        postgresql = connection.vendor == "postgresql"
+        upsert = upsert_postgresql if postgresql else upsert_default
+
+        started = time.perf_counter()
+        total = created = 0
+        with open(path, encoding="utf-8") as file, transaction.atomic():
+            if postgresql:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"CREATE TEMPORARY TABLE {STAGING_TABLE} "
+                        f"(name text, measurement_unit text) ON COMMIT DROP"
+                    )
+            for batch in batches(clean(reader(file)), options["batch_size"]):
+                created += upsert(batch)
+                total += len(batch)
+            if postgresql:
+                # ON COMMIT DROP не сработает, если команда выполняется
+                # внутри внешней транзакции, и повторный запуск в ней не
+                # смог бы создать таблицу
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+        elapsed = time.perf_counter() - started
+
+        # сигналы при загрузке не отправляются
+        ingredient_index.invalidate()
+        ingredient_catalogue.invalidate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Прочитано {total} строк, добавлено {created} ингредиентов "
+                f"за {elapsed:.2f} с ({total / elapsed:.0f} строк/с)"
+            )
+        )
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.models import Recipe
+from users.models import CustomUser
+
+# счетчики: модель -> поля, которые сверяются и пересчитываются
+COUNTERS = {
+    Recipe: ("favorites_count", "in_carts_count"),
+    CustomUser: ("recipes_count", "subscribers_count"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет денормализованные счетчики рецептов и пользователей с "
+        "таблицами избранного, корзин и рецептов и исправляет расхождения."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Количество строк, сверяемых одним запросом.",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сверить, не исправляя. При расхождениях команда "
+            "завершается с ошибкой.",
+        )
+
+    def reconcile(self, model, batch_size, check):
+        """
+        Проходит таблицу диапазонами первичного ключа и пересчитывает
+        счетчики только у разошедшихся строк. Каждый диапазон исправляется
+        в своей транзакции, чтобы не держать блокировки на всей таблице.
+        """
+        last = model.objects.aggregate(last=Max("pk"))["last"] or 0
+        drifted = 0
+        for start in range(0, last + 1, batch_size):
+            with transaction.atomic():
+                ids = list(
+                    model.objects.filter(
+                        pk__gte=start, pk__lt=start + batch_size
+                    )
+                    .drifted()
+                    .values_list("pk", flat=True)
+                )
+                if ids and not check:
+                    model.objects.filter(pk__in=ids).recount()
+            drifted += len(ids)
+        return drifted
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, fields in COUNTERS.items():
+            started = time.perf_counter()
+            drifted = self.reconcile(
+                model, options["batch_size"], options["check"]
+            )
+            total += drifted
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural} ({', '.join(fields)}): "
+                f"расхождений {drifted}, "
+                f"{time.perf_counter() - started:.1f} с"
+            )
+        if options["check"] and total:
+            raise CommandError(f"Расхождений: {total}")
+        self.stdout.write(self.style.SUCCESS("Счетчики совпадают с таблицами"))
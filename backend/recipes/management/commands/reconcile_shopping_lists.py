@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingListItem
+
+# количество строк, получаемых из базы данных за раз
+CHUNK_SIZE = 5_000
+
+# сколько расхождений выводить
+MAX_REPORTED = 20
+
+
+def merge(stored, live):
+    """
+    Сравнивает два упорядоченных по (пользователь, ингредиент) потока
+    строк и возвращает расхождения (пользователь, ингредиент, в таблице,
+    по корзинам).
+    """
+    stored, live = iter(stored), iter(live)
+    left, right = next(stored, None), next(live, None)
+    while left is not None or right is not None:
+        left_key = left[:2] if left is not None else None
+        right_key = right[:2] if right is not None else None
+        if right_key is None or (left_key and left_key < right_key):
+            yield (*left_key, left[2], None)
+            left = next(stored, None)
+        elif left_key is None or right_key < left_key:
+            yield (*right_key, None, right[2])
+            right = next(live, None)
+        else:
+            if left[2] != right[2]:
+                yield (*left_key, left[2], right[2])
+            left, right = next(stored, None), next(live, None)
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает списки покупок пользователей из корзин и сверяет "
+        "их с суммами, посчитанными напрямую."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сверить, не пересобирая. При расхождениях "
+            "команда завершается с ошибкой.",
+        )
+
+    def find_mismatches(self):
+        stored = (
+            ShoppingListItem.objects.values_list(
+                "user_id", "ingredient_id", "total_amount"
+            )
+            .order_by("user_id", "ingredient_id")
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        live = ShoppingListItem.objects.live().iterator(chunk_size=CHUNK_SIZE)
+        return merge(stored, live)
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            started = time.perf_counter()
+            ShoppingListItem.objects.rebuild()
+            self.stdout.write(
+                f"Списки покупок пересобраны за "
+                f"{time.perf_counter() - started:.1f} с"
+            )
+
+        mismatches = 0
+        for user, ingredient, stored, live in self.find_mismatches():
+            mismatches += 1
+            if mismatches <= MAX_REPORTED:
+                self.stderr.write(
+                    f"Пользователь {user}, ингредиент {ingredient}: "
+                    f"в таблице {stored}, по корзинам {live}"
+                )
+        if mismatches:
+            raise CommandError(f"Расхождений: {mismatches}")
+        self.stdout.write(
+            self.style.SUCCESS("Списки покупок совпадают с корзинами")
+        )
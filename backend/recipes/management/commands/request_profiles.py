@@ -0,0 +1,110 @@
+import io
+import json
+import pstats
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает профили запросов из PROFILE_DIR. Без аргументов "
+        "выводит список профилей, с именем профиля - самые затратные "
+        "функции и SQL-запросы, сгруппированные по тексту."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", nargs="?", help="Имя профиля из списка.")
+        parser.add_argument(
+            "--view",
+            help="Только профили представления, например "
+            "RecipeViewSet.list.",
+        )
+        parser.add_argument(
+            "--sort",
+            default="cumulative",
+            help="Порядок функций в отчете pstats: cumulative, tottime, "
+            "calls.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Количество строк в списке функций и SQL-запросов.",
+        )
+
+    def load(self, meta):
+        return json.loads(meta.read_text())
+
+    def list_profiles(self, view):
+        profiles = [
+            (meta.stem, self.load(meta))
+            for meta in sorted(settings.PROFILE_DIR.glob("*.json"))
+        ]
+        profiles = [
+            (name, profile)
+            for name, profile in profiles
+            if view is None or profile["view"] == view
+        ]
+        if not profiles:
+            self.stdout.write("Профилей нет.")
+            return
+        for name, profile in profiles:
+            self.stdout.write(
+                f"{name}  {profile['view']:<40} {profile['method']:<6} "
+                f"{profile['status']}  {profile['duration_ms']:8.1f} мс  "
+                f"SQL {len(profile['queries']):4} за "
+                f"{profile['sql_ms']:7.1f} мс  {profile['trigger']}"
+            )
+
+        durations = defaultdict(list)
+        for _, profile in profiles:
+            durations[profile["view"]].append(profile["duration_ms"])
+        self.stdout.write("")
+        for name, values in sorted(durations.items()):
+            values.sort()
+            self.stdout.write(
+                f"{name:<40} профилей {len(values):4}, медиана "
+                f"{values[len(values) // 2]:8.1f} мс, максимум "
+                f"{values[-1]:8.1f} мс"
+            )
+
+    def show_profile(self, name, sort, limit):
+        meta = settings.PROFILE_DIR / f"{name}.json"
+        if not meta.exists():
+            raise CommandError(f"Профиль {name} не найден")
+        profile = self.load(meta)
+        self.stdout.write(
+            f"{profile['method']} {profile['path']} -> {profile['status']} "
+            f"({profile['view']}, {profile['trigger']}, "
+            f"{profile['created']})\n"
+            f"Время: {profile['duration_ms']:.1f} мс, SQL: "
+            f"{len(profile['queries'])} запросов за "
+            f"{profile['sql_ms']:.1f} мс"
+        )
+
+        # OutputWrapper дописывает перевод строки к каждому write
+        report = io.StringIO()
+        stats = pstats.Stats(str(meta.with_suffix(".prof")), stream=report)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(report.getvalue())
+
+        statements = defaultdict(lambda: [0, 0.0])
+        for query in profile["queries"]:
+            statement = statements[query["sql"]]
+            statement[0] += 1
+            statement[1] += query["ms"]
+        self.stdout.write("SQL по суммарному времени:")
+        for sql, (count, total) in sorted(
+            statements.items(), key=lambda item: -item[1][1]
+        )[:limit]:
+            self.stdout.write(f"{count:5} x {total:8.1f} мс  {sql[:200]}")
+
+    def handle(self, *args, **options):
+        if options["name"]:
+            self.show_profile(
+                options["name"], options["sort"], options["limit"]
+            )
+        else:
+            self.list_profiles(options["view"])
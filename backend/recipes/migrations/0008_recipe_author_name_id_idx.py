@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=('author', 'name', 'id'), name='recipe_author_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:20
+
+from django.db import migrations, models
+
+FILL_COUNTERS = """
+UPDATE recipes_recipe SET
+    favorites_count = (
+        SELECT COUNT(*) FROM recipes_favorite
+        WHERE recipes_favorite.recipe_id = recipes_recipe.id
+    ),
+    in_carts_count = (
+        SELECT COUNT(*) FROM recipes_shoppingcart
+        WHERE recipes_shoppingcart.recipe_id = recipes_recipe.id
+    )
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_author_name_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.RunSQL(FILL_COUNTERS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', 'name', 'id'], name='recipe_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:10
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Перед добавлением ограничения уникальности сливает ингредиенты с
+    одинаковыми названием и единицей измерения в ингредиент с меньшим id.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+
+    duplicates = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(count=Count('id'), keep=Min('id'))
+        .filter(count__gt=1)
+    )
+    for group in duplicates:
+        keep = group['keep']
+        others = list(
+            Ingredient.objects.filter(
+                name=group['name'], measurement_unit=group['measurement_unit']
+            )
+            .exclude(pk=keep)
+            .values_list('pk', flat=True)
+        )
+        IngredientRecipe.objects.filter(ingredient_id__in=others).update(
+            ingredient_id=keep
+        )
+        for item in ShoppingListItem.objects.filter(ingredient_id__in=others):
+            updated = ShoppingListItem.objects.filter(
+                user_id=item.user_id, ingredient_id=keep
+            ).update(total_amount=F('total_amount') + item.total_amount)
+            if updated:
+                item.delete()
+            else:
+                item.ingredient_id = keep
+                item.save(update_fields=['ingredient'])
+        Ingredient.objects.filter(pk__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredients'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:40
+
+from uuid import uuid4
+
+from django.db import migrations, models
+
+# версии, которые читаются при каждом запросе к каталогам и рецептам
+KEYS = (
+    'tag-catalogue-version',
+    'ingredient-catalogue-version',
+    'ingredient-index-version',
+)
+
+
+def create_versions(apps, schema_editor):
+    """
+    Создает версии заранее, чтобы первое чтение не записывало их. У
+    каждой новой базы (в том числе тестовой) версии свои.
+    """
+    DataVersion = apps.get_model('recipes', 'DataVersion')
+    DataVersion.objects.bulk_create(
+        DataVersion(key=key, version=uuid4().hex) for key in KEYS
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('version', models.CharField(max_length=32, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия данных',
+                'verbose_name_plural': 'Версии данных',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery, Sum
+
+# модель строк пользователя -> счетчик рецепта
+COUNTERS = (
+    ('Favorite', 'favorites_count'),
+    ('ShoppingCart', 'in_carts_count'),
+)
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Удаляет повторные строки избранного и корзин, накопившиеся без
+    ограничения уникальности, и пересчитывает по оставшимся счетчики
+    затронутых рецептов и списки покупок затронутых пользователей.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    cart_users = set()
+    # order_by() без полей: сортировка моделей попала бы в GROUP BY
+    for model_name, counter in COUNTERS:
+        model = apps.get_model('recipes', model_name)
+        duplicates = (
+            model.objects.order_by()
+            .values('user_id', 'recipe_id')
+            .annotate(first=Min('id'), rows=Count('id'))
+            .filter(rows__gt=1)
+        )
+        recipes = set()
+        for row in duplicates:
+            model.objects.filter(
+                user_id=row['user_id'], recipe_id=row['recipe_id']
+            ).exclude(id=row['first']).delete()
+            recipes.add(row['recipe_id'])
+            if model_name == 'ShoppingCart':
+                cart_users.add(row['user_id'])
+        rows = (
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(rows=Count('id'))
+            .values('rows')
+        )
+        Recipe.objects.filter(pk__in=recipes).update(
+            **{counter: Subquery(rows)}
+        )
+
+    for user_id in cart_users:
+        ShoppingListItem.objects.filter(user_id=user_id).delete()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=row['ingredient_id'],
+                total_amount=row['total'],
+            )
+            for row in IngredientRecipe.objects.filter(
+                recipe__shoppingcart__user_id=user_id
+            )
+            .order_by()
+            .values('ingredient_id')
+            .annotate(total=Sum('amount'))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_dataversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shoppingcart'),
+        ),
+    ]
@@ -1,12 +1,22 @@
+from collections import defaultdict
+from uuid import uuid4
+
 from colorfield.fields import ColorField
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Q, Sum, Value,
+                              Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
 from core.constraints import (MAX_AMOUNT, MAX_COLOR_LENGTH, MAX_COOKING_TIME,
                               MAX_NAME_LENGTH, MAX_TEXT_LENGTH, MIN_AMOUNT,
                               MIN_COOKING_TIME)
+from core.counters import CounterFieldsMixin, change_counter, count_related
 from core.models import BaseNameModel, BaseUserModel
-from users.models import CustomUser
+from users.models import CustomUser, Subscription
 
 
 class Tag(models.Model):
@@ -51,7 +61,146 @@ class Ingredient(BaseNameModel):
         ]
 
 
-class Recipe(BaseNameModel):
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        """
+        Подгружает авторов рецептов и аннотирует флаги is_favorited,
+        is_in_shopping_cart и author_is_subscribed для пользователя user
+        в том же запросе, что и сами рецепты.
+        """
+        queryset = self.defer("search_vector").select_related("author")
+
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(False, output_field=BooleanField()),
+            )
+
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            author_is_subscribed=Exists(
+                Subscription.objects.filter(
+                    user=user, author=OuterRef("author")
+                )
+            ),
+        )
+
+    def with_actual_counters(self):
+        """
+        Аннотирует количество добавлений рецептов в избранное и корзины,
+        посчитанное по самим таблицам.
+        """
+        return self.annotate(
+            actual_favorites_count=count_related(
+                Favorite.objects.all(), "recipe"
+            ),
+            actual_in_carts_count=count_related(
+                ShoppingCart.objects.all(), "recipe"
+            ),
+        )
+
+    def drifted(self):
+        """Оставляет рецепты, счетчики которых разошлись с таблицами."""
+        return self.with_actual_counters().exclude(
+            favorites_count=F("actual_favorites_count"),
+            in_carts_count=F("actual_in_carts_count"),
+        )
+
+    def recount(self):
+        """Пересчитывает счетчики рецептов по таблицам одним UPDATE."""
+        return self.update(
+            favorites_count=count_related(Favorite.objects.all(), "recipe"),
+            in_carts_count=count_related(
+                ShoppingCart.objects.all(), "recipe"
+            ),
+        )
+
+    def feed(self, user):
+        """
+        Рецепты из ленты подписок пользователя, новые первыми: разложенные
+        по его ленте при публикации и рецепты популярных авторов, которые
+        по лентам не раскладываются и выбираются при чтении.
+
+        Популярные авторы пользователя выбираются сразу отдельным запросом.
+        Если их нет, лента читается соединением с FeedItem и сортируется
+        по его recipe_id: рецепты идут в порядке индекса (user, recipe), и
+        условие курсора тоже попадает в индекс, а не проверяется по всей
+        ленте.
+        """
+        popular = list(
+            Subscription.objects.filter(
+                user=user,
+                author__subscribers_count__gt=(
+                    settings.FEED_FANOUT_MAX_SUBSCRIBERS
+                ),
+            ).values_list("author_id", flat=True)
+        )
+        if not popular:
+            return (
+                self.filter(feed_items__user=user)
+                .annotate(feed_recipe_id=F("feed_items__recipe_id"))
+                .order_by("-feed_recipe_id")
+            )
+        return self.filter(
+            Q(id__in=FeedItem.objects.filter(user=user).values("recipe_id"))
+            | Q(author_id__in=popular)
+        ).order_by("-id")
+
+    def similar_to(self, recipe_id):
+        """
+        Рецепты из посчитанного списка похожих на recipe_id, начиная с
+        самых похожих.
+        """
+        return self.filter(neighbour_of__recipe_id=recipe_id).order_by(
+            "-neighbour_of__score", "id"
+        )
+
+    def first_per_author(self, author_ids, limit):
+        """
+        Оставляет первые limit рецептов (в порядке Meta.ordering) каждого
+        автора из author_ids и сортирует их по автору.
+
+        Номер рецепта у автора считается оконной функцией ROW_NUMBER()
+        OVER (PARTITION BY author) во вложенном запросе: в Django 3.2
+        фильтровать по оконной функции нельзя. Вложенный запрос читает
+        только индекс (author, name, id), строки рецептов читаются лишь
+        для отобранных id.
+        """
+        ordering = [
+            F(field[1:]).desc() if field.startswith("-") else F(field).asc()
+            for field in self.model._meta.ordering
+        ]
+        ranked = (
+            self.model.objects.filter(author_id__in=author_ids)
+            .annotate(
+                position=Window(
+                    expression=RowNumber(),
+                    partition_by=[F("author_id")],
+                    order_by=ordering,
+                )
+            )
+            .order_by()
+            .values("id", "position")
+        )
+        sql, params = ranked.query.sql_with_params()
+        # LIMIT не меняет результат, но дает планировщику верную оценку
+        # числа строк, и рецепты читаются по первичному ключу
+        return self.filter(
+            id__in=RawSQL(
+                f"SELECT ranked.id FROM ({sql}) ranked "
+                f"WHERE ranked.position <= %s LIMIT %s",
+                (*params, limit, limit * len(author_ids)),
+            )
+        ).order_by("author_id", *self.model._meta.ordering)
+
+
+class Recipe(CounterFieldsMixin, BaseNameModel):
     author = models.ForeignKey(
         CustomUser,
         verbose_name="Автор",
@@ -62,6 +211,11 @@ class Recipe(BaseNameModel):
         verbose_name="Картинка",
         upload_to="recipes/images",
     )
+    image_variants = models.JSONField(
+        verbose_name="Варианты картинки",
+        default=dict,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name="Описание", max_length=MAX_TEXT_LENGTH
     )
@@ -89,11 +243,70 @@ class Recipe(BaseNameModel):
             ),
         ],
     )
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый вектор",
+        null=True,
+        editable=False,
+    )
+    version = models.PositiveIntegerField(
+        verbose_name="Версия",
+        default=1,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном",
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name="В корзинах",
+        default=0,
+        editable=False,
+    )
+
+    similar_version = models.PositiveIntegerField(
+        verbose_name="Версия похожих рецептов",
+        default=0,
+        editable=False,
+    )
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ("favorites_count", "in_carts_count")
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
-        ordering = ("name",)
+        ordering = ("name", "id")
+        indexes = [
+            models.Index(fields=("name", "id"), name="recipe_name_id_idx"),
+            models.Index(
+                fields=("author", "name", "id"),
+                name="recipe_author_name_id_idx",
+            ),
+            models.Index(
+                fields=("-favorites_count", "name", "id"),
+                name="recipe_popular_idx",
+            ),
+            models.Index(
+                fields=("author", "-id"),
+                name="recipe_author_id_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        При изменении существующего рецепта увеличивает его версию, по
+        которой кэшируется представление рецепта.
+        """
+        update_fields = kwargs.get("update_fields")
+        bump = not self._state.adding and (
+            update_fields is None or "version" in update_fields
+        )
+        if bump:
+            self.version = F("version") + 1
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=["version"])
 
 
 class IngredientRecipe(models.Model):
@@ -132,6 +345,111 @@ class IngredientRecipe(models.Model):
         return f"{self.ingredient} в {self.recipe} в кол-ве {self.amount}"
 
 
+class UserRecipeManager(models.Manager):
+    """
+    Массовое добавление рецептов в избранное или корзину пользователя и
+    удаление из них. Сигналы моделей при этом не отправляются, поэтому
+    счетчик рецепта counter_field меняется здесь же.
+    """
+
+    def lock_user(self, user):
+        """
+        Блокирует строку пользователя до конца транзакции, чтобы
+        одновременные массовые операции одного пользователя не считали
+        одни и те же рецепты добавленными дважды.
+        """
+        CustomUser.objects.select_for_update().filter(pk=user.pk).exists()
+
+    @transaction.atomic
+    def bulk_add(self, user, recipe_ids):
+        """
+        Добавляет рецепты recipe_ids пользователю одним INSERT. Возвращает
+        множества добавленных, уже добавленных ранее и несуществующих id.
+        Строки, вставленные одновременно другим запросом (добавление по
+        одному рецепту блокировку пользователя не берет), пропускаются
+        через ON CONFLICT и считаются уже добавленными: счетчики и
+        обработчик added получают только действительно вставленные.
+        """
+        self.lock_user(user)
+        found = set(
+            Recipe.objects.filter(pk__in=recipe_ids).values_list(
+                "pk", flat=True
+            )
+        )
+        existing = set(
+            self.filter(user=user, recipe_id__in=found).values_list(
+                "recipe_id", flat=True
+            )
+        )
+        added = set()
+        if found - existing:
+            added = self.insert_missing(user, found - existing)
+            existing |= found - added
+        if added:
+            change_counter(
+                Recipe.objects.filter(pk__in=added),
+                self.model.counter_field,
+                1,
+            )
+            self.added(user, added)
+        return added, existing, set(recipe_ids) - found
+
+    def insert_missing(self, user, recipe_ids):
+        """Вставляет строки рецептов и возвращает id вставленных."""
+        table = self.model._meta.db_table
+        rows = ", ".join(["(%s, %s)"] * len(recipe_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, recipe_id) VALUES {rows} "
+                "ON CONFLICT (user_id, recipe_id) DO NOTHING "
+                "RETURNING recipe_id",
+                [value for pk in recipe_ids for value in (user.pk, pk)],
+            )
+            return {recipe_id for recipe_id, in cursor.fetchall()}
+
+    @transaction.atomic
+    def bulk_remove(self, user, recipe_ids):
+        """
+        Удаляет рецепты recipe_ids пользователя одним DELETE. Возвращает
+        множества удаленных id и id, которых не было.
+        """
+        self.lock_user(user)
+        removed = set(
+            self.filter(user=user, recipe_id__in=recipe_ids).values_list(
+                "recipe_id", flat=True
+            )
+        )
+        if removed:
+            self.removing(user, removed)
+            placeholders = ", ".join(["%s"] * len(removed))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {self.model._meta.db_table} "
+                    f"WHERE user_id = %s AND recipe_id IN ({placeholders})",
+                    [user.pk, *removed],
+                )
+            change_counter(
+                Recipe.objects.filter(pk__in=removed),
+                self.model.counter_field,
+                -1,
+            )
+        return removed, set(recipe_ids) - removed
+
+    def added(self, user, recipe_ids):
+        """Вызывается после вставки строк рецептов recipe_ids."""
+
+    def removing(self, user, recipe_ids):
+        """Вызывается перед удалением строк рецептов recipe_ids."""
+
+
+class ShoppingCartManager(UserRecipeManager):
+    def added(self, user, recipe_ids):
+        ShoppingListItem.objects.apply_recipes(list(recipe_ids), 1, user.pk)
+
+    def removing(self, user, recipe_ids):
+        ShoppingListItem.objects.apply_recipes(list(recipe_ids), -1, user.pk)
+
+
 class BaseUserRecipeModel(BaseUserModel):
     recipe = models.ForeignKey(
         Recipe,
@@ -144,7 +462,7 @@ class BaseUserRecipeModel(BaseUserModel):
         constraints = [
             models.UniqueConstraint(
                 fields=["user", "recipe"],
-                name="unique_recipes",
+                name="unique_%(class)s",
             )
         ]
 
@@ -153,16 +471,323 @@ class BaseUserRecipeModel(BaseUserModel):
 
 
 class Favorite(BaseUserRecipeModel):
+    # счетчик рецепта, отражающий количество строк модели
+    counter_field = "favorites_count"
 
-    class Meta:
+    objects = UserRecipeManager()
+
+    class Meta(BaseUserRecipeModel.Meta):
         verbose_name = "Избранное"
         verbose_name_plural = "Избранные"
         ordering = ("user",)
 
 
 class ShoppingCart(BaseUserRecipeModel):
+    counter_field = "in_carts_count"
 
-    class Meta:
+    objects = ShoppingCartManager()
+
+    class Meta(BaseUserRecipeModel.Meta):
         verbose_name = "Рецепт в корзине"
         verbose_name_plural = "Рецепты в корзине"
         ordering = ("user",)
+
+
+class ShoppingListItemManager(models.Manager):
+    """
+    Поддержка материализованного списка покупок: суммы ингредиентов
+    рецептов из корзины для каждого пользователя.
+    """
+
+    def upsert_sql(self, condition):
+        """
+        Запрос, прибавляющий к списку покупок суммы ингредиентов из
+        корзин, отобранных условием condition, умноженные на знак %s.
+        """
+        table = self.model._meta.db_table
+        return f"""
+            INSERT INTO {table} (user_id, ingredient_id, total_amount)
+            SELECT cart.user_id, item.ingredient_id, %s * SUM(item.amount)
+            FROM {ShoppingCart._meta.db_table} cart
+            JOIN {IngredientRecipe._meta.db_table} item
+                ON item.recipe_id = cart.recipe_id
+            WHERE {condition}
+            GROUP BY cart.user_id, item.ingredient_id
+            ON CONFLICT (user_id, ingredient_id) DO UPDATE
+            SET total_amount = {table}.total_amount + EXCLUDED.total_amount
+        """
+
+    def apply_recipes(self, recipe_ids, sign, user_id=None):
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        condition = f"cart.recipe_id IN ({placeholders})"
+        params = [sign, *recipe_ids]
+        if user_id is not None:
+            condition += " AND cart.user_id = %s"
+            params.append(user_id)
+        with connection.cursor() as cursor:
+            cursor.execute(self.upsert_sql(condition), params)
+        if sign < 0:
+            users = ShoppingCart.objects.filter(recipe_id__in=recipe_ids)
+            if user_id is not None:
+                users = users.filter(user_id=user_id)
+            self.filter(
+                user__in=users.values("user_id"), total_amount__lte=0
+            ).delete()
+
+    def add_recipe(self, recipe_id, user_id=None):
+        """
+        Добавляет ингредиенты рецепта в списки покупок пользователя
+        user_id или всех, у кого рецепт в корзине. Строка корзины уже
+        должна существовать.
+        """
+        self.apply_recipes([recipe_id], 1, user_id)
+
+    def remove_recipe(self, recipe_id, user_id=None):
+        """
+        Вычитает ингредиенты рецепта из списков покупок. Вызывается, пока
+        строка корзины и ингредиенты рецепта еще существуют.
+        """
+        self.apply_recipes([recipe_id], -1, user_id)
+
+    def rebuild(self):
+        """Пересобирает списки покупок всех пользователей из корзин."""
+        with transaction.atomic():
+            self.all().delete()
+            with connection.cursor() as cursor:
+                cursor.execute(self.upsert_sql("1 = 1"), [1])
+
+    def live(self):
+        """
+        Строки (пользователь, ингредиент, сумма), посчитанные по корзинам
+        напрямую, в порядке пользователя и ингредиента.
+        """
+        return (
+            IngredientRecipe.objects.filter(recipe__shoppingcart__isnull=False)
+            .values_list("recipe__shoppingcart__user_id", "ingredient_id")
+            .annotate(total=Sum("amount"))
+            .order_by("recipe__shoppingcart__user_id", "ingredient_id")
+        )
+
+
+class ShoppingListItem(BaseUserModel):
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Ингредиент",
+    )
+    total_amount = models.BigIntegerField(verbose_name="Общее количество")
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = "Ингредиент в списке покупок"
+        verbose_name_plural = "Списки покупок"
+        ordering = ("user",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_shopping_list_ingredient",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.ingredient}: {self.total_amount}"
+
+
+class FeedItemManager(models.Manager):
+    """
+    Ленты подписок: рецепт при публикации раскладывается по лентам всех
+    подписчиков автора (fan-out on write), и чтение ленты не соединяет
+    подписки со всеми рецептами. Рецепты авторов, у которых подписчиков
+    больше FEED_FANOUT_MAX_SUBSCRIBERS, не раскладываются, чтобы
+    публикация не вставляла миллионы строк, а выбираются при чтении
+    ленты (см. RecipeQuerySet.feed).
+
+    При подписке и заполнении лент по существующим подпискам в ленту
+    попадают только FEED_INITIAL_RECIPES последних рецептов автора.
+    """
+
+    def fill_sql(self, condition):
+        """
+        Запрос, добавляющий в ленты подписчиков рецепты авторов из подписок,
+        отобранных вместе с рецептами условием condition.
+        """
+        return f"""
+            INSERT INTO {self.model._meta.db_table} (user_id, recipe_id)
+            SELECT subscription.user_id, recipe.id
+            FROM {Subscription._meta.db_table} subscription
+            JOIN {Recipe._meta.db_table} recipe
+                ON recipe.author_id = subscription.author_id
+            JOIN {CustomUser._meta.db_table} author
+                ON author.id = subscription.author_id
+            WHERE author.subscribers_count <= %s AND {condition}
+            ON CONFLICT (user_id, recipe_id) DO NOTHING
+        """
+
+    def fill(self, condition, params):
+        """Выполняет fill_sql и возвращает количество добавленных строк."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                self.fill_sql(condition),
+                [settings.FEED_FANOUT_MAX_SUBSCRIBERS, *params],
+            )
+            return cursor.rowcount
+
+    def fill_recent(self, condition, params):
+        """
+        Как fill, но только с последними FEED_INITIAL_RECIPES рецептами
+        каждого автора. Граница ищется по индексу (author, -id).
+        """
+        recent = f"""
+            recipe.id >= COALESCE((
+                SELECT latest.id FROM {Recipe._meta.db_table} latest
+                WHERE latest.author_id = subscription.author_id
+                ORDER BY latest.id DESC
+                LIMIT 1 OFFSET %s
+            ), 0)
+        """
+        return self.fill(
+            f"{condition} AND {recent}",
+            [*params, settings.FEED_INITIAL_RECIPES - 1],
+        )
+
+    def add_recipe(self, recipe_id):
+        """Добавляет рецепт в ленты всех подписчиков его автора."""
+        return self.fill("recipe.id = %s", [recipe_id])
+
+    def add_subscription(self, user_id, author_id):
+        """Добавляет в ленту пользователя последние рецепты автора."""
+        return self.fill_recent(
+            "subscription.user_id = %s AND subscription.author_id = %s",
+            [user_id, author_id],
+        )
+
+    def remove_subscription(self, user_id, author_id):
+        """Убирает из ленты пользователя рецепты автора."""
+        return self.filter(
+            user_id=user_id, recipe__author_id=author_id
+        ).delete()
+
+
+class FeedItem(BaseUserModel):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="feed_items",
+        verbose_name="Рецепт",
+    )
+
+    objects = FeedItemManager()
+
+    class Meta:
+        verbose_name = "Рецепт в ленте"
+        verbose_name_plural = "Ленты подписок"
+        ordering = ("user",)
+        constraints = [
+            # индекс ограничения читает ленту пользователя в порядке рецептов
+            models.UniqueConstraint(
+                fields=["user", "recipe"],
+                name="unique_feed_item",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.recipe}"
+
+
+class SimilarRecipeManager(models.Manager):
+    def replace(self, neighbours, versions):
+        """
+        Заменяет списки похожих рецептов. neighbours: id рецепта -> пары
+        (id похожего рецепта, близость), versions: id рецепта -> версия,
+        по которой посчитан список.
+        """
+        with transaction.atomic():
+            self.filter(recipe_id__in=list(neighbours)).delete()
+            self.bulk_create(
+                self.model(recipe_id=recipe_id, similar_id=other, score=score)
+                for recipe_id, items in neighbours.items()
+                for other, score in items
+            )
+            by_version = defaultdict(list)
+            for recipe_id in neighbours:
+                by_version[versions[recipe_id]].append(recipe_id)
+            for version, ids in by_version.items():
+                Recipe.objects.filter(pk__in=ids).update(
+                    similar_version=version
+                )
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbours",
+        verbose_name="Рецепт",
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbour_of",
+        verbose_name="Похожий рецепт",
+    )
+    score = models.FloatField(verbose_name="Близость")
+
+    objects = SimilarRecipeManager()
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        ordering = ("recipe", "-score")
+        indexes = [
+            models.Index(
+                fields=("recipe", "-score"), name="similar_recipe_score_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} ~ {self.similar}: {self.score:.2f}"
+
+
+class DataVersionManager(models.Manager):
+    def get_versions(self, keys):
+        """
+        Версии данных keys одним запросом, только чтение. Версии известных
+        ключей создает миграция, а отсутствующая считается равной "0" до
+        первого bump.
+        """
+        versions = dict(
+            self.filter(key__in=keys).values_list("key", "version")
+        )
+        return [versions.get(key, "0") for key in keys]
+
+    def bump(self, key):
+        if not self.filter(key=key).update(version=uuid4().hex):
+            try:
+                with transaction.atomic():
+                    self.create(key=key, version=uuid4().hex)
+            except IntegrityError:
+                self.filter(key=key).update(version=uuid4().hex)
+
+
+class DataVersion(models.Model):
+    """
+    Версия данных, по которой процессы сбрасывают свои копии (индекс
+    ингредиентов, готовые каталоги). Хранится в базе данных, поэтому
+    изменение видно всем воркерам и серверам, включая изменения из
+    команд управления.
+    """
+
+    key = models.CharField(
+        verbose_name="Ключ", max_length=100, primary_key=True
+    )
+    version = models.CharField(verbose_name="Версия", max_length=32)
+
+    objects = DataVersionManager()
+
+    class Meta:
+        verbose_name = "Версия данных"
+        verbose_name_plural = "Версии данных"
+
+    def __str__(self):
+        return f"{self.key}: {self.version}"
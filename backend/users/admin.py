@@ -12,6 +12,8 @@ class UserAdmin(UserAdmin):
         "email",
         "first_name",
         "last_name",
+        "recipes_count",
+        "subscribers_count",
     )
     list_filter = (
         "username",
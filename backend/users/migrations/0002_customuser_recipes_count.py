@@ -0,0 +1,35 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:20
+
+from django.db import migrations, models
+
+import users.models
+
+FILL_RECIPES_COUNT = """
+UPDATE users_customuser SET recipes_count = (
+    SELECT COUNT(*) FROM recipes_recipe
+    WHERE recipes_recipe.author_id = users_customuser.id
+)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', users.models.CustomUserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.RunSQL(FILL_RECIPES_COUNT, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.3 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+FILL_SUBSCRIBERS_COUNT = """
+UPDATE users_customuser SET subscribers_count = (
+    SELECT COUNT(*) FROM users_subscription
+    WHERE users_subscription.author_id = users_customuser.id
+)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customuser_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.RunSQL(FILL_SUBSCRIBERS_COUNT, migrations.RunSQL.noop),
+    ]
@@ -1,13 +1,69 @@
-from django.contrib.auth.models import AbstractUser
+from django.apps import apps
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
-from django.db.models import F, Q
+from django.db.models import BooleanField, Exists, F, OuterRef, Q, Value
 
 from core.constraints import (MAX_FIRST_NAME_LENGTH, MAX_LAST_NAME_LENGTH,
                               MAX_PASSWORD_LENGTH, MAX_USERNAME_LENGTH)
+from core.counters import CounterFieldsMixin, count_related
 
 
-class CustomUser(AbstractUser):
+class CustomUserQuerySet(models.QuerySet):
+    def with_subscription_flag(self, user):
+        """
+        Аннотирует флаг is_subscribed: подписан ли пользователь user на
+        каждого из пользователей.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_subscribed=Exists(
+                Subscription.objects.filter(user=user, author=OuterRef("pk"))
+            )
+        )
+
+    def with_actual_counters(self):
+        """
+        Аннотирует количество рецептов и подписчиков, посчитанное по их
+        таблицам.
+        """
+        recipes = apps.get_model("recipes", "Recipe").objects.all()
+        return self.annotate(
+            actual_recipes_count=count_related(recipes, "author"),
+            actual_subscribers_count=count_related(
+                Subscription.objects.all(), "author"
+            ),
+        )
+
+    def drifted(self):
+        """
+        Оставляет пользователей, у которых счетчики рецептов или
+        подписчиков разошлись с таблицами.
+        """
+        return self.with_actual_counters().exclude(
+            recipes_count=F("actual_recipes_count"),
+            subscribers_count=F("actual_subscribers_count"),
+        )
+
+    def recount(self):
+        """Пересчитывает счетчики пользователей по таблицам одним UPDATE."""
+        recipes = apps.get_model("recipes", "Recipe").objects.all()
+        return self.update(
+            recipes_count=count_related(recipes, "author"),
+            subscribers_count=count_related(
+                Subscription.objects.all(), "author"
+            ),
+        )
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    pass
+
+
+class CustomUser(CounterFieldsMixin, AbstractUser):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name", "username"]
 
@@ -33,6 +89,20 @@ class CustomUser(AbstractUser):
         verbose_name="Фамилия пользователя",
         max_length=MAX_LAST_NAME_LENGTH,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Рецептов",
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name="Подписчиков",
+        default=0,
+        editable=False,
+    )
+
+    objects = CustomUserManager()
+
+    counter_fields = ("recipes_count", "subscribers_count")
 
     class Meta:
         verbose_name = "Пользователь"